@@ -0,0 +1,91 @@
+import argparse
+import time
+from collections.abc import Callable
+
+import db
+from bench.ledger import scratch_ledgers
+from bench.timing import measure
+from changes import BUS, ChangeBus
+
+
+# Publish + flush latency with subscribers all listening to one key
+def bench_fan_out(subscribers: int, repeats: int) -> dict[str, float]:
+    bus = ChangeBus()
+    pending: list[Callable] = list()
+    bus.install_scheduler(pending.append)
+    for _ in range(subscribers):
+        bus.subscribe("bench", lambda change: None, 0)
+
+    def publish() -> None:
+        bus.publish("bench", 0, None, 1)
+        pending.pop()()
+
+    return measure(publish, repeats)
+
+
+# Edits the amount of num_events events within one tick, as a bulk edit
+# would, and counts the balance callbacks that reach subscribers
+def bench_bulk_edit(num_events: int) -> dict[str, float]:
+    pending: list[Callable] = list()
+    BUS.install_scheduler(pending.append)
+
+    callbacks = 0
+
+    def count(change) -> None:
+        nonlocal callbacks
+        callbacks += 1
+
+    subscriptions = [
+        account.subscribe_balance_changes(count)
+        for account in db.ACCOUNTS.values()
+    ]
+    events = db.fetch_events().exec()[:num_events]
+
+    start = time.perf_counter()
+    for event in events:
+        event.update_amount(event.amount + 1)
+    while len(pending) > 0:
+        pending.pop()()
+    elapsed = time.perf_counter() - start
+
+    for subscription in subscriptions:
+        subscription.cancel()
+    BUS.install_scheduler(None)
+
+    affected = {a for e in events for a in e.accounts if a in db.ACCOUNTS}
+    return {
+        "events": len(events),
+        "affected_accounts": len(affected),
+        "balance_callbacks": callbacks,
+        "elapsed_ms": elapsed * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Change bus fan-out cost and bulk edit coalescing"
+    )
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=1000)
+    args = parser.parse_args()
+
+    for subscribers in (1, 10, 100, 1000):
+        per_change = bench_fan_out(subscribers, args.repeats)["median_ms"]
+        print(
+            f"{subscribers:>5} subscribers: {per_change * 1e3:8.2f} us/change "
+            f"({per_change * 1e6 / subscribers:6.1f} ns/subscriber)"
+        )
+
+    for _ in scratch_ledgers([args.events]):
+        for name, value in bench_bulk_edit(args.events).items():
+            print(f"{name:>18}: {value:g}")
+        print(
+            "\n".join(
+                f"{name:>18}: {value:g}"
+                for name, value in BUS.metrics().items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> tuple[str, dict[tuple, float]]:
+    with open(path) as f:
+        report = json.load(f)
+    medians: dict[tuple, float] = dict()
+    for result in report["results"]:
+        if "median_ms" not in result:
+            continue
+        key = tuple(
+            result[field]
+            for field in ("benchmark", "case", "events", "accounts", "tags")
+        )
+        medians[key] = result["median_ms"]
+    return report.get("revision", path), medians
+
+
+# Compares the medians of two suite result files and exits with status 1
+# if any case got slower than threshold times its baseline
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare two benchmark suite result files"
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="slowdown ratio reported as a regression",
+    )
+    parser.add_argument(
+        "--all", action="store_true", help="list unchanged cases too"
+    )
+    args = parser.parse_args()
+
+    base_revision, baseline = load(args.baseline)
+    new_revision, candidate = load(args.candidate)
+    print(f"{base_revision} -> {new_revision}")
+
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key], candidate[key]
+        ratio = after / before if before > 0 else 1.0
+        if ratio >= args.threshold:
+            regressions += 1
+            label = "SLOWER"
+        elif ratio <= 1 / args.threshold:
+            label = "faster"
+        elif args.all:
+            label = ""
+        else:
+            continue
+        benchmark, case, events, _, _ = key
+        print(
+            f"{events:>9} {benchmark:>10} {case:<40} "
+            f"{before:10.3f} -> {after:10.3f} ms  x{ratio:5.2f} {label}"
+        )
+
+    for key in sorted(baseline.keys() ^ candidate.keys()):
+        side = "baseline" if key in baseline else "candidate"
+        print(f"only in {side}: {key[2]} {key[0]} {key[1]}")
+
+    print(f"{regressions} regressions over x{args.threshold}")
+    sys.exit(1 if regressions > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+
+import db
+from bench.ledger import DAYS_PER_YEAR, scratch_ledgers
+from bench.timing import measure
+
+WINDOW_DAYS = 15 * 7
+
+
+# exec() latency of 15 week windows spread evenly over the ledger, with the
+# mean number of events per window
+def bench_window_fetch(
+    first_date: int, num_days: int, repeats: int
+) -> dict[str, float]:
+    step = max(1, (num_days - WINDOW_DAYS) // repeats)
+    windows = iter(range(repeats))
+    fetched = 0
+
+    def fetch() -> None:
+        nonlocal fetched
+        after = first_date + next(windows) * step - 1
+        events = db.fetch_events().after(after).before(after + 1 + WINDOW_DAYS)
+        fetched += len(events.exec())
+
+    timing = measure(fetch, repeats)
+    return {**timing, "events_per_window": fetched // repeats}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Per-window (15 weeks) event fetch latency"
+    )
+    parser.add_argument(
+        "sizes", nargs="*", type=int, default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    first_date = 18000
+    num_days = args.years * DAYS_PER_YEAR
+    for size in scratch_ledgers(
+        args.sizes, first_date=first_date, num_days=num_days
+    ):
+        timing = bench_window_fetch(first_date, num_days, args.repeats)
+        print(
+            f"{size:>9} events: {timing['median_ms']:8.2f} ms/window "
+            f"({timing['events_per_window']} events/window)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+
+# Widgets are built and laid out without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+
+import db
+from bench.timing import measure
+from changes import LOADED_DAY, Change
+from db import EventRow
+from kui.calendar import LOADED_DAYS, InfiniteScrollArea, refresh_day
+from kui.dates import date_to_serial
+
+EXTEND_WEEKS = 5
+
+
+def application() -> QApplication:
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication([])
+    return app  # type: ignore[return-value]
+
+
+# Lets the area finish its fetches and deliver them before timing more
+def settle(area: InfiniteScrollArea) -> None:
+    area.loader.pool.waitForDone()
+    application().processEvents()
+
+
+def discard_area(area: InfiniteScrollArea) -> None:
+    settle(area)
+    area.deleteLater()
+    application().processEvents()
+    # Days of the deleted area must not receive refreshes
+    LOADED_DAYS.clear()
+    db.LOADED_EVENTS.clear()
+
+
+def open_area(painted: bool) -> InfiniteScrollArea:
+    area = InfiniteScrollArea(painted)
+    area.resize(800, 600)
+    area.populate()
+    settle(area)
+    return area
+
+
+# Time to build the initial window and to extend it by EXTEND_WEEKS in each
+# direction once the week pool is full, layout included, fetches excluded
+def bench_extension(painted: bool, repeats: int) -> dict[str, dict]:
+    results: dict[str, dict] = dict()
+    app = application()
+
+    created: list[InfiniteScrollArea] = list()
+
+    def populate() -> None:
+        area = InfiniteScrollArea(painted)
+        area.resize(800, 600)
+        area.populate()
+        app.processEvents()
+        created.append(area)
+
+    results["populate"] = measure(
+        populate, repeats, between=lambda: discard_area(created.pop())
+    )
+
+    area = open_area(painted)
+    while len(area.weeks) < area.pool_weeks:
+        area.extend_downwards(EXTEND_WEEKS)
+        settle(area)
+
+    def extend(downwards: bool) -> None:
+        if downwards:
+            area.extend_downwards(EXTEND_WEEKS)
+        else:
+            area.extend_upwards(EXTEND_WEEKS)
+        app.processEvents()
+
+    for direction, downwards in (("down", True), ("up", False)):
+        results[f"extend {direction} x{EXTEND_WEEKS}"] = measure(
+            lambda: extend(downwards), repeats, between=lambda: settle(area)
+        )
+
+    discard_area(area)
+    return results
+
+
+# Time for a visible day to redraw after its events changed, with
+# events_per_day events loaded on it
+def bench_refresh_day(
+    painted: bool, events_per_day: int, repeats: int
+) -> dict:
+    app = application()
+    area = open_area(painted)
+    serial = date_to_serial(area.first_visible_day())
+
+    loaded = len(db.LOADED_EVENTS.on(serial))
+    for i in range(loaded, events_per_day):
+        db.LOADED_EVENTS.add(EventRow(-1 - i, serial, 100, f"Event {i}"))
+    app.processEvents()
+
+    change = Change(LOADED_DAY, serial, None, None)
+
+    def refresh() -> None:
+        refresh_day(change)
+        area.viewport().repaint()
+        app.processEvents()
+
+    result = measure(refresh, repeats)
+    discard_area(area)
+    return result
+
+
+def run(repeats: int) -> dict[str, dict]:
+    results: dict[str, dict] = dict()
+    for painted in (False, True):
+        kind = "painted" if painted else "widgets"
+        for case, timing in bench_extension(painted, repeats).items():
+            results[f"{kind} {case}"] = timing
+        for events_per_day in (1, 10, 50):
+            results[f"{kind} refresh_day x{events_per_day}"] = (
+                bench_refresh_day(painted, events_per_day, repeats)
+            )
+    return results
@@ -0,0 +1,196 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from bisect import bisect
+from collections.abc import Iterable, Iterator
+from itertools import accumulate
+
+import db
+
+DAYS_PER_YEAR = 365
+
+PAYEES = (
+    "Grocery Store",
+    "Coffee Shop",
+    "Gas Station",
+    "Pharmacy",
+    "Bookstore",
+    "Hardware Store",
+    "Restaurant",
+    "Bakery",
+    "Cinema",
+    "Gym",
+    "Electric Company",
+    "Water Utility",
+    "Internet Provider",
+    "Landlord",
+    "Insurance",
+    "Payroll",
+    "Bank Transfer",
+    "Airline",
+    "Hotel",
+    "Taxi",
+)
+DESCRIPTIONS = (
+    "weekly",
+    "monthly",
+    "refund",
+    "deposit",
+    "subscription",
+    "groceries",
+    "rent",
+    "salary",
+    "dinner",
+    "lunch",
+    "fuel",
+    "tickets",
+    "books",
+    "repairs",
+    "medicine",
+    "travel",
+    "gift",
+    "fees",
+    "interest",
+    "transfer",
+)
+
+
+# (count, weight) of how many accounts and tags an event links to: most
+# events move money between two accounts, few carry more than two tags
+ACCOUNT_FAN_OUT = ((1, 30), (2, 60), (3, 10))
+TAG_FAN_OUT = ((0, 20), (1, 40), (2, 25), (3, 10), (4, 5))
+
+
+# Cumulative weights of ids 1..n under a Zipf-like law, so a few accounts
+# and tags carry most events as in a real ledger
+def popularity(n: int, skew: float) -> list[float]:
+    return list(accumulate(1 / rank**skew for rank in range(1, n + 1)))
+
+
+def pick(rng: random.Random, fan_out: tuple[tuple[int, int], ...]) -> int:
+    counts, weights = zip(*fan_out)
+    return rng.choices(counts, weights)[0]
+
+
+# k distinct ids drawn by popularity
+def sample_ids(
+    rng: random.Random, cum_weights: list[float], k: int
+) -> list[int]:
+    ids: list[int] = list()
+    k = min(k, len(cum_weights))
+    total = cum_weights[-1] if k > 0 else 0.0
+    while len(ids) < k:
+        id = bisect(cum_weights, rng.random() * total) + 1
+        if id not in ids:
+            ids.append(id)
+    return ids
+
+
+# Writes a deterministic ledger for seed into a fresh database at path and
+# leaves db using it with its registries loaded
+def generate_ledger(
+    path: str,
+    num_events: int,
+    num_accounts: int = 20,
+    num_tags: int = 20,
+    first_date: int = 18000,
+    num_days: int = 10 * DAYS_PER_YEAR,
+    seed: int = 0,
+    skew: float = 1.1,
+) -> None:
+    db.close_database()
+    for leftover in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    db.open_database(path, load_registries=False)
+
+    rng = random.Random(seed)
+
+    # A fresh database numbers accounts, tags and events from 1
+    for i in range(1, num_accounts + 1):
+        db.insert_account(f"Account{i}", "", None, None)
+    for i in range(1, num_tags + 1):
+        db.insert_tag(f"Tag{i}", "")
+    account_weights = popularity(num_accounts, skew)
+    tag_weights = popularity(num_tags, skew)
+
+    batch = 10000
+    for start in range(1, num_events + 1, batch):
+        ids = range(start, min(start + batch, num_events + 1))
+        events = [
+            (
+                first_date + rng.randrange(num_days),
+                rng.randrange(1, 100000),
+                f"{rng.choice(PAYEES)} {rng.choice(DESCRIPTIONS)}",
+                f"{rng.choice(DESCRIPTIONS)} #{id}",
+            )
+            for id in ids
+        ]
+
+        rows: list[tuple] = list()
+        for date, amount, name, memo in events:
+            account_ids = sample_ids(
+                rng, account_weights, pick(rng, ACCOUNT_FAN_OUT)
+            )
+            accounts: dict[int, bool] = dict()
+            for i, account_id in enumerate(account_ids):
+                # Transfers debit one account and credit the other
+                if len(account_ids) == 2:
+                    accounts[account_id] = i == 1
+                else:
+                    accounts[account_id] = rng.random() < 0.5
+            tag_ids = sample_ids(rng, tag_weights, pick(rng, TAG_FAN_OUT))
+            rows.append((date, amount, name, memo, accounts, tag_ids))
+        db.insert_events(rows)
+
+    db.commit_changes()
+    db.load_account_registry()
+    db.load_tag_registry()
+
+
+# Generates a ledger of each size in a scratch directory in turn and yields
+# the size once db uses it. options are passed on to generate_ledger.
+def scratch_ledgers(sizes: Iterable[int], **options) -> Iterator[int]:
+    with tempfile.TemporaryDirectory() as scratch:
+        for size in sizes:
+            start = time.perf_counter()
+            generate_ledger(
+                os.path.join(scratch, f"ledger_{size}.db"), size, **options
+            )
+            print(
+                f"{size:>9} events generated in "
+                f"{time.perf_counter() - start:.1f} s"
+            )
+            yield size
+        db.close_database()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic ledger into a scratch database"
+    )
+    parser.add_argument("path")
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=1.1)
+    args = parser.parse_args()
+
+    generate_ledger(
+        args.path,
+        args.events,
+        num_accounts=args.accounts,
+        num_tags=args.tags,
+        num_days=args.years * DAYS_PER_YEAR,
+        seed=args.seed,
+        skew=args.skew,
+    )
+    db.close_database()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import gc
+import tracemalloc
+from collections.abc import Callable
+
+import db
+from bench.ledger import scratch_ledgers
+
+
+# Bytes allocated per event by what load returns, while it is still alive
+def bytes_per_event(load: Callable) -> tuple[float, int]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    loaded = load()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / max(1, len(loaded)), len(loaded)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Memory per loaded event for each representation"
+    )
+    parser.add_argument("sizes", nargs="*", type=int, default=[100000])
+    args = parser.parse_args()
+
+    representations: dict[str, Callable] = {
+        "Event": lambda: db.fetch_events().exec(),
+        "EventRow": lambda: db.fetch_events(db.EventRow.COLUMNS).exec_rows(
+            db.EventRow
+        ),
+        "EventBatch": lambda: db.fetch_events().exec_batch(),
+    }
+
+    for size in scratch_ledgers(args.sizes):
+        for name, load in representations.items():
+            per_event, count = bytes_per_event(load)
+            print(
+                f"{size:>9} events, {name:>10}: "
+                f"{per_event:7.1f} bytes/event ({count} loaded)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import argparse
+
+import db
+from bench.ledger import scratch_ledgers
+from bench.timing import measure
+
+QUERIES = ("g", "gr", "gro", "groc", "grocery w", "coffee shop lunch", "rent")
+
+
+def bench_search_as_you_type(repeats: int) -> dict[str, dict]:
+    return {
+        text: measure(lambda: db.search_as_you_type(text), repeats)
+        for text in QUERIES
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search-as-you-type latency")
+    parser.add_argument("sizes", nargs="*", type=int, default=[1000000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    for size in scratch_ledgers(args.sizes):
+        for text, timing in bench_search_as_you_type(args.repeats).items():
+            print(
+                f"{size:>9} events, {text!r:>20}: "
+                f"{timing['median_ms']:6.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import argparse
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from itertools import combinations, islice
+
+import db
+from bench.ledger import DAYS_PER_YEAR, scratch_ledgers
+from bench.timing import measure
+
+FIRST_DATE = 18000
+WINDOW_DAYS = 15 * 7
+
+Filter = Callable[[db.EventFetcher, int], db.EventFetcher]
+
+# One representative filter per kind, combined in every subset. day is a
+# date in the middle of the ledger.
+CATEGORIES: dict[str, Filter] = {
+    "date": lambda f, day: f.after(day - 1).before(day + WINDOW_DAYS),
+    "amount": lambda f, day: f.amount_greater(50000),
+    "name": lambda f, day: f.name_contains("Coffee"),
+    "search": lambda f, day: f.has_prefix("groc"),
+    "tags": lambda f, day: f.any_tags(1, 2),
+    "accounts": lambda f, day: f.any_accounts(1),
+}
+
+# Every EventFetcher filter on its own
+FILTERS: dict[str, Filter] = {
+    "id_is": lambda f, day: f.id_is(1),
+    "before": lambda f, day: f.before(day),
+    "after": lambda f, day: f.after(day),
+    "on": lambda f, day: f.on(day),
+    "amount_less": lambda f, day: f.amount_less(1000),
+    "amount_greater": lambda f, day: f.amount_greater(99000),
+    "name_is": lambda f, day: f.name_is("Coffee Shop lunch"),
+    "name_contains": lambda f, day: f.name_contains("Coffee"),
+    "matches": lambda f, day: f.matches("coffee OR lunch"),
+    "has_words": lambda f, day: f.has_words("coffee lunch"),
+    "has_prefix": lambda f, day: f.has_prefix("groc"),
+    "has_phrase": lambda f, day: f.has_phrase("coffee shop"),
+    "any_tags": lambda f, day: f.any_tags(1, 2),
+    "all_tags": lambda f, day: f.all_tags(1, 2),
+    "no_tags": lambda f, day: f.no_tags(1),
+    "any_accounts": lambda f, day: f.any_accounts(1),
+    "all_accounts": lambda f, day: f.all_accounts(1, 2),
+    "no_accounts": lambda f, day: f.no_accounts(1),
+}
+
+
+def fetch_cases() -> dict[str, list[Filter]]:
+    cases = {name: [apply] for name, apply in FILTERS.items()}
+    for size in range(2, len(CATEGORIES) + 1):
+        for names in combinations(CATEGORIES, size):
+            cases["+".join(names)] = [CATEGORIES[name] for name in names]
+    return cases
+
+
+# exec() latency of every filter and combination of filter kinds. Cases
+# matching more than max_rows events are recorded as skipped.
+def bench_fetch(day: int, repeats: int, max_rows: int) -> dict[str, dict]:
+    results: dict[str, dict] = dict()
+    for case, filters in fetch_cases().items():
+
+        def fetcher() -> db.EventFetcher:
+            f = db.fetch_events()
+            for apply in filters:
+                apply(f, day)
+            return f
+
+        rows = fetcher().count()
+        if rows > max_rows:
+            results[case] = {"rows": rows, "skipped": True}
+            continue
+        results[case] = {
+            "rows": rows,
+            **measure(lambda: fetcher().exec(), repeats),
+        }
+    return results
+
+
+# The count earliest events, hydrated
+def earliest_events(count: int) -> list[db.Event]:
+    return list(islice(db.fetch_events().iter_events(), count))
+
+
+# Write paths inside a transaction that is rolled back afterwards, so every
+# case sees the generated ledger
+def bench_writes(day: int, repeats: int) -> dict[str, dict]:
+    results: dict[str, dict] = dict()
+
+    results["insert_event"] = measure(
+        lambda: db.insert_event(
+            day, 1234, "Coffee Shop lunch", "bench", {1: False, 2: True}, (1,)
+        ),
+        repeats,
+    )
+    db.rollback_changes()
+
+    for size in (1, 100):
+        events = earliest_events(size * repeats)
+        batches = [events[i : i + size] for i in range(0, len(events), size)]
+        for event in events:
+            event.amount += 1
+
+        pending = iter(batches)
+        results[f"alter_events x{size}"] = measure(
+            lambda: db.alter_events(*next(pending)), len(batches)
+        )
+        db.rollback_changes()
+
+        pending = iter(batches)
+        results[f"erase_events x{size}"] = measure(
+            lambda: db.erase_events(*next(pending)), len(batches)
+        )
+        db.rollback_changes()
+
+    return results
+
+
+def bench_registries(repeats: int) -> dict[str, dict]:
+    return {
+        "fetch_all_registered_accounts": measure(
+            db.fetch_all_registered_accounts, repeats
+        ),
+        "fetch_all_registered_tags": measure(
+            db.fetch_all_registered_tags, repeats
+        ),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark db and calendar hot paths on synthetic ledgers"
+    )
+    parser.add_argument("sizes", nargs="*", type=int, default=[10000, 100000])
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--tags", type=int, default=100)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument(
+        "--max-rows",
+        type=int,
+        default=250000,
+        help="skip fetch cases matching more events than this",
+    )
+    parser.add_argument(
+        "--no-gui", action="store_true", help="skip the calendar benchmarks"
+    )
+    parser.add_argument(
+        "--output", help="results file, bench-<revision>.json by default"
+    )
+    args = parser.parse_args()
+
+    revision = git_revision()
+    output = args.output or f"bench-{revision}.json"
+    num_days = args.years * DAYS_PER_YEAR
+    day = FIRST_DATE + num_days // 2
+
+    gui = None
+    if not args.no_gui:
+        try:
+            import bench.gui as gui
+        except ImportError as e:
+            print(f"Skipping calendar benchmarks: {e}", file=sys.stderr)
+
+    results: list[dict] = list()
+
+    def record(benchmark: str, size: int, cases: dict[str, dict]) -> None:
+        for case, timing in cases.items():
+            results.append(
+                {
+                    "benchmark": benchmark,
+                    "case": case,
+                    "events": size,
+                    "accounts": args.accounts,
+                    "tags": args.tags,
+                    **timing,
+                }
+            )
+            median = timing.get("median_ms")
+            shown = "skipped" if median is None else f"{median:10.3f} ms"
+            print(f"{size:>9} {benchmark:>10} {case:<40} {shown}")
+
+    for size in scratch_ledgers(
+        args.sizes,
+        num_accounts=args.accounts,
+        num_tags=args.tags,
+        first_date=FIRST_DATE,
+        num_days=num_days,
+        seed=args.seed,
+    ):
+        record("registries", size, bench_registries(args.repeats))
+        record("fetch", size, bench_fetch(day, args.repeats, args.max_rows))
+        record("writes", size, bench_writes(day, args.repeats))
+        if gui is not None:
+            record("calendar", size, gui.run(args.repeats))
+
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "revision": revision,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "years": args.years,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Wrote {len(results)} results to {output}")
+
+
+if __name__ == "__main__":
+    main()
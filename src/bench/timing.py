@@ -0,0 +1,27 @@
+import time
+from collections.abc import Callable
+
+
+# Runs run repeats times and summarizes the samples in milliseconds.
+# between, if given, runs untimed after each sample, e.g. to reset state.
+def measure(
+    run: Callable[[], object],
+    repeats: int,
+    between: Callable[[], object] | None = None,
+) -> dict[str, float]:
+    samples: list[float] = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+        if between is not None:
+            between()
+
+    samples.sort()
+    return {
+        "median_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[min(len(samples) - 1, len(samples) * 95 // 100)]
+        * 1000,
+        "min_ms": samples[0] * 1000,
+        "repeats": len(samples),
+    }
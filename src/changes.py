@@ -0,0 +1,172 @@
+import time
+import weakref
+from collections.abc import Callable
+from types import MethodType
+
+# Topics published by db. Keys are account ids for the account topics, tag
+# ids for the tag topics and date serials for LOADED_DAY.
+ACCOUNT_NAME = "account.name"
+ACCOUNT_BALANCE = "account.balance"
+ACCOUNT_LIMITS = "account.limits"
+ACCOUNT_REGISTRY = "accounts"
+TAG_NAME = "tag.name"
+TAG_REGISTRY = "tags"
+LOADED_DAY = "loaded.day"
+
+
+class Change:
+    __slots__ = ("topic", "key", "old", "new", "published_at")
+
+    def __init__(self, topic: str, key, old, new) -> None:
+        self.topic = topic
+        self.key = key
+        self.old = old
+        self.new = new
+        self.published_at = time.perf_counter()
+
+
+class Subscription:
+    def __init__(
+        self, bus: "ChangeBus", topic: str, key, callback: Callable
+    ) -> None:
+        self.bus = bus
+        self.topic = topic
+        self.key = key
+        # Bound methods are held weakly so subscribing does not keep the
+        # receiver alive. Other callables are held until cancelled.
+        self.callback: Callable[[], Callable | None]
+        if isinstance(callback, MethodType):
+            self.callback = weakref.WeakMethod(callback)
+        else:
+            self.callback = lambda: callback
+        self.active = True
+
+    def cancel(self) -> None:
+        if self.active:
+            self.active = False
+            self.bus._remove(self)
+
+
+# Delivers changes to subscribers of a topic, either for one key or for
+# every key (key=None). While a scheduler is installed, changes are queued
+# and coalesced per (topic, key) until the scheduled flush: subscribers get
+# one Change holding the first old value and the latest new value, or none
+# if the value ended where it started (e.g. a tag tracked and untracked in
+# the same tick). Changes published with old == new, like LOADED_DAY, are
+# always delivered. Without a scheduler, changes are delivered as they are
+# published. Used from one thread.
+class ChangeBus:
+    def __init__(self) -> None:
+        self.subscriptions: dict[tuple[str, object], list[Subscription]] = (
+            dict()
+        )
+        self.pending: dict[tuple[str, object], Change] = dict()
+        # Pending changes whose first publish changed a value
+        self.valued: set[tuple[str, object]] = set()
+        self.scheduler: Callable[[Callable], None] | None = None
+
+        self.published = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.flushes = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    # scheduler(flush) must arrange for flush to run soon, e.g. on the next
+    # event loop tick
+    def install_scheduler(
+        self, scheduler: Callable[[Callable], None] | None
+    ) -> None:
+        self.scheduler = scheduler
+        if scheduler is None:
+            self.flush()
+
+    def subscribe(
+        self, topic: str, callback: Callable, key=None
+    ) -> Subscription:
+        subscription = Subscription(self, topic, key, callback)
+        self.subscriptions.setdefault((topic, key), list()).append(
+            subscription
+        )
+        return subscription
+
+    def _remove(self, subscription: Subscription) -> None:
+        subscriptions = self.subscriptions.get(
+            (subscription.topic, subscription.key)
+        )
+        if subscriptions is not None and subscription in subscriptions:
+            subscriptions.remove(subscription)
+            if len(subscriptions) == 0:
+                self.subscriptions.pop((subscription.topic, subscription.key))
+
+    def publish(self, topic: str, key=None, old=None, new=None) -> None:
+        self.published += 1
+        if self.scheduler is None:
+            self.deliver(Change(topic, key, old, new))
+            return
+
+        change = self.pending.get((topic, key))
+        if change is not None:
+            self.coalesced += 1
+            change.new = new
+            return
+
+        if len(self.pending) == 0:
+            self.scheduler(self.flush)
+        self.pending[(topic, key)] = Change(topic, key, old, new)
+        if old != new:
+            self.valued.add((topic, key))
+
+    def flush(self) -> None:
+        if len(self.pending) == 0:
+            return
+        self.flushes += 1
+        pending = self.pending
+        valued = self.valued
+        self.pending = dict()
+        self.valued = set()
+        for key, change in pending.items():
+            if key in valued and change.old == change.new:
+                self.dropped += 1
+                continue
+            self.deliver(change)
+
+    def deliver(self, change: Change) -> None:
+        latency = time.perf_counter() - change.published_at
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+        for key in (change.key, None):
+            # Subscribers may cancel themselves or others while being called
+            for subscription in list(
+                self.subscriptions.get((change.topic, key), ())
+            ):
+                callback = subscription.callback()
+                if callback is None:
+                    subscription.cancel()
+                    continue
+                if subscription.active:
+                    self.delivered += 1
+                    callback(change)
+            if change.key is None:
+                break
+
+    def metrics(self) -> dict[str, float]:
+        deliveries = self.published - self.coalesced - self.dropped
+        return {
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "callbacks": self.delivered,
+            "mean_latency_ms": (
+                self.latency_total / deliveries * 1000
+                if deliveries > 0
+                else 0.0
+            ),
+            "max_latency_ms": self.latency_max * 1000,
+        }
+
+
+BUS = ChangeBus()
@@ -1,11 +1,179 @@
+import queue
 import sqlite3
-from collections.abc import Callable
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Future
+from functools import lru_cache
 from typing import Self
 
-_conn = sqlite3.connect("kfp.db")
+import instrument
+from changes import (
+    ACCOUNT_BALANCE,
+    ACCOUNT_LIMITS,
+    ACCOUNT_NAME,
+    ACCOUNT_REGISTRY,
+    BUS,
+    LOADED_DAY,
+    TAG_NAME,
+    TAG_REGISTRY,
+    Subscription,
+)
+
+DB_PATH = "kfp.db"
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    # Each connection is used by one thread, but close_database closes them
+    # all from the main thread
+    conn = sqlite3.connect(path, check_same_thread=False)
+    # WAL lets the writer thread commit while other connections read
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+# Nothing is opened on import. open_database connects the main thread and
+# brings the schema and registries up; other threads then open their own
+# connection to the same path on first use.
+_conn: sqlite3.Connection | None = None
+_path = DB_PATH
+_open_lock = threading.RLock()
+# Counts open_database calls, so threads drop connections to a database
+# that has since been closed
+_opened = 0
+# Connections other threads made to the open database, closed with it
+_thread_conns: list[sqlite3.Connection] = list()
+
+# Each thread uses its own connection, the main thread uses _conn
+_local = threading.local()
+
+
+def _db() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.opened == _opened:
+        # Instrumentation was toggled since this thread last queried
+        if _local.generation != instrument.generation:
+            _use(conn)
+        return conn
+    with _open_lock:
+        if _conn is None:
+            if threading.current_thread() is not threading.main_thread():
+                raise RuntimeError("The database is not open")
+            # Used before open_database, e.g. by a script
+            open_database(_path)
+            return _local.conn
+        conn = _connect(_path)
+        _thread_conns.append(conn)
+        return _use(conn)
+
+
+def _use(conn: sqlite3.Connection) -> sqlite3.Connection:
+    _local.conn = conn
+    _local.opened = _opened
+    _local.generation = instrument.generation
+    instrument.sync(conn)
+    return conn
+
+
+# Only the main thread opens and closes the database, since loading the
+# registries publishes on the single-threaded change bus. Reopening closes
+# the previous database first, other threads reconnect on their next query.
+def open_database(path: str = DB_PATH, load_registries: bool = True) -> None:
+    global _conn, _path, _opened
+    if threading.current_thread() is not threading.main_thread():
+        raise RuntimeError(
+            "The database can only be opened by the main thread"
+        )
+    with _open_lock:
+        if _conn is not None:
+            close_database()
+        _path = path
+        _opened += 1
+        _conn = _use(_connect(path))
+        __initialize_schema__()
+    if load_registries:
+        load_account_registry()
+        load_tag_registry()
+
+
+# Closes every thread's connection, so stop the writer and let fetches
+# finish first
+def close_database() -> None:
+    global _conn
+    if _conn is None:
+        return
+    untrack_accounts(*ACCOUNTS.values())
+    untrack_tags(*TAGS.values())
+    LOADED_EVENTS.clear()
+    with _open_lock:
+        for conn in _thread_conns:
+            conn.close()
+        _thread_conns.clear()
+        _conn.close()
+        _conn = None
+    _local.conn = None
+
+
+# Registries start empty and fill in once the database is open. Each item
+# is published as tracked, so views populate from the same notifications
+# they use for later edits.
+def load_account_registry() -> None:
+    for account in fetch_all_registered_accounts():
+        track_account(account)
+
+
+def load_tag_registry() -> None:
+    for tag in fetch_all_registered_tags():
+        track_tag(tag)
+
+
+# Containers shared between fetched events with the same accounts or tags.
+# Events never mutate them: accounts are copied before the first change and
+# tag_ids is an immutable tuple.
+_SHARED_ACCOUNTS: dict[tuple[tuple[int, bool], ...], dict[int, bool]] = dict()
+_SHARED_TAGS: dict[tuple[int, ...], tuple[int, ...]] = dict()
+_SHARED_LIMIT = 4096
+
+
+def _shared_accounts(accounts: dict[int, bool]) -> dict[int, bool]:
+    key = tuple(sorted(accounts.items()))
+    shared = _SHARED_ACCOUNTS.get(key)
+    if shared is None:
+        if len(_SHARED_ACCOUNTS) >= _SHARED_LIMIT:
+            _SHARED_ACCOUNTS.clear()
+        shared = _SHARED_ACCOUNTS[key] = accounts
+    return shared
+
+
+def _shared_tags(tag_ids: Iterable[int]) -> tuple[int, ...]:
+    key = tuple(tag_ids)
+    shared = _SHARED_TAGS.get(key)
+    if shared is None:
+        if len(_SHARED_TAGS) >= _SHARED_LIMIT:
+            _SHARED_TAGS.clear()
+        shared = _SHARED_TAGS[key] = key
+    return shared
 
 
 class Event:
+    __slots__ = (
+        "id",
+        "date",
+        "amount",
+        "name",
+        "memo",
+        "accounts",
+        "tag_ids",
+        "row",
+    )
+
     def __init__(
         self,
         id: int,
@@ -14,7 +182,7 @@ class Event:
         name: str,
         memo: str,
         accounts: dict[int, bool],
-        tag_ids: list[int],
+        tag_ids: Iterable[int],
     ) -> None:
         self.id = id
         self.date = date
@@ -22,15 +190,32 @@ class Event:
         self.name = name
         self.memo = memo
         self.accounts = accounts
-        self.tag_ids = tag_ids
+        self.tag_ids = tuple(tag_ids)
+        # The calendar row this event was hydrated from, kept in step
+        self.row: EventRow | None = None
 
     def __str__(self) -> str:
         return "\n".join(
-            [f"{str(f)}: {str(v)}" for f, v in self.__dict__.items()]
+            [f"{f}: {getattr(self, f)}" for f in self.__slots__]
+        )
+
+    # A detached copy for a job on the writer thread, which must not read
+    # an event the GUI may still be editing
+    def snapshot(self) -> "Event":
+        return Event(
+            self.id,
+            self.date,
+            self.amount,
+            self.name,
+            self.memo,
+            dict(self.accounts),
+            self.tag_ids,
         )
 
     def update_date(self, new_date: int) -> None:
         self.date = new_date
+        if self.row is not None and self.row in LOADED_EVENTS:
+            LOADED_EVENTS.move(self.row, new_date)
 
     def update_amount(self, new_amount: int) -> None:
         for account_id, is_credit in self.accounts.items():
@@ -38,20 +223,38 @@ class Event:
             if account is None:
                 continue
 
-            print(account.balance, new_amount, self.amount)
             new_balance = account.balance + (
                 (new_amount - self.amount) * (1 if is_credit else -1)
             )
             account.update_balance(new_balance)
         self.amount = new_amount
+        if self.row is not None:
+            self.row.amount = new_amount
+            LOADED_EVENTS.touch(self.row)
 
     def update_name(self, new_name: str) -> None:
         self.name = new_name
+        if self.row is not None:
+            self.row.name = new_name
+            LOADED_EVENTS.touch(self.row)
 
     def update_memo(self, new_memo: str) -> None:
         self.memo = new_memo
 
+    def update_tags(self, removed: list[int], added: list[int]) -> None:
+        self.tag_ids = tuple(
+            tag_id for tag_id in self.tag_ids if tag_id not in removed
+        ) + tuple(added)
+        for tag_ids, change in ((removed, -1), (added, 1)):
+            for tag_id in tag_ids:
+                tag = TAGS.get(tag_id)
+                if tag is not None:
+                    tag.record_use(change)
+
     def update_accounts(self, changes: dict[int, int]) -> None:
+        # The accounts dict may be shared with other fetched events
+        if len(changes) > 0:
+            self.accounts = dict(self.accounts)
         for account_id, change in changes.items():
             account = ACCOUNTS.get(account_id)
             if account is None:
@@ -85,15 +288,64 @@ class Event:
                 case _:
                     raise RuntimeError("Invalid change id")
 
-            print(account.balance, balance_change)
             account.update_balance(account.balance + balance_change)
 
 
+# What the calendar keeps per loaded event. The full Event, with memo,
+# accounts and tags, is only hydrated when the event is opened.
+class EventRow:
+    __slots__ = ("id", "date", "amount", "name", "event")
+
+    COLUMNS = "id, date, amount, name"
+
+    def __init__(self, id: int, date: int, amount: int, name: str) -> None:
+        self.id = id
+        self.date = date
+        self.amount = amount
+        # Recurring events repeat names, loaded rows share one string each
+        self.name = sys.intern(name)
+        self.event: Event | None = None
+
+    @classmethod
+    def of(cls, event: Event) -> "EventRow":
+        row = cls(event.id, event.date, event.amount, event.name)
+        row.event = event
+        event.row = row
+        return row
+
+
+@instrument.operation
+def hydrate_event(row: EventRow) -> Event:
+    if row.event is None:
+        events = fetch_events().id_is(row.id).exec()
+        if len(events) == 0:
+            raise RuntimeError("Tried to open an event that doesn't exist")
+        row.event = events[0]
+        row.event.row = row
+    return row.event
+
+
 class Tag:
-    def __init__(self, id: int, name: str, description: str) -> None:
+    def __init__(
+        self, id: int, name: str, description: str, usage: int = 0
+    ) -> None:
         self.id = id
         self.name = name
         self.description = description
+        # Number of events carrying the tag
+        self.usage = usage
+        # time.monotonic() of the last time the tag was added to an event
+        self.last_used = 0.0
+
+    def update_name(self, new_name: str) -> None:
+        old_name = self.name
+        self.name = new_name
+        BUS.publish(TAG_NAME, self.id, old_name, new_name)
+
+    def record_use(self, change: int) -> None:
+        self.usage += change
+        if change > 0:
+            self.last_used = time.monotonic()
 
 
 class Account:
@@ -112,46 +364,196 @@ class Account:
         self.min_balance = min_balance
         self.max_balance = max_balance
         self.balance = balance
-        self.name_listeners: list[Callable] = list()
-        self.balance_listeners: list[Callable] = list()
 
     def update_name(self, new_name: str) -> None:
         old_name = self.name
         self.name = new_name
-        self.signal_name_changes(old_name, new_name)
+        BUS.publish(ACCOUNT_NAME, self.id, old_name, new_name)
 
-    def subscribe_name_changes(self, callback: Callable) -> int:
-        self.name_listeners.append(callback)
-        return len(self.name_listeners) - 1
+    # Callbacks receive a changes.Change with the old and new name
+    def subscribe_name_changes(self, callback: Callable) -> Subscription:
+        return BUS.subscribe(ACCOUNT_NAME, callback, self.id)
 
-    def unsubscribe_name_changes(self, callback_index: int) -> None:
-        self.name_listeners.pop(callback_index)
+    def update_limits(
+        self, min_balance: int | None, max_balance: int | None
+    ) -> None:
+        old_limits = (self.min_balance, self.max_balance)
+        self.min_balance = min_balance
+        self.max_balance = max_balance
+        BUS.publish(
+            ACCOUNT_LIMITS, self.id, old_limits, (min_balance, max_balance)
+        )
 
-    def signal_name_changes(self, old_name, new_name) -> None:
-        for callback in self.name_listeners:
-            callback(old_name, new_name)
+    def subscribe_limits_changes(self, callback: Callable) -> Subscription:
+        return BUS.subscribe(ACCOUNT_LIMITS, callback, self.id)
 
     def update_balance(self, new_balance: int) -> None:
         old_balance = self.balance
         self.balance = new_balance
-        self.signal_balance_changes(old_balance, new_balance)
-
-    def subscribe_balance_changes(self, callback: Callable) -> int:
-        self.balance_listeners.append(callback)
-        return len(self.balance_listeners) - 1
-
-    def unsubscribe_balance_changes(self, callback_index: int) -> None:
-        self.balance_listeners.pop(callback_index)
-
-    def signal_balance_changes(self, old_balance, new_balance) -> None:
-        for callback in self.balance_listeners:
-            callback(old_balance, new_balance)
-
+        BUS.publish(ACCOUNT_BALANCE, self.id, old_balance, new_balance)
+
+    # Callbacks receive a changes.Change with the old and new balance. Many
+    # updates within one event loop tick are delivered as one change.
+    def subscribe_balance_changes(self, callback: Callable) -> Subscription:
+        return BUS.subscribe(ACCOUNT_BALANCE, callback, self.id)
+
+
+# In-memory events keyed by date serial. Each day's events are kept in
+# insertion order and the dates with events are kept sorted, so lookups by
+# day are O(1), range queries and evictions at either end are O(log n) plus
+# the size of the result.
+class EventIndex:
+    def __init__(self) -> None:
+        self.by_date: dict[int, list[EventRow]] = dict()
+        self.dates: list[int] = list()
+        self.count = 0
+
+    # Callbacks receive a changes.Change keyed by the date serial of a day
+    # whose events were added, removed, reordered or edited. Evicted days
+    # are not reported.
+    def subscribe_changes(self, callback: Callable) -> Subscription:
+        return BUS.subscribe(LOADED_DAY, callback)
+
+    def signal_changes(self, date: int) -> None:
+        BUS.publish(LOADED_DAY, date)
+
+    def touch(self, event: EventRow) -> None:
+        if event in self:
+            self.signal_changes(event.date)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[EventRow]:
+        for date in self.dates:
+            yield from self.by_date[date]
+
+    def __contains__(self, event: object) -> bool:
+        if not isinstance(event, EventRow):
+            return False
+        return any(e is event for e in self.by_date.get(event.date, ()))
+
+    def on(self, date: int) -> list[EventRow]:
+        return self.by_date.get(date, list())
+
+    # Events with after < date < before, in date order
+    def range(self, after: int, before: int) -> list[EventRow]:
+        low = bisect_right(self.dates, after)
+        high = bisect_left(self.dates, before)
+        events: list[EventRow] = list()
+        for date in self.dates[low:high]:
+            events.extend(self.by_date[date])
+        return events
 
-def __initialize_schema__():
-    _conn.executescript(
-        """
-        BEGIN;
+    def add(self, event: EventRow) -> None:
+        self._add(event)
+        self.signal_changes(event.date)
+
+    def _add(self, event: EventRow) -> None:
+        events = self.by_date.get(event.date)
+        if events is None:
+            events = self.by_date[event.date] = list()
+            # Windows grow at the ends, so this is usually an append
+            if len(self.dates) == 0 or event.date > self.dates[-1]:
+                self.dates.append(event.date)
+            else:
+                insort(self.dates, event.date)
+        events.append(event)
+        self.count += 1
+
+    # Adds a fetched window, skipping events that are already loaded
+    def add_range(self, events: Iterable[EventRow]) -> None:
+        changed: set[int] = set()
+        for event in events:
+            day = self.by_date.get(event.date, ())
+            if not any(e.id == event.id for e in day):
+                self._add(event)
+                changed.add(event.date)
+        for date in sorted(changed):
+            self.signal_changes(date)
+
+    def remove(self, event: EventRow) -> None:
+        self._remove(event)
+        self.signal_changes(event.date)
+
+    def _remove(self, event: EventRow) -> None:
+        events = self.by_date.get(event.date)
+        if events is None:
+            raise RuntimeError("Tried to remove an event that isn't loaded")
+        for i, e in enumerate(events):
+            if e is event:
+                events.pop(i)
+                break
+        else:
+            raise RuntimeError("Tried to remove an event that isn't loaded")
+        self.count -= 1
+        if len(events) == 0:
+            self.by_date.pop(event.date)
+            self.dates.pop(bisect_left(self.dates, event.date))
+
+    def move(self, event: EventRow, new_date: int) -> None:
+        old_date = event.date
+        self._remove(event)
+        event.date = new_date
+        self._add(event)
+        self.signal_changes(old_date)
+        self.signal_changes(new_date)
+
+    def clear(self) -> None:
+        self.by_date.clear()
+        self.dates.clear()
+        self.count = 0
+
+    # Drops every event dated before date
+    def evict_before(self, date: int) -> None:
+        high = bisect_left(self.dates, date)
+        for d in self.dates[:high]:
+            self.count -= len(self.by_date.pop(d))
+        del self.dates[:high]
+
+    # Drops every event dated on or after date
+    def evict_from(self, date: int) -> None:
+        low = bisect_left(self.dates, date)
+        for d in self.dates[low:]:
+            self.count -= len(self.by_date.pop(d))
+        del self.dates[low:]
+
+
+_BALANCES_QUERY = """
+SELECT account.id, COALESCE(SUM(
+    CASE WHEN is_credit THEN amount ELSE -amount END
+), 0)
+FROM account
+LEFT JOIN event_accounts ON account_id = account.id
+LEFT JOIN event ON event.id = event_id
+GROUP BY account.id
+"""
+
+_BALANCES_AS_OF_QUERY = """
+SELECT account.id, COALESCE(SUM(
+    CASE WHEN is_credit THEN amount ELSE -amount END
+), 0)
+FROM account
+LEFT JOIN event_accounts ON account_id = account.id
+LEFT JOIN event ON event.id = event_id AND event.date <= ?
+GROUP BY account.id
+"""
+
+# Period of a date serial, as text that sorts chronologically. Weeks start
+# on Sunday like the calendar's.
+PERIODS = {
+    "day": "date(date * 86400, 'unixepoch')",
+    "week": "date((date - (date + 4) % 7) * 86400, 'unixepoch')",
+    "month": "strftime('%Y-%m', date * 86400, 'unixepoch')",
+    "year": "strftime('%Y', date * 86400, 'unixepoch')",
+}
+
+# Schema migrations, applied in order. PRAGMA user_version holds the number
+# of migrations a database has already received, so existing kfp.db files
+# are upgraded in place. Append new migrations, never edit applied ones.
+MIGRATIONS: list[str] = [
+    # 1: base schema
+    """
         CREATE TABLE IF NOT EXISTS event (
             id INTEGER PRIMARY KEY ASC,
             date INTEGER,
@@ -182,13 +584,131 @@ def __initialize_schema__():
             is_credit INTEGER,
             UNIQUE (event_id, account_id)
         );
-        COMMIT;
-        """
-    )
+    """,
+    # 2: maintained account balances, backfilled from the ledger
+    """
+        CREATE TABLE IF NOT EXISTS account_balance (
+            account_id INTEGER PRIMARY KEY,
+            balance INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TRIGGER IF NOT EXISTS account_balance_insert
+        AFTER INSERT ON account BEGIN
+            INSERT OR IGNORE INTO account_balance VALUES (new.id, 0);
+        END;
+        CREATE TRIGGER IF NOT EXISTS account_balance_delete
+        AFTER DELETE ON account BEGIN
+            DELETE FROM account_balance WHERE account_id = old.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS event_accounts_balance_insert
+        AFTER INSERT ON event_accounts BEGIN
+            UPDATE account_balance
+            SET balance = balance + COALESCE(
+                (SELECT amount FROM event WHERE id = new.event_id), 0
+            ) * (CASE WHEN new.is_credit THEN 1 ELSE -1 END)
+            WHERE account_id = new.account_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS event_accounts_balance_delete
+        AFTER DELETE ON event_accounts BEGIN
+            UPDATE account_balance
+            SET balance = balance - COALESCE(
+                (SELECT amount FROM event WHERE id = old.event_id), 0
+            ) * (CASE WHEN old.is_credit THEN 1 ELSE -1 END)
+            WHERE account_id = old.account_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS event_accounts_balance_update
+        AFTER UPDATE ON event_accounts BEGIN
+            UPDATE account_balance
+            SET balance = balance - COALESCE(
+                (SELECT amount FROM event WHERE id = old.event_id), 0
+            ) * (CASE WHEN old.is_credit THEN 1 ELSE -1 END)
+            WHERE account_id = old.account_id;
+            UPDATE account_balance
+            SET balance = balance + COALESCE(
+                (SELECT amount FROM event WHERE id = new.event_id), 0
+            ) * (CASE WHEN new.is_credit THEN 1 ELSE -1 END)
+            WHERE account_id = new.account_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS event_balance_update
+        AFTER UPDATE OF amount ON event BEGIN
+            UPDATE account_balance
+            SET balance = balance + (
+                COALESCE(new.amount, 0) - COALESCE(old.amount, 0)
+            ) * (
+                SELECT CASE WHEN is_credit THEN 1 ELSE -1 END
+                FROM event_accounts
+                WHERE event_id = new.id
+                AND account_id = account_balance.account_id
+            )
+            WHERE account_id IN (
+                SELECT account_id FROM event_accounts WHERE event_id = new.id
+            );
+        END;
+        CREATE TRIGGER IF NOT EXISTS event_delete_links
+        BEFORE DELETE ON event BEGIN
+            DELETE FROM event_accounts WHERE event_id = old.id;
+            DELETE FROM event_tags WHERE event_id = old.id;
+        END;
+        DELETE FROM account_balance;
+        INSERT INTO account_balance
+    """
+    + _BALANCES_QUERY
+    + ";",
+    # 3: indexes for the EventFetcher predicates and balance aggregation
+    """
+        CREATE INDEX IF NOT EXISTS event_date ON event (date);
+        CREATE INDEX IF NOT EXISTS event_amount ON event (amount);
+        CREATE INDEX IF NOT EXISTS event_name ON event (name);
+        CREATE INDEX IF NOT EXISTS event_tags_tag
+            ON event_tags (tag_id, event_id);
+        CREATE INDEX IF NOT EXISTS event_accounts_account
+            ON event_accounts (account_id, is_credit, event_id);
+    """,
+    # 4: full-text index over event names and memos, backfilled
+    """
+        CREATE VIRTUAL TABLE IF NOT EXISTS event_search USING fts5 (
+            name,
+            memo,
+            content = 'event',
+            content_rowid = 'id',
+            prefix = '1 2 3'
+        );
+        CREATE TRIGGER IF NOT EXISTS event_search_insert
+        AFTER INSERT ON event BEGIN
+            INSERT INTO event_search (rowid, name, memo)
+            VALUES (new.id, new.name, new.memo);
+        END;
+        CREATE TRIGGER IF NOT EXISTS event_search_delete
+        AFTER DELETE ON event BEGIN
+            INSERT INTO event_search (event_search, rowid, name, memo)
+            VALUES ('delete', old.id, old.name, old.memo);
+        END;
+        CREATE TRIGGER IF NOT EXISTS event_search_update
+        AFTER UPDATE OF name, memo ON event BEGIN
+            INSERT INTO event_search (event_search, rowid, name, memo)
+            VALUES ('delete', old.id, old.name, old.memo);
+            INSERT INTO event_search (rowid, name, memo)
+            VALUES (new.id, new.name, new.memo);
+        END;
+        INSERT INTO event_search (event_search) VALUES ('rebuild');
+    """,
+]
+
+
+def schema_version() -> int:
+    return _db().execute("PRAGMA user_version").fetchone()[0]
+
+
+def __initialize_schema__():
+    for version in range(schema_version(), len(MIGRATIONS)):
+        _db().executescript(
+            "BEGIN;\n"
+            + MIGRATIONS[version]
+            + f"\nPRAGMA user_version = {version + 1};\nCOMMIT;"
+        )
 
 
 def __reset_schema__():
-    cur = _conn.cursor()
+    cur = _db().cursor()
     print(
         cur.executescript(
             """
@@ -206,15 +726,16 @@ def __reset_schema__():
     # __initialize_schema__()
 
 
+@instrument.operation
 def insert_event(
     date: int,
     amount: int,
     name: str,
     memo: str,
     accounts: dict[int, bool],
-    tag_ids: list[int],
+    tag_ids: Sequence[int],
 ) -> Event:
-    cur = _conn.execute(
+    cur = _db().execute(
         "INSERT INTO event VALUES (?,?,?,?,?)",
         (None, date, amount, name, memo),
     )
@@ -227,7 +748,7 @@ def insert_event(
         raise RuntimeError("Could not obtain id for new event")
 
     if len(accounts) > 0:
-        _conn.executemany(
+        _db().executemany(
             "INSERT INTO event_accounts VALUES (?,?,?)",
             [
                 (id, account_id, is_credit)
@@ -241,7 +762,7 @@ def insert_event(
     #     account.update_balance(new_balance)
 
     if len(tag_ids) > 0:
-        _conn.executemany(
+        _db().executemany(
             "INSERT INTO event_tags VALUES (?,?)",
             [(id, tag_id) for tag_id in tag_ids],
         )
@@ -249,31 +770,92 @@ def insert_event(
     return Event(id, date, amount, name, memo, accounts, tag_ids)
 
 
+# Inserts many (date, amount, name, memo, accounts, tag_ids) events with
+# one executemany per table instead of three statements each. Returns the
+# new ids, in order.
+@instrument.operation
+def insert_events(
+    events: Iterable[
+        tuple[int, int, str, str, dict[int, bool], Sequence[int]]
+    ],
+) -> range:
+    events = list(events)
+    # The ids SQLite would pick, known upfront so links need no lookups
+    first_id = (
+        _db().execute("SELECT COALESCE(MAX(id), 0) + 1 FROM event").fetchone()
+    )[0]
+    ids = range(first_id, first_id + len(events))
+
+    _db().executemany(
+        "INSERT INTO event VALUES (?,?,?,?,?)",
+        [
+            (id, date, amount, name, memo)
+            for id, (date, amount, name, memo, _, _) in zip(ids, events)
+        ],
+    )
+    _db().executemany(
+        "INSERT INTO event_accounts VALUES (?,?,?)",
+        [
+            (id, account_id, is_credit)
+            for id, event in zip(ids, events)
+            for account_id, is_credit in event[4].items()
+        ],
+    )
+    _db().executemany(
+        "INSERT INTO event_tags VALUES (?,?)",
+        [
+            (id, tag_id)
+            for id, event in zip(ids, events)
+            for tag_id in event[5]
+        ],
+    )
+
+    return ids
+
+
+# Inserts a snapshot of a new event and returns its id, which the caller
+# assigns to the event itself
+@instrument.operation
+def store_event(event: Event) -> int:
+    return insert_event(
+        event.date,
+        event.amount,
+        event.name,
+        event.memo,
+        event.accounts,
+        event.tag_ids,
+    ).id
+
+
+@instrument.operation
 def alter_events(*events: Event) -> None:
-    _conn.executemany(
+    _db().executemany(
         "UPDATE event SET date = ?, amount = ?, name = ?, memo = ? WHERE id = ?",
         [(e.date, e.amount, e.name, e.memo, e.id) for e in events],
     )
 
 
+@instrument.operation
 def add_tags_to_event(event_id: int, tag_ids: list[int]) -> None:
-    _conn.executemany(
+    _db().executemany(
         "INSERT INTO event_tags VALUES (?,?)",
         [(event_id, tag_id) for tag_id in tag_ids],
     )
 
 
+@instrument.operation
 def remove_tags_from_event(event_id: int, tag_ids: list[int]) -> None:
-    _conn.executemany(
+    _db().executemany(
         "DELETE FROM event_tags WHERE event_id = ? AND tag_id = ?",
         [(event_id, tag_id) for tag_id in tag_ids],
     )
 
 
+@instrument.operation
 def add_accounts_to_event(
     event_id: int, accounts: list[tuple[int, bool]]
 ) -> None:
-    _conn.executemany(
+    _db().executemany(
         "INSERT INTO event_accounts VALUES (?,?,?)",
         [
             (event_id, account_id, is_credit)
@@ -282,102 +864,320 @@ def add_accounts_to_event(
     )
 
 
+@instrument.operation
 def toggle_account_type_for_event(
     event_id: int, account_ids: list[int]
 ) -> None:
-    _conn.executemany(
+    _db().executemany(
         "UPDATE event_accounts SET is_credit = NOT is_credit WHERE event_id = ? AND account_id = ?",
         [(event_id, account_id) for account_id in account_ids],
     )
 
 
+@instrument.operation
 def remove_accounts_from_event(event_id: int, account_ids: list[int]) -> None:
-    _conn.executemany(
+    _db().executemany(
         "DELETE FROM event_accounts WHERE event_id = ? AND account_id = ?",
         [(event_id, account_id) for account_id in account_ids],
     )
 
 
-def delete_events(*events: Event) -> None:
-    _conn.executemany(
+# Only touches the database. Account balances in memory, tag usage and the
+# loaded calendar are left to unload_events.
+@instrument.operation
+def erase_events(*events: Event) -> None:
+    # event_tags and event_accounts rows are removed by the
+    # event_delete_links trigger so the balance triggers still see the amount
+    _db().executemany(
         "DELETE FROM event WHERE id = ?", [(e.id,) for e in events]
     )
 
-    _conn.executemany(
-        "DELETE FROM event_tags WHERE event_id = ?", [(e.id,) for e in events]
-    )
-
-    _conn.executemany(
-        "DELETE FROM event_accounts WHERE event_id = ?",
-        [(e.id,) for e in events],
-    )
 
-    for e in events:
-        e.update_amount(0)
+def unload_events(*events: Event) -> None:
+    for event in events:
+        event.update_amount(0)
+        event.update_tags(list(event.tag_ids), list())
+        if event.row is not None and event.row in LOADED_EVENTS:
+            LOADED_EVENTS.remove(event.row)
 
 
-def _get_accounts_for_event(event_id: int) -> dict[int, bool]:
-    cur = _conn.execute(
-        "SELECT account_id, is_credit FROM event_accounts WHERE event_id = ?",
-        (event_id,),
+def delete_events(*events: Event) -> None:
+    erase_events(*events)
+    unload_events(*events)
+
+
+@instrument.subquery
+def _get_accounts_for_events(
+    id_query: str, params: list[int | str | None]
+) -> dict[int, dict[int, bool]]:
+    cur = _db().execute(
+        "SELECT event_id, account_id, is_credit FROM event_accounts "
+        f"WHERE event_id IN ({id_query})",
+        params,
     )
 
-    result = cur.fetchall()
-
-    accounts: dict[int, bool] = dict()
-    for account_id, is_credit in result:
-        accounts[account_id] = is_credit
+    accounts: dict[int, dict[int, bool]] = dict()
+    for event_id, account_id, is_credit in cur:
+        event_accounts = accounts.get(event_id)
+        if event_accounts is None:
+            event_accounts = accounts[event_id] = dict()
+        event_accounts[account_id] = is_credit
 
     return accounts
 
 
-def _get_tags_for_event(event_id: int) -> list[int]:
-    cur = _conn.execute(
-        "SELECT tag_id FROM event_tags WHERE event_id = ?",
-        (event_id,),
+@instrument.subquery
+def _get_tags_for_events(
+    id_query: str, params: list[int | str | None]
+) -> dict[int, list[int]]:
+    cur = _db().execute(
+        f"SELECT event_id, tag_id FROM event_tags WHERE event_id IN ({id_query})",
+        params,
     )
 
-    result = cur.fetchall()
-
-    tags: list[int] = list()
-    for tag_id in result:
-        tags.append(tag_id[0])
+    tags: dict[int, list[int]] = dict()
+    for event_id, tag_id in cur:
+        event_tags = tags.get(event_id)
+        if event_tags is None:
+            event_tags = tags[event_id] = list()
+        event_tags.append(tag_id)
 
     return tags
 
 
+# Compiled statements are cached by filter shape (the predicate templates,
+# not their parameters), so repeated fetches of the same kind reuse both
+# the SQL text and sqlite3's prepared statement for it
+@lru_cache(maxsize=256)
+def _compile_fetch(
+    columns: str,
+    predicates: tuple[str, ...],
+    order_by: str | None,
+    source: str = "event",
+    group_by: str | None = None,
+    limit: int | None = None,
+) -> str:
+    command = f"SELECT {columns} FROM {source}"
+    if len(predicates) > 0:
+        command += " WHERE " + " AND ".join(predicates)
+    if group_by is not None:
+        command += f" GROUP BY {group_by}"
+    if order_by is not None:
+        command += f" ORDER BY {order_by}"
+    if limit is not None:
+        command += f" LIMIT {limit}"
+    return command
+
+
+@lru_cache(maxsize=64)
+def _row_type(columns: str) -> type:
+    return namedtuple("Row", [c.strip() for c in columns.split(",")])
+
+
 class EventFetcher:
     def __init__(self, columns: str = "id, date, amount, name, memo") -> None:
+        self.columns = columns
         self.params: list[int | str | None] = list()
-        self.begin: list[str] = list()
         self.predicates: list[str] = list()
-        self.begin.append("".join(("SELECT ", columns, " FROM event")))
-        self.tag_joins = 0
-        self.account_joins = 0
 
-    def exec(self, order_by: str = "date") -> list[Event]:
-        command = (
-            " ".join(self.begin)
-            + (
-                (" WHERE " + " AND ".join(self.predicates))
-                if len(self.predicates) > 0
-                else ""
+    def _command(self, order_by: str) -> str:
+        return _compile_fetch(self.columns, tuple(self.predicates), order_by)
+
+    def explain(self, order_by: str = "date") -> list[str]:
+        cur = _db().execute(
+            "EXPLAIN QUERY PLAN " + self._command(order_by), self.params
+        )
+        return [detail for _, _, _, detail in cur]
+
+    # Per-day totals of the matching events, computed in one GROUP BY query.
+    # Inflow and outflow are the credited and debited amounts, over the
+    # given accounts or over all of an event's accounts if none are given.
+    @instrument.operation
+    def exec_day_totals(self, *account_ids: int) -> list["DayTotal"]:
+        source = "event LEFT JOIN event_accounts ON event_id = id"
+        if len(account_ids) > 0:
+            source += (
+                f" AND account_id IN ({', '.join('?' for _ in account_ids)})"
             )
-            + f" ORDER BY {order_by}"
+        command = _compile_fetch(
+            "date, COUNT(DISTINCT id), "
+            "COALESCE(SUM(CASE WHEN is_credit THEN amount END), 0), "
+            "COALESCE(SUM(CASE WHEN NOT is_credit THEN amount END), 0)",
+            tuple(self.predicates),
+            "date",
+            source,
+            "date",
+        )
+        cur = _db().execute(command, [*account_ids, *self.params])
+        return [
+            DayTotal(date, count, inflow, outflow)
+            for date, count, inflow, outflow in cur
+        ]
+
+    # Totals of the matching events grouped by tag, account or period
+    # (day, week, month or year), as (key, count, inflow, outflow) rows in
+    # key order. Flows are as in exec_day_totals, per account when grouped
+    # by account. Rows are read lazily from the cursor.
+    def iter_totals(
+        self, by: str, period: str = "month"
+    ) -> Iterator[tuple[int | str, int, int, int]]:
+        flows = (
+            "COUNT(DISTINCT id), "
+            "COALESCE(SUM(CASE WHEN is_credit THEN amount END), 0), "
+            "COALESCE(SUM(CASE WHEN NOT is_credit THEN amount END), 0)"
         )
-        curr = _conn.execute(command, self.params)
+        match by:
+            case "tag":
+                key = "tag_id"
+                source = (
+                    "event JOIN event_tags ON event_tags.event_id = id "
+                    "LEFT JOIN event_accounts "
+                    "ON event_accounts.event_id = id"
+                )
+            case "account":
+                key = "account_id"
+                source = "event JOIN event_accounts ON event_id = id"
+            case "period":
+                key = PERIODS[period]
+                source = "event LEFT JOIN event_accounts ON event_id = id"
+            case _:
+                raise ValueError(f"Cannot group totals by {by}")
+        command = _compile_fetch(
+            f"{key}, {flows}", tuple(self.predicates), key, source, key
+        )
+        return _db().execute(command, self.params)
+
+    # The matching events, hydrated chunk events at a time so memory stays
+    # bounded however many match. For exports over whole ledgers.
+    def iter_events(
+        self, order_by: str = "date, id", chunk: int = 500
+    ) -> Iterator[Event]:
+        cur = _db().execute(self._command(order_by), self.params)
+        while True:
+            rows = cur.fetchmany(chunk)
+            if len(rows) == 0:
+                return
+            ids = [row[0] for row in rows]
+            id_query = ", ".join("?" for _ in ids)
+            accounts = _get_accounts_for_events(id_query, ids)
+            tags = _get_tags_for_events(id_query, ids)
+            for id, date, amount, name, memo in rows:
+                yield Event(
+                    id,
+                    date,
+                    amount,
+                    str(name),
+                    str(memo),
+                    _shared_accounts(accounts.get(id, dict())),
+                    _shared_tags(tags.get(id, ())),
+                )
+
+    # Only the fetcher's columns, without hydrating accounts or tags. Rows
+    # are namedtuples of the columns unless a row type is given.
+    @instrument.operation
+    def exec_rows(
+        self, row_type: Callable | None = None, order_by: str = "date"
+    ) -> list:
+        if row_type is None:
+            row_type = _row_type(self.columns)
+        cur = _db().execute(self._command(order_by), self.params)
+        return [row_type(*values) for values in cur]
+
+    @instrument.operation
+    def exec(self, order_by: str = "date") -> list[Event]:
+        curr = _db().execute(self._command(order_by), self.params)
         result = curr.fetchall()
 
+        # Load the relations of the whole result set in two queries, reusing
+        # the filter as a subquery, instead of two queries per event
+        id_query = _compile_fetch("id", tuple(self.predicates), None)
+        accounts = _get_accounts_for_events(id_query, self.params)
+        tags = _get_tags_for_events(id_query, self.params)
+
         events: list[Event] = list()
         for id, date, amount, name, memo in result:
-            accounts = _get_accounts_for_event(id)
-            tags = _get_tags_for_event(id)
             events.append(
-                Event(id, date, amount, str(name), str(memo), accounts, tags)
+                Event(
+                    id,
+                    date,
+                    amount,
+                    sys.intern(str(name)),
+                    str(memo),
+                    _shared_accounts(accounts.get(id, dict())),
+                    _shared_tags(tags.get(id, ())),
+                )
             )
 
         return events
 
+    # The matching events as columns, in id order. For analytics and bulk
+    # operations over many events without building an object per event.
+    @instrument.operation
+    def exec_batch(self) -> "EventBatch":
+        batch = EventBatch()
+        cur = _db().execute(
+            _compile_fetch("id, date, amount", tuple(self.predicates), "id"),
+            self.params,
+        )
+        for id, date, amount in cur:
+            batch.ids.append(id)
+            batch.dates.append(date)
+            batch.amounts.append(amount)
+
+        # Link rows come in event id order too, so each list of links is
+        # consumed in a single merge pass
+        id_query = _compile_fetch("id", tuple(self.predicates), None)
+        cur = _db().execute(
+            "SELECT event_id, tag_id FROM event_tags "
+            f"WHERE event_id IN ({id_query}) ORDER BY event_id",
+            self.params,
+        )
+        link = next(cur, None)
+        for id in batch.ids:
+            while link is not None and link[0] == id:
+                batch.tags.append(link[1])
+                link = next(cur, None)
+            batch.tag_offsets.append(len(batch.tags))
+
+        cur = _db().execute(
+            "SELECT event_id, account_id, is_credit FROM event_accounts "
+            f"WHERE event_id IN ({id_query}) ORDER BY event_id",
+            self.params,
+        )
+        link = next(cur, None)
+        for id in batch.ids:
+            while link is not None and link[0] == id:
+                batch.accounts.append(link[1])
+                batch.credits.append(link[2])
+                link = next(cur, None)
+            batch.account_offsets.append(len(batch.accounts))
+
+        return batch
+
+    # Date of the earliest (or latest) matching event, read through the date
+    # index without loading any events
+    @instrument.operation
+    def first_date(self, last: bool = False) -> int | None:
+        command = _compile_fetch(
+            "date",
+            tuple(self.predicates),
+            "date DESC" if last else "date",
+            limit=1,
+        )
+        row = _db().execute(command, self.params).fetchone()
+        return None if row is None else row[0]
+
+    # Number of matching events, counted without loading any
+    @instrument.operation
+    def count(self) -> int:
+        command = _compile_fetch("COUNT(*)", tuple(self.predicates), None)
+        return _db().execute(command, self.params).fetchone()[0]
+
+    def id_is(self, id: int) -> Self:
+        self.predicates.append("id = ?")
+        self.params.append(id)
+        return self
+
     def before(self, date: int) -> Self:
         self.predicates.append("date < ?")
         self.params.append(date)
@@ -393,13 +1193,17 @@ class EventFetcher:
         self.params.append(date)
         return self
 
+    # Without statistics SQLite expects a one-sided range to match a
+    # quarter of the ledger and walks event_date to skip the sort instead.
+    # Amount filters are usually far narrower, so the hint makes it search
+    # event_amount; date windows still win when combined with one.
     def amount_less(self, amount: int) -> Self:
-        self.predicates.append("amount < ?")
+        self.predicates.append("likelihood(amount < ?, 0.05)")
         self.params.append(amount)
         return self
 
     def amount_greater(self, amount: int) -> Self:
-        self.predicates.append("amount > ?")
+        self.predicates.append("likelihood(amount > ?, 0.05)")
         self.params.append(amount)
         return self
 
@@ -413,89 +1217,238 @@ class EventFetcher:
         self.params.append(name.join(("%", "%")))
         return self
 
-    def any_tags(self, *tag_ids: int) -> Self:
-        if len(tag_ids) < 1:
-            return self
+    def matches(self, query: str) -> Self:
+        self.predicates.append(
+            "id IN (SELECT rowid FROM event_search WHERE event_search MATCH ?)"
+        )
+        self.params.append(query)
+        return self
 
-        if len(self.begin) <= 1:
-            self.begin.append(
-                "NATURAL JOIN (SELECT event_id as id, tag_id as tag0 FROM event_tags)"
-            )
+    def has_words(self, text: str) -> Self:
+        return self.matches(search_query(text))
 
-        self.tag_joins += 1
+    def has_prefix(self, text: str) -> Self:
+        return self.matches(search_query(text, prefix=True))
 
-        preds = " OR ".join(("tag0 = ?" for _ in tag_ids))
-        self.predicates.append(preds.join(("(", ")")))
+    def has_phrase(self, text: str) -> Self:
+        return self.matches(_quote_search_token(text))
 
-        for tag_id in tag_ids:
-            self.params.append(tag_id)
+    def _member_of(
+        self,
+        table: str,
+        column: str,
+        ids: tuple[int, ...],
+        require_all: bool,
+        negate: bool,
+    ) -> Self:
+        ids = tuple(dict.fromkeys(ids))
+        if len(ids) < 1:
+            return self
+
+        subquery = (
+            f"SELECT event_id FROM {table} "
+            f"WHERE {column} IN ({', '.join('?' for _ in ids)})"
+        )
+        if require_all and len(ids) > 1:
+            subquery += (
+                f" GROUP BY event_id HAVING COUNT(DISTINCT {column}) = "
+                f"{len(ids)}"
+            )
 
+        self.predicates.append(
+            f"id {'NOT IN' if negate else 'IN'} ({subquery})"
+        )
+        self.params.extend(ids)
         return self
 
+    def any_tags(self, *tag_ids: int) -> Self:
+        return self._member_of("event_tags", "tag_id", tag_ids, False, False)
+
     def all_tags(self, *tag_ids: int) -> Self:
-        if len(tag_ids) < 1:
-            return self
+        return self._member_of("event_tags", "tag_id", tag_ids, True, False)
 
-        for i in range(len(tag_ids) - self.tag_joins):
-            self.begin.append(
-                f"NATURAL JOIN (SELECT event_id as id, tag_id as tag{i+self.tag_joins} FROM event_tags)"
-            )
+    def no_tags(self, *tag_ids: int) -> Self:
+        return self._member_of("event_tags", "tag_id", tag_ids, False, True)
 
-        self.tag_joins += len(tag_ids) - self.tag_joins
+    def any_accounts(self, *account_ids: int) -> Self:
+        return self._member_of(
+            "event_accounts", "account_id", account_ids, False, False
+        )
 
-        preds = " AND ".join((f"tag{i} = ?" for i in range(len(tag_ids))))
-        self.predicates.append(preds)
+    def all_accounts(self, *account_ids: int) -> Self:
+        return self._member_of(
+            "event_accounts", "account_id", account_ids, True, False
+        )
 
-        for tag_id in tag_ids:
-            self.params.append(tag_id)
+    def no_accounts(self, *account_ids: int) -> Self:
+        return self._member_of(
+            "event_accounts", "account_id", account_ids, False, True
+        )
 
-        return self
 
-    def any_accounts(self, *account_ids: int) -> Self:
-        if len(account_ids) < 1:
-            return self
+# Events stored column-wise in typed arrays. The tags of event i are
+# tags[tag_offsets[i]:tag_offsets[i + 1]], and likewise for accounts and
+# credits with account_offsets.
+class EventBatch:
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.dates = array("q")
+        self.amounts = array("q")
+        self.tag_offsets = array("q", (0,))
+        self.tags = array("q")
+        self.account_offsets = array("q", (0,))
+        self.accounts = array("q")
+        self.credits = array("b")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def tag_ids(self, i: int) -> array:
+        return self.tags[self.tag_offsets[i] : self.tag_offsets[i + 1]]
+
+    def event_accounts(self, i: int) -> dict[int, bool]:
+        low, high = self.account_offsets[i], self.account_offsets[i + 1]
+        return dict(
+            zip(self.accounts[low:high], map(bool, self.credits[low:high]))
+        )
 
-        if len(self.begin) <= 1:
-            self.begin.append(
-                "NATURAL JOIN (SELECT event_id as id, account_id as account0 FROM event_accounts)"
+    # Net change of each account's balance over the batch
+    def account_totals(self) -> dict[int, int]:
+        totals: dict[int, int] = dict()
+        for i, amount in enumerate(self.amounts):
+            low, high = self.account_offsets[i], self.account_offsets[i + 1]
+            for j in range(low, high):
+                account_id = self.accounts[j]
+                change = amount if self.credits[j] else -amount
+                totals[account_id] = totals.get(account_id, 0) + change
+        return totals
+
+    def nbytes(self) -> int:
+        return sum(
+            len(column) * column.itemsize
+            for column in (
+                self.ids,
+                self.dates,
+                self.amounts,
+                self.tag_offsets,
+                self.tags,
+                self.account_offsets,
+                self.accounts,
+                self.credits,
             )
+        )
 
-        self.account_joins += 1
 
-        preds = " OR ".join(("account0 = ?" for _ in account_ids))
-        self.predicates.append(preds.join(("(", ")")))
+class DayTotal:
+    def __init__(
+        self, date: int, count: int, inflow: int, outflow: int
+    ) -> None:
+        self.date = date
+        self.count = count
+        self.inflow = inflow
+        self.outflow = outflow
 
-        for account_id in account_ids:
-            self.params.append(account_id)
+    @property
+    def net(self) -> int:
+        return self.inflow - self.outflow
 
-        return self
 
-    def all_accounts(self, *account_ids: int) -> Self:
-        if len(account_ids) < 1:
-            return self
+def fetch_events(
+    columns: str = "id, date, amount, name, memo"
+) -> EventFetcher:
+    return EventFetcher(columns)
 
-        for i in range(len(account_ids) - self.account_joins):
-            self.begin.append(
-                f"NATURAL JOIN (SELECT event_id as id, account_id as account{i+self.account_joins} FROM event_accounts)"
-            )
 
-        self.account_joins += len(account_ids) - self.account_joins
+@instrument.operation
+def event_date_range() -> tuple[int, int] | None:
+    cur = _db().execute("SELECT MIN(date), MAX(date) FROM event")
+    first, last = cur.fetchone()
+    if first is None:
+        return None
+    return first, last
 
-        preds = " AND ".join((f"tag{i} = ?" for i in range(len(account_ids))))
-        self.predicates.append(preds)
 
-        for account_id in account_ids:
-            self.params.append(account_id)
+def _quote_search_token(token: str) -> str:
+    return '"' + token.replace('"', '""') + '"'
 
-        return self
 
+# Turns user input into an FTS5 query matching every word, with the last
+# word optionally treated as a prefix. Quoting keeps FTS5 syntax inert.
+def search_query(text: str, prefix: bool = False) -> str:
+    tokens = [_quote_search_token(t) for t in text.split()]
+    if prefix and len(tokens) > 0:
+        tokens[-1] += "*"
+    return " ".join(tokens)
 
-def fetch_events() -> EventFetcher:
-    return EventFetcher()
 
+class SearchResult:
+    def __init__(
+        self, event_id: int, date: int, name: str, snippet: str
+    ) -> None:
+        self.event_id = event_id
+        self.date = date
+        self.name = name
+        self.snippet = snippet
 
-def register_tag(name: str, description: str) -> Tag:
-    cur = _conn.execute(
+
+@instrument.operation
+def search_events(query: str, limit: int = 50) -> list[SearchResult]:
+    if len(query) == 0:
+        return list()
+
+    cur = _db().execute(
+        """
+        SELECT event.id, event.date, event.name,
+            snippet(event_search, -1, '[', ']', '...', 8)
+        FROM event_search JOIN event ON event.id = event_search.rowid
+        WHERE event_search MATCH ?
+        ORDER BY rank
+        LIMIT ?
+        """,
+        (query, limit),
+    )
+    return [
+        SearchResult(id, date, str(name), str(snippet))
+        for id, date, name, snippet in cur
+    ]
+
+
+# Ranking every match of a one or two letter prefix is linear in the ledger
+# size, so as-you-type search only ranks the candidates most recently
+# inserted matches (by id, not by date). An older event that would rank
+# higher is not returned; search_events ranks every match.
+@instrument.operation
+def search_as_you_type(
+    text: str, limit: int = 20, candidates: int = 500
+) -> list[SearchResult]:
+    query = search_query(text, prefix=True)
+    if len(query) == 0:
+        return list()
+    candidates = max(candidates, limit)
+
+    cur = _db().execute(
+        """
+        SELECT event.id, event.date, event.name,
+            snippet(event_search, -1, '[', ']', '...', 8)
+        FROM event_search JOIN event ON event.id = event_search.rowid
+        WHERE event_search MATCH ?1 AND event_search.rowid >= COALESCE((
+            SELECT rowid FROM event_search WHERE event_search MATCH ?1
+            ORDER BY rowid DESC LIMIT 1 OFFSET ?2 - 1
+        ), 0)
+        ORDER BY rank
+        LIMIT ?3
+        """,
+        (query, candidates, limit),
+    )
+    return [
+        SearchResult(id, date, str(name), str(snippet))
+        for id, date, name, snippet in cur
+    ]
+
+
+@instrument.operation
+def insert_tag(name: str, description: str) -> Tag:
+    cur = _db().execute(
         "INSERT INTO tag VALUES (?, ?, ?)", (None, name, description)
     )
 
@@ -509,37 +1462,75 @@ def register_tag(name: str, description: str) -> Tag:
     return Tag(id, name, description)
 
 
+def track_tag(tag: Tag) -> None:
+    TAGS[tag.id] = tag
+    signal_tags_changes(tag.id, None, tag)
+
+
+def register_tag(name: str, description: str) -> Tag:
+    new_tag = insert_tag(name, description)
+    track_tag(new_tag)
+    return new_tag
+
+
+@instrument.operation
 def alter_tags(*tags: Tag) -> None:
-    _conn.executemany(
+    _db().executemany(
         "UPDATE tag SET name = ?, description = ? WHERE id = ?",
         [(t.name, t.description, t.id) for t in tags],
     )
 
 
-def delete_tags(*tags: Tag) -> None:
-    _conn.executemany("DELETE FROM tag WHERE id = ?", [(t.id,) for t in tags])
+@instrument.operation
+def erase_tags(*tags: Tag) -> None:
+    _db().executemany("DELETE FROM tag WHERE id = ?", [(t.id,) for t in tags])
 
-    _conn.executemany(
+    _db().executemany(
         "DElETE FROM event_tags WHERE tag_id = ?", [(t.id,) for t in tags]
     )
 
 
+def untrack_tags(*tags: Tag) -> None:
+    for tag in tags:
+        if TAGS.pop(tag.id, None) is not None:
+            signal_tags_changes(tag.id, tag, None)
+
+
+def delete_tags(*tags: Tag) -> None:
+    erase_tags(*tags)
+    untrack_tags(*tags)
+
+
+# Usage counts come from the event_tags_tag index, one read for all tags
+@instrument.operation
 def fetch_all_registered_tags() -> list[Tag]:
-    cur = _conn.execute("SELECT * FROM tag")
-    result = cur.fetchall()
+    cur = _db().execute(
+        """
+        SELECT tag.id, tag.name, tag.description, COUNT(event_tags.tag_id)
+        FROM tag LEFT JOIN event_tags ON event_tags.tag_id = tag.id
+        GROUP BY tag.id
+        """
+    )
     tags: list[Tag] = list()
-    for id, name, description in result:
-        tags.append(Tag(id, name, description))
+    for id, name, description, usage in cur:
+        tags.append(Tag(id, name, description, usage))
     return tags
 
 
-def register_account(
+# Names of all tags by id, without counting their use
+@instrument.operation
+def fetch_tag_names() -> dict[int, str]:
+    return dict(_db().execute("SELECT id, name FROM tag"))
+
+
+@instrument.operation
+def insert_account(
     name: str,
     description: str,
     min_balance: int | None,
     max_balance: int | None,
 ) -> Account:
-    cur = _conn.execute(
+    cur = _db().execute(
         "INSERT INTO account VALUES (?, ?, ?, ?, ?)",
         (None, name, description, min_balance, max_balance),
     )
@@ -551,16 +1542,28 @@ def register_account(
     if id is None:
         raise RuntimeError("Could not obtain id for new account")
 
-    new_account = Account(id, name, description, min_balance, max_balance)
+    return Account(id, name, description, min_balance, max_balance)
+
 
-    ACCOUNTS[id] = new_account
-    signal_accounts_changes()
+def track_account(account: Account) -> None:
+    ACCOUNTS[account.id] = account
+    signal_accounts_changes(account.id, None, account)
 
+
+def register_account(
+    name: str,
+    description: str,
+    min_balance: int | None,
+    max_balance: int | None,
+) -> Account:
+    new_account = insert_account(name, description, min_balance, max_balance)
+    track_account(new_account)
     return new_account
 
 
+@instrument.operation
 def alter_accounts(*accounts: Account) -> None:
-    _conn.executemany(
+    _db().executemany(
         "UPDATE account SET name = ?, description = ?, min_balance = ?, max_balance = ? WHERE id = ?",
         [
             (a.name, a.description, a.min_balance, a.max_balance, a.id)
@@ -569,47 +1572,283 @@ def alter_accounts(*accounts: Account) -> None:
     )
 
 
-def delete_accounts(*accounts: Account) -> None:
-    _conn.executemany(
+@instrument.operation
+def erase_accounts(*accounts: Account) -> None:
+    _db().executemany(
         "DELETE FROM account WHERE id = ?", [(a.id,) for a in accounts]
     )
 
-    _conn.executemany(
+    _db().executemany(
         "DELETE FROM event_accounts WHERE account_id = ?",
         [(a.id,) for a in accounts],
     )
 
+
+def untrack_accounts(*accounts: Account) -> None:
     for account in accounts:
-        ACCOUNTS.pop(account.id)
+        if ACCOUNTS.pop(account.id, None) is not None:
+            signal_accounts_changes(account.id, account, None)
 
-    signal_accounts_changes()
 
+def delete_accounts(*accounts: Account) -> None:
+    erase_accounts(*accounts)
+    untrack_accounts(*accounts)
 
+
+@instrument.operation
 def fetch_all_registered_accounts() -> list[Account]:
-    cur = _conn.execute("SELECT * FROM account")
-    result = cur.fetchall()
+    cur = _db().execute(
+        "SELECT id, name, description, min_balance, max_balance, balance "
+        "FROM account LEFT JOIN account_balance ON account_id = id"
+    )
     accounts: list[Account] = list()
-    for id, name, description, min_balance, max_balance in result:
-        credit = cur.execute(
-            "SELECT SUM(amount) FROM (event NATURAL JOIN (SELECT event_id AS id, account_id FROM event_accounts WHERE is_credit > 0) NATURAL JOIN (SELECT id as account_id FROM account WHERE account_id = ?))",
-            (id,),
-        ).fetchone()[0]
-        debit = cur.execute(
-            "SELECT SUM(amount) FROM (event NATURAL JOIN (SELECT event_id AS id, account_id FROM event_accounts WHERE is_credit = 0) NATURAL JOIN (SELECT id as account_id FROM account WHERE account_id = ?))",
-            (id,),
-        ).fetchone()[0]
-        credit = 0 if credit is None else int(credit)
-        debit = 0 if debit is None else int(debit)
+    for id, name, description, min_balance, max_balance, balance in cur:
         accounts.append(
             Account(
-                id, name, description, min_balance, max_balance, credit - debit
+                id,
+                name,
+                description,
+                min_balance,
+                max_balance,
+                0 if balance is None else balance,
             )
         )
     return accounts
 
 
+# Names of all accounts by id
+@instrument.operation
+def fetch_account_names() -> dict[int, str]:
+    return dict(_db().execute("SELECT id, name FROM account"))
+
+
+# Maintained balance of every account, as (account id, balance) pairs
+@instrument.operation
+def fetch_balances() -> list[tuple[int, int]]:
+    return _db().execute(
+        "SELECT account_id, balance FROM account_balance ORDER BY account_id"
+    ).fetchall()
+
+
+# Balance of every account counting only events dated on or before date,
+# as (account id, balance) pairs
+@instrument.operation
+def fetch_balances_as_of(date: int) -> list[tuple[int, int]]:
+    return _db().execute(_BALANCES_AS_OF_QUERY, (date,)).fetchall()
+
+
+# Accounts whose maintained balance disagrees with the ledger, recomputed
+# in one pass: {id: (maintained, recomputed)}. Changes nothing.
+@instrument.operation
+def check_account_balances() -> dict[int, tuple[int | None, int]]:
+    return _balance_mismatches(_db().execute(_BALANCES_QUERY).fetchall())
+
+
+def _balance_mismatches(
+    recomputed: list[tuple[int, int]],
+) -> dict[int, tuple[int | None, int]]:
+    maintained: dict[int, int] = dict(
+        _db().execute("SELECT account_id, balance FROM account_balance")
+    )
+    mismatches: dict[int, tuple[int | None, int]] = dict()
+    for account_id, balance in recomputed:
+        if maintained.get(account_id) != balance:
+            mismatches[account_id] = (maintained.get(account_id), balance)
+    return mismatches
+
+
+# Recomputes every balance from the ledger in one pass and returns the
+# accounts whose maintained balance disagreed: {id: (maintained, recomputed)}
+@instrument.operation
+def rebuild_account_balances() -> dict[int, tuple[int | None, int]]:
+    recomputed: list[tuple[int, int]] = _db().execute(
+        _BALANCES_QUERY
+    ).fetchall()
+    mismatches = _balance_mismatches(recomputed)
+
+    _db().execute("DELETE FROM account_balance")
+    _db().executemany("INSERT INTO account_balance VALUES (?,?)", recomputed)
+
+    return mismatches
+
+
+# Problems reported by SQLite's integrity and foreign key checks, empty if
+# the database is sound
+@instrument.operation
+def check_integrity() -> list[str]:
+    problems = [
+        row[0]
+        for row in _db().execute("PRAGMA integrity_check")
+        if row[0] != "ok"
+    ]
+    for table, rowid, parent, _ in _db().execute("PRAGMA foreign_key_check"):
+        problems.append(f"{table} row {rowid} references missing {parent}")
+    return problems
+
+
+# Rebuilds the database file without free pages. Pending changes are
+# committed first, VACUUM cannot run inside a transaction.
+@instrument.operation
+def vacuum() -> None:
+    commit_changes()
+    _db().execute("VACUUM")
+
+
+@instrument.operation
 def commit_changes() -> None:
-    _conn.commit()
+    _db().commit()
+
+
+# Discards everything written since the last commit
+@instrument.operation
+def rollback_changes() -> None:
+    _db().rollback()
+
+
+# Id of an event whose insert is queued on the writer but not yet
+# committed. SQLite never hands out rowid 0. The real id is assigned on the
+# GUI thread once the insert's Future resolves, and writes queued before
+# then receive it through submit_write_after.
+PENDING_ID = 0
+
+
+class Writer(threading.Thread):
+    def __init__(self, max_latency: float = 0.05, max_batch: int = 256):
+        super().__init__(name="kfp-writer", daemon=True)
+        self.max_latency = max_latency
+        self.max_batch = max_batch
+        self.jobs: queue.SimpleQueue[
+            tuple[Callable, tuple, dict, Future] | None
+        ] = queue.SimpleQueue()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future: Future = Future()
+        self.jobs.put((fn, args, kwargs, future))
+        return future
+
+    def stop(self) -> None:
+        self.jobs.put(None)
+        self.join()
+
+    def run(self) -> None:
+        conn = _db()
+        # Transactions are managed here, one per group of jobs
+        conn.isolation_level = None
+
+        stopping = False
+        while not stopping:
+            job = self.jobs.get()
+            if job is None:
+                break
+
+            deadline = time.monotonic() + self.max_latency
+            # Every job taken into this group, resolved together once the
+            # group has committed or failed
+            taken: list[Future] = [job[3]]
+            done: list[tuple[object, BaseException | None]] = list()
+            try:
+                conn.execute("BEGIN")
+                while True:
+                    fn, args, kwargs, _ = job
+                    conn.execute("SAVEPOINT job")
+                    try:
+                        result = fn(*args, **kwargs)
+                        conn.execute("RELEASE job")
+                        done.append((result, None))
+                    except BaseException as e:
+                        conn.execute("ROLLBACK TO job")
+                        conn.execute("RELEASE job")
+                        done.append((None, e))
+
+                    # Keep grouping while more writes are already waiting
+                    if (
+                        len(done) >= self.max_batch
+                        or time.monotonic() >= deadline
+                    ):
+                        break
+                    try:
+                        job = self.jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        stopping = True
+                        break
+                    taken.append(job[3])
+
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                # Nothing in the group was written. The thread keeps
+                # serving later jobs on a connection left outside any
+                # transaction.
+                if conn.in_transaction:
+                    try:
+                        conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass
+                for future in taken:
+                    future.set_exception(e)
+                continue
+
+            for future, (result, error) in zip(taken, done):
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+        conn.close()
+
+
+_writer: Writer | None = None
+
+
+# Queues a mutation for the writer thread. The function runs there with the
+# writer's connection, so it must only touch the database, not in-memory
+# state that the GUI reads.
+def submit_write(fn: Callable, *args, **kwargs) -> Future:
+    global _writer
+    if _writer is None:
+        _writer = Writer()
+        _writer.start()
+    return _writer.submit(fn, *args, **kwargs)
+
+
+# Queues fn(result, *args) once future has succeeded, result being what the
+# write behind future returned. If future fails, so does the returned one,
+# and fn never runs. Chaining on the latest write keeps writes in order.
+def submit_write_after(
+    future: Future, fn: Callable, *args, **kwargs
+) -> Future:
+    chained: Future = Future()
+
+    def forward(done: Future) -> None:
+        error = done.exception()
+        if error is None:
+            chained.set_result(done.result())
+        else:
+            chained.set_exception(error)
+
+    def resubmit(done: Future) -> None:
+        error = done.exception()
+        if error is not None:
+            chained.set_exception(error)
+            return
+        follow = submit_write(fn, done.result(), *args, **kwargs)
+        follow.add_done_callback(forward)
+
+    future.add_done_callback(resubmit)
+    return chained
+
+
+def flush_writes() -> None:
+    if _writer is not None:
+        _writer.submit(lambda: None).result()
+
+
+def stop_writer() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
 
 
 def main() -> None:
@@ -635,23 +1874,33 @@ def main() -> None:
         )
 
 
-__initialize_schema__()
-LOADED_EVENTS: list[Event] = list()
-
+LOADED_EVENTS = EventIndex()
 ACCOUNTS: dict[int, Account] = dict()
-for account in fetch_all_registered_accounts():
-    ACCOUNTS[account.id] = account
+TAGS: dict[int, Tag] = dict()
+
+
+# Callbacks receive a changes.Change keyed by tag id when a tag is tracked
+# (old is None) or untracked (new is None)
+def subscribe_tags_changes(callback: Callable) -> Subscription:
+    return BUS.subscribe(TAG_REGISTRY, callback)
 
-accounts_changes_listeners: list[Callable] = list()
+
+def signal_tags_changes(
+    tag_id: int, old: Tag | None, new: Tag | None
+) -> None:
+    BUS.publish(TAG_REGISTRY, tag_id, old, new)
 
 
-def subscribe_accounts_changes(callback: Callable) -> None:
-    accounts_changes_listeners.append(callback)
+# Callbacks receive a changes.Change keyed by account id when an account is
+# tracked (old is None) or untracked (new is None)
+def subscribe_accounts_changes(callback: Callable) -> Subscription:
+    return BUS.subscribe(ACCOUNT_REGISTRY, callback)
 
 
-def signal_accounts_changes() -> None:
-    for callback in accounts_changes_listeners:
-        callback()
+def signal_accounts_changes(
+    account_id: int, old: Account | None, new: Account | None
+) -> None:
+    BUS.publish(ACCOUNT_REGISTRY, account_id, old, new)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,273 @@
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from functools import wraps
+
+# Opt-in latency and SQL instrumentation for db. Functions marked with
+# @operation or @subquery are left untouched until enable() swaps wrappers
+# into their module or class, and disable() puts the originals back, so
+# nothing is paid while instrumentation is off. Statements are seen through
+# the sqlite3 trace callback of db's connections.
+
+# Buckets of the latency histograms, by bit length of the microseconds
+BUCKETS = 32
+
+# Statements EXPLAIN QUERY PLAN accepts, unlike BEGIN or COMMIT
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "total", "max", "rows")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def add(self, seconds: float, rows: int) -> None:
+        micros = int(seconds * 1e6)
+        self.buckets[min(BUCKETS - 1, micros.bit_length())] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows
+
+    # Upper bound of the bucket holding the given fraction of samples
+    def quantile_ms(self, fraction: float) -> float:
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= fraction * self.count:
+                return (1 << i) / 1000
+        return self.max * 1000
+
+    def to_json(self) -> dict:
+        return {
+            "count": self.count,
+            "rows": self.rows,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.quantile_ms(0.5),
+            "p95_ms": self.quantile_ms(0.95),
+            "p99_ms": self.quantile_ms(0.99),
+            "max_ms": self.max * 1000,
+            "buckets_us": {
+                f"<{1 << i}": count
+                for i, count in enumerate(self.buckets)
+                if count > 0
+            },
+        }
+
+
+class Marked:
+    def __init__(self, function: Callable, kind: str) -> None:
+        self.function = function
+        self.kind = kind
+        self.name = function.__qualname__
+
+
+_marked: list[Marked] = list()
+_lock = threading.Lock()
+_local = threading.local()
+
+enabled = False
+# Bumped whenever enabled changes
+generation = 0
+slow_ms = 50.0
+
+histograms: dict[str, Histogram] = dict()
+statements: dict[str, int] = dict()
+slow_log: deque[dict] = deque(maxlen=100)
+
+
+def _mark(kind: str) -> Callable:
+    def mark(function: Callable) -> Callable:
+        _marked.append(Marked(function, kind))
+        return function
+
+    return mark
+
+
+# Public db API calls, timed with their row counts
+operation = _mark("operation")
+# Relation loads, run once per fetch (or per chunk when streaming). Counts
+# growing faster than the fetches that make them point at an N+1.
+subquery = _mark("subquery")
+
+
+def _owner(marked: Marked):
+    owner = sys.modules[marked.function.__module__]
+    for part in marked.name.split(".")[:-1]:
+        owner = getattr(owner, part)
+    return owner
+
+
+def _wrap(marked: Marked) -> Callable:
+    function = marked.function
+    name = marked.name
+
+    @wraps(function)
+    def timed(*args, **kwargs):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = list()
+        traced: list[tuple[sqlite3.Connection, str]] = list()
+        stack.append(traced)
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if len(stack) > 0:
+                stack[-1].extend(traced)
+        rows = len(result) if hasattr(result, "__len__") else 0
+        _record(name, elapsed, rows, traced)
+        return result
+
+    return timed
+
+
+def _record(
+    name: str,
+    elapsed: float,
+    rows: int,
+    traced: list[tuple[sqlite3.Connection, str]],
+) -> None:
+    with _lock:
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.add(elapsed, rows)
+    if elapsed * 1000 >= slow_ms:
+        slow = {
+            "operation": name,
+            "ms": elapsed * 1000,
+            "at": time.time(),
+            "statements": _explain(traced),
+        }
+        with _lock:
+            slow_log.append(slow)
+
+
+# EXPLAIN QUERY PLAN of each distinct statement run by a slow call
+def _explain(traced: list[tuple[sqlite3.Connection, str]]) -> list[dict]:
+    explained: list[dict] = list()
+    seen: set[str] = set()
+    _local.explaining = True
+    try:
+        for conn, sql in traced:
+            shape = normalize(sql)
+            if shape in seen or not shape.upper().startswith(EXPLAINABLE):
+                continue
+            seen.add(shape)
+            try:
+                plan = [
+                    detail
+                    for _, _, _, detail in conn.execute(
+                        "EXPLAIN QUERY PLAN " + sql
+                    )
+                ]
+            except sqlite3.Error as e:
+                plan = [f"unavailable: {e}"]
+            explained.append({"sql": sql, "plan": plan})
+    finally:
+        _local.explaining = False
+    return explained
+
+
+# Statement text with literals replaced, so repeats count as one statement
+def normalize(sql: str) -> str:
+    return " ".join(LITERALS.sub("?", sql).split())
+
+
+def _trace(conn: sqlite3.Connection, sql: str) -> None:
+    if getattr(_local, "explaining", False):
+        return
+    shape = normalize(sql)
+    with _lock:
+        statements[shape] = statements.get(shape, 0) + 1
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].append((conn, sql))
+
+
+# Connections can only be touched by the thread that made them, so db calls
+# this from that thread whenever generation changed since its last call
+def sync(conn: sqlite3.Connection) -> None:
+    if enabled:
+        conn.set_trace_callback(lambda sql: _trace(conn, sql))
+    else:
+        conn.set_trace_callback(None)
+
+
+def enable(slow_threshold_ms: float | None = None) -> None:
+    global enabled, generation, slow_ms
+    if slow_threshold_ms is not None:
+        slow_ms = slow_threshold_ms
+    if enabled:
+        return
+    enabled = True
+    for marked in _marked:
+        setattr(_owner(marked), marked.function.__name__, _wrap(marked))
+    generation += 1
+
+
+def disable() -> None:
+    global enabled, generation
+    if not enabled:
+        return
+    enabled = False
+    for marked in _marked:
+        setattr(_owner(marked), marked.function.__name__, marked.function)
+    generation += 1
+
+
+def reset() -> None:
+    with _lock:
+        histograms.clear()
+        statements.clear()
+        slow_log.clear()
+
+
+def snapshot() -> dict:
+    kinds = {marked.name: marked.kind for marked in _marked}
+    with _lock:
+        timings = {
+            name: histogram.to_json()
+            for name, histogram in histograms.items()
+        }
+        counts = dict(statements)
+        slow = list(slow_log)
+    return {
+        "enabled": enabled,
+        "slow_ms": slow_ms,
+        "operations": {
+            name: timing
+            for name, timing in timings.items()
+            if kinds.get(name) == "operation"
+        },
+        "subqueries": {
+            name: timings[name]["count"] if name in timings else 0
+            for name, kind in kinds.items()
+            if kind == "subquery"
+        },
+        "statements": dict(
+            sorted(counts.items(), key=lambda item: item[1], reverse=True)
+        ),
+        "slow": slow,
+    }
+
+
+def export(path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2)
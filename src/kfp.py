@@ -0,0 +1,449 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from collections.abc import Iterable, Iterator
+from datetime import date as Date
+
+import db
+import instrument
+from kui.dates import date_to_serial, serial_to_date
+
+# Headless entry point for reports, imports, exports and maintenance. Only
+# db and the Qt-free kui.dates are imported, so it runs on servers without a
+# display. Results stream to stdout as CSV or JSON Lines one row at a time,
+# so memory stays bounded however large the ledger.
+#
+#   python kfp.py --db kfp.db events --since 2024-01-01 --any-tags 3
+#   python kfp.py totals --by period --period week --format json
+#   python kfp.py export ledger.csv && python kfp.py --db new.db import ...
+
+
+def parse_date(text: str) -> int:
+    try:
+        return date_to_serial(Date.fromisoformat(text))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO date: {text}")
+
+
+def parse_ids(text: str) -> tuple[int, ...]:
+    try:
+        return tuple(int(id) for id in text.split(",") if id.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a list of ids: {text}")
+
+
+def format_date(serial: int) -> str:
+    return serial_to_date(serial).isoformat()
+
+
+# Files named .json or .jsonl hold JSON Lines whatever --format says
+def file_format(path: str, default: str) -> str:
+    if path.endswith((".json", ".jsonl")):
+        return "json"
+    if path.endswith(".csv"):
+        return "csv"
+    return default
+
+
+# Writes dict records to out as CSV, with a header taken from the first
+# record, or as one JSON object per line
+class RecordWriter:
+    def __init__(self, out, format: str) -> None:
+        self.out = out
+        self.format = format
+        self.csv = csv.writer(out) if format == "csv" else None
+        self.header_written = False
+
+    def write(self, record: dict) -> None:
+        if self.csv is None:
+            self.out.write(json.dumps(record) + "\n")
+            return
+        if not self.header_written:
+            self.csv.writerow(record.keys())
+            self.header_written = True
+        self.csv.writerow(flatten(value) for value in record.values())
+
+    def write_all(self, records: Iterable[dict]) -> int:
+        count = 0
+        for record in records:
+            self.write(record)
+            count += 1
+        return count
+
+
+# CSV cells for the nested values of event records: accounts as
+# "3:credit;5:debit" and tags as "1;2"
+def flatten(value) -> object:
+    if isinstance(value, dict):
+        return ";".join(f"{key}:{side}" for key, side in value.items())
+    if isinstance(value, (list, tuple)):
+        return ";".join(str(item) for item in value)
+    return value
+
+
+def event_record(event: db.Event) -> dict:
+    return {
+        "id": event.id,
+        "date": format_date(event.date),
+        "amount": event.amount,
+        "name": event.name,
+        "memo": event.memo,
+        "accounts": {
+            str(account_id): "credit" if is_credit else "debit"
+            for account_id, is_credit in event.accounts.items()
+        },
+        "tags": list(event.tag_ids),
+    }
+
+
+def add_filters(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group(
+        "filters", "dates are ISO, amounts in cents, ids comma separated"
+    )
+    group.add_argument("--id", type=int)
+    group.add_argument("--since", type=parse_date, help="on or after")
+    group.add_argument("--until", type=parse_date, help="on or before")
+    group.add_argument("--on", type=parse_date)
+    group.add_argument("--amount-over", type=int)
+    group.add_argument("--amount-under", type=int)
+    group.add_argument("--name")
+    group.add_argument("--name-contains")
+    group.add_argument("--words", help="name or memo has every word")
+    group.add_argument("--prefix", help="name or memo has a word starting so")
+    group.add_argument("--phrase", help="name or memo has the phrase")
+    group.add_argument("--match", help="raw full text query")
+    for kind in ("tags", "accounts"):
+        for quantifier in ("any", "all", "no"):
+            group.add_argument(f"--{quantifier}-{kind}", type=parse_ids)
+
+
+def build_fetcher(args: argparse.Namespace) -> db.EventFetcher:
+    fetcher = db.fetch_events()
+    if args.id is not None:
+        fetcher.id_is(args.id)
+    if args.since is not None:
+        fetcher.after(args.since - 1)
+    if args.until is not None:
+        fetcher.before(args.until + 1)
+    if args.on is not None:
+        fetcher.on(args.on)
+    if args.amount_over is not None:
+        fetcher.amount_greater(args.amount_over)
+    if args.amount_under is not None:
+        fetcher.amount_less(args.amount_under)
+    if args.name is not None:
+        fetcher.name_is(args.name)
+    if args.name_contains is not None:
+        fetcher.name_contains(args.name_contains)
+    if args.words is not None:
+        fetcher.has_words(args.words)
+    if args.prefix is not None:
+        fetcher.has_prefix(args.prefix)
+    if args.phrase is not None:
+        fetcher.has_phrase(args.phrase)
+    if args.match is not None:
+        fetcher.matches(args.match)
+    for kind in ("tags", "accounts"):
+        for quantifier in ("any", "all", "no"):
+            ids = getattr(args, f"{quantifier}_{kind}")
+            if ids:
+                getattr(fetcher, f"{quantifier}_{kind}")(*ids)
+    return fetcher
+
+
+def events_command(args: argparse.Namespace, out: RecordWriter) -> int:
+    events = build_fetcher(args).iter_events()
+    out.write_all(event_record(event) for event in events)
+    return 0
+
+
+def export_command(args: argparse.Namespace, out: RecordWriter) -> int:
+    events = build_fetcher(args).iter_events()
+    format = file_format(args.path, args.format)
+    with open(args.path, "w", newline="") as f:
+        count = RecordWriter(f, format).write_all(
+            event_record(event) for event in events
+        )
+    print(f"Exported {count} events to {args.path}", file=sys.stderr)
+    return 0
+
+
+def balances_command(args: argparse.Namespace, out: RecordWriter) -> int:
+    if args.as_of is None:
+        balances = db.fetch_balances()
+    else:
+        balances = db.fetch_balances_as_of(args.as_of)
+    names = db.fetch_account_names()
+    out.write_all(
+        {"account": id, "name": names.get(id), "balance": balance}
+        for id, balance in balances
+    )
+    return 0
+
+
+def totals_command(args: argparse.Namespace, out: RecordWriter) -> int:
+    names = dict()
+    if args.by == "tag":
+        names = db.fetch_tag_names()
+    elif args.by == "account":
+        names = db.fetch_account_names()
+    totals = build_fetcher(args).iter_totals(args.by, args.period)
+    for key, count, inflow, outflow in totals:
+        record = {args.by: key}
+        if names:
+            record["name"] = names.get(key)
+        record |= {
+            "events": count,
+            "inflow": inflow,
+            "outflow": outflow,
+            "net": inflow - outflow,
+        }
+        out.write(record)
+    return 0
+
+
+def accounts_command(args: argparse.Namespace, out: RecordWriter) -> int:
+    out.write_all(
+        {
+            "id": account.id,
+            "name": account.name,
+            "description": account.description,
+            "min_balance": account.min_balance,
+            "max_balance": account.max_balance,
+            "balance": account.balance,
+        }
+        for account in db.fetch_all_registered_accounts()
+    )
+    return 0
+
+
+def tags_command(args: argparse.Namespace, out: RecordWriter) -> int:
+    out.write_all(
+        {
+            "id": tag.id,
+            "name": tag.name,
+            "description": tag.description,
+            "usage": tag.usage,
+        }
+        for tag in db.fetch_all_registered_tags()
+    )
+    return 0
+
+
+def read_records(f, format: str) -> Iterator[dict]:
+    if format == "csv":
+        yield from csv.DictReader(f)
+    else:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_accounts(value) -> dict[int, bool]:
+    if isinstance(value, str):
+        value = dict(
+            pair.split(":", 1) for pair in value.split(";") if pair.strip()
+        )
+    accounts: dict[int, bool] = dict()
+    for account_id, side in (value or dict()).items():
+        if side not in ("credit", "debit"):
+            raise ValueError(f"account side must be credit or debit: {side}")
+        accounts[int(account_id)] = side == "credit"
+    return accounts
+
+
+def parse_tags(value) -> list[int]:
+    if isinstance(value, str):
+        value = [tag for tag in value.split(";") if tag.strip()]
+    return [int(tag) for tag in value or ()]
+
+
+# Validated insert_event arguments of an imported record
+def parse_event(
+    record: dict, accounts: set[int], tags: set[int]
+) -> tuple[int, int, str, str, dict[int, bool], list[int]]:
+    event_accounts = parse_accounts(record.get("accounts"))
+    event_tags = parse_tags(record.get("tags"))
+    unknown = [id for id in event_accounts if id not in accounts]
+    unknown += [id for id in event_tags if id not in tags]
+    if unknown:
+        raise ValueError(f"unknown account or tag ids {unknown}")
+    return (
+        date_to_serial(Date.fromisoformat(record["date"])),
+        int(record["amount"]),
+        str(record.get("name") or ""),
+        str(record.get("memo") or ""),
+        event_accounts,
+        event_tags,
+    )
+
+
+# Inserts every record of the file as a new event, ignoring exported ids.
+# Nothing is kept unless the whole file is valid.
+def import_command(args: argparse.Namespace, out: RecordWriter) -> int:
+    accounts = set(db.fetch_account_names())
+    tags = set(db.fetch_tag_names())
+    count = 0
+    f = sys.stdin if args.path == "-" else open(args.path, newline="")
+    records = read_records(f, file_format(args.path, args.format))
+    try:
+        for line, record in enumerate(records, 1):
+            try:
+                db.insert_event(*parse_event(record, accounts, tags))
+            # A record that breaks a constraint, e.g. repeats a tag, fails in
+            # SQLite rather than in parse_event
+            except (KeyError, TypeError, ValueError, sqlite3.Error) as e:
+                db.rollback_changes()
+                print(f"{args.path}:{line}: {e!r}", file=sys.stderr)
+                print("Nothing was imported", file=sys.stderr)
+                return 1
+            count += 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    db.commit_changes()
+    print(f"Imported {count} events", file=sys.stderr)
+    return 0
+
+
+def check_command(args: argparse.Namespace, out: RecordWriter) -> int:
+    problems = 0
+    for problem in db.check_integrity():
+        out.write({"check": "integrity", "problem": problem})
+        problems += 1
+    mismatches = db.check_account_balances()
+    for account_id, (maintained, recomputed) in mismatches.items():
+        out.write(
+            {
+                "check": "balance",
+                "problem": f"account {account_id} balance is {maintained}, "
+                f"the ledger sums to {recomputed}",
+            }
+        )
+        problems += 1
+    print(f"{problems} problems found", file=sys.stderr)
+    return 1 if problems > 0 else 0
+
+
+def rebuild_balances_command(
+    args: argparse.Namespace, out: RecordWriter
+) -> int:
+    mismatches = db.rebuild_account_balances()
+    db.commit_changes()
+    out.write_all(
+        {"account": id, "maintained": maintained, "recomputed": recomputed}
+        for id, (maintained, recomputed) in mismatches.items()
+    )
+    print(f"Rebuilt balances, {len(mismatches)} mismatched", file=sys.stderr)
+    return 0
+
+
+def vacuum_command(args: argparse.Namespace, out: RecordWriter) -> int:
+    before = os.path.getsize(args.db)
+    db.vacuum()
+    after = os.path.getsize(args.db)
+    print(f"Vacuumed {before} -> {after} bytes", file=sys.stderr)
+    return 0
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="kfp",
+        description="Reports, imports, exports and maintenance of a "
+        "Kairos ledger without the GUI",
+    )
+    parser.add_argument("--db", default=db.DB_PATH, help="ledger database")
+    parser.add_argument(
+        "--format",
+        choices=("csv", "json"),
+        default="csv",
+        help="CSV with a header, or one JSON object per line",
+    )
+    parser.add_argument(
+        "--instrument",
+        metavar="FILE",
+        help="write db latencies and statement counts to FILE as JSON",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    events = commands.add_parser("events", help="matching events")
+    events.set_defaults(run=events_command)
+    add_filters(events)
+
+    export = commands.add_parser(
+        "export", help="matching events to a file import accepts"
+    )
+    export.set_defaults(run=export_command)
+    export.add_argument("path")
+    add_filters(export)
+
+    imports = commands.add_parser(
+        "import", help="events from an export, - for stdin"
+    )
+    imports.set_defaults(run=import_command)
+    imports.add_argument("path")
+
+    balances = commands.add_parser("balances", help="account balances")
+    balances.set_defaults(run=balances_command)
+    balances.add_argument(
+        "--as-of", type=parse_date, help="counting events up to this date"
+    )
+
+    totals = commands.add_parser(
+        "totals", help="event count, inflow and outflow of matching events"
+    )
+    totals.set_defaults(run=totals_command)
+    totals.add_argument(
+        "--by", choices=("tag", "account", "period"), required=True
+    )
+    totals.add_argument(
+        "--period", choices=tuple(db.PERIODS), default="month"
+    )
+    add_filters(totals)
+
+    for name, run, help in (
+        ("accounts", accounts_command, "registered accounts"),
+        ("tags", tags_command, "registered tags"),
+        ("check", check_command, "integrity and balance checks"),
+        (
+            "rebuild-balances",
+            rebuild_balances_command,
+            "recompute balances from the ledger",
+        ),
+        ("vacuum", vacuum_command, "compact the database file"),
+    ):
+        commands.add_parser(name, help=help).set_defaults(run=run)
+
+    return parser
+
+
+def main() -> int:
+    args = make_parser().parse_args()
+    if args.command != "import" and not os.path.exists(args.db):
+        print(f"No database at {args.db}", file=sys.stderr)
+        return 2
+
+    if args.instrument:
+        instrument.enable()
+    db.open_database(args.db, load_registries=False)
+    try:
+        return args.run(args, RecordWriter(sys.stdout, args.format))
+    finally:
+        db.close_database()
+        if args.instrument:
+            instrument.export(args.instrument)
+
+
+if __name__ == "__main__":
+    try:
+        status = main()
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away, e.g. head. Quietly stop like other tools.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        status = 1
+    sys.exit(status)
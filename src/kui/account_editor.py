@@ -8,6 +8,7 @@ from PySide6.QtWidgets import (
 )
 
 import db
+import kui.writes as writes
 from db import Account
 
 
@@ -99,20 +100,20 @@ class AccountEditor(QDialog):
         # set values to the stored account
         self.target_account.update_name(name)
         self.target_account.description = desc
-        self.target_account.min_balance = serialized_min
-        self.target_account.max_balance = serialized_max
+        self.target_account.update_limits(serialized_min, serialized_max)
 
         if self.target_account.id < 0:
-            new_acc = db.register_account(
+            # The account is registered once the writer has given it an id
+            writes.submit(
+                db.insert_account,
                 self.target_account.name,
                 self.target_account.description,
                 self.target_account.min_balance,
                 self.target_account.max_balance,
+                on_done=db.track_account,
             )
-            # calendar.insert_new_event(new_acc) REVISIT THIS TO CONNECT THE ACCOUNT EDITOR TO THE CALENDAR
 
         else:
-            db.alter_accounts(self.target_account)
+            writes.submit(db.alter_accounts, self.target_account)
 
-        db.commit_changes()
         self.close()
@@ -1,19 +1,218 @@
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QAction
+from PySide6.QtCore import (
+    QAbstractTableModel,
+    QModelIndex,
+    QPersistentModelIndex,
+    QSortFilterProxyModel,
+    Qt,
+)
+from PySide6.QtGui import QAction, QColor
 from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QCheckBox,
     QHBoxLayout,
+    QHeaderView,
     QLabel,
+    QLineEdit,
     QMenu,
     QPushButton,
     QSizePolicy,
-    QSpacerItem,
+    QTableView,
     QVBoxLayout,
     QWidget,
 )
+
 import db
+import kui.writes as writes
+from changes import ACCOUNT_BALANCE, ACCOUNT_LIMITS, ACCOUNT_NAME, BUS, Change
 from db import Account
 from kui.account_editor import AccountEditor
 
+NAME, BALANCE, TO_MIN, TO_MAX, STATUS = range(5)
+HEADERS = ("Account", "Balance", "Above min", "Below max", "Status")
+
+# Statuses in grouping order
+BELOW_MIN, ABOVE_MAX, WITHIN = range(3)
+STATUS_NAMES = ("Below min", "Above max", "OK")
+STATUS_COLORS = (QColor("#f4cccc"), QColor("#fce5cd"), None)
+
+# Sort role carrying raw values instead of display text
+SORT_ROLE = Qt.ItemDataRole.UserRole
+
+
+def format_amount(amount: int | None) -> str:
+    if amount is None:
+        return ""
+    sign = "-" if amount < 0 else ""
+    return f"$ {sign}{abs(amount)//100}.{abs(amount)%100:02}"
+
+
+def distance_to_min(account: Account) -> int | None:
+    if account.min_balance is None:
+        return None
+    return account.balance - account.min_balance
+
+
+def distance_to_max(account: Account) -> int | None:
+    if account.max_balance is None:
+        return None
+    return account.max_balance - account.balance
+
+
+def account_status(account: Account) -> int:
+    to_min = distance_to_min(account)
+    if to_min is not None and to_min < 0:
+        return BELOW_MIN
+    to_max = distance_to_max(account)
+    if to_max is not None and to_max < 0:
+        return ABOVE_MAX
+    return WITHIN
+
+
+# Raw value of each column, used for sorting and formatted for display
+SORT_VALUES = (
+    lambda account: account.name.lower(),
+    lambda account: account.balance,
+    distance_to_min,
+    distance_to_max,
+    account_status,
+)
+
+
+# One row per tracked account. Registry changes insert or remove single
+# rows and account changes only refresh the affected row's cells.
+class AccountTableModel(QAbstractTableModel):
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.accounts: list[Account] = sorted(
+            db.ACCOUNTS.values(), key=lambda a: a.id
+        )
+        self.rows: dict[int, int] = {
+            account.id: row for row, account in enumerate(self.accounts)
+        }
+
+        self.subscriptions = [
+            db.subscribe_accounts_changes(self.registry_changed),
+            BUS.subscribe(ACCOUNT_NAME, self.account_changed),
+            BUS.subscribe(ACCOUNT_BALANCE, self.account_changed),
+            BUS.subscribe(ACCOUNT_LIMITS, self.account_changed),
+        ]
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.accounts)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(
+        self, section, orientation, role=Qt.ItemDataRole.DisplayRole
+    ):
+        if (
+            orientation == Qt.Orientation.Horizontal
+            and role == Qt.ItemDataRole.DisplayRole
+        ):
+            return HEADERS[section]
+        return None
+
+    def account(self, index: QModelIndex) -> Account:
+        return self.accounts[index.row()]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        account = self.accounts[index.row()]
+        column = index.column()
+
+        if role == SORT_ROLE:
+            return SORT_VALUES[column](account)
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == NAME:
+                return account.name
+            if column == STATUS:
+                return STATUS_NAMES[account_status(account)]
+            return format_amount(SORT_VALUES[column](account))
+
+        if role == Qt.ItemDataRole.ToolTipRole and column == NAME:
+            return account.description or None
+
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return STATUS_COLORS[account_status(account)]
+
+        if (
+            role == Qt.ItemDataRole.TextAlignmentRole
+            and BALANCE <= column <= TO_MAX
+        ):
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+
+        return None
+
+    def registry_changed(self, change: Change) -> None:
+        account_id = change.key
+        account = db.ACCOUNTS.get(account_id)
+        row = self.rows.get(account_id)
+
+        if account is not None and row is None:
+            row = len(self.accounts)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.accounts.append(account)
+            self.rows[account_id] = row
+            self.endInsertRows()
+        elif account is None and row is not None:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.accounts.pop(row)
+            self.rows.pop(account_id)
+            for i in range(row, len(self.accounts)):
+                self.rows[self.accounts[i].id] = i
+            self.endRemoveRows()
+
+    def account_changed(self, change: Change) -> None:
+        row = self.rows.get(change.key)
+        if row is None:
+            return
+        # Balance and limit changes also move the derived columns
+        self.dataChanged.emit(self.index(row, NAME), self.index(row, STATUS))
+
+
+# Sorting, filtering by name and optionally grouping rows by status
+class AccountProxyModel(QSortFilterProxyModel):
+    def __init__(self, model: AccountTableModel) -> None:
+        super().__init__()
+
+        self.grouped = False
+
+        self.setSourceModel(model)
+        self.setSortRole(SORT_ROLE)
+        self.setFilterKeyColumn(NAME)
+        self.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.setDynamicSortFilter(True)
+
+    def set_grouped(self, grouped: bool) -> None:
+        self.grouped = grouped
+        self.invalidate()
+
+    def lessThan(
+        self,
+        left: QModelIndex | QPersistentModelIndex,
+        right: QModelIndex | QPersistentModelIndex,
+    ) -> bool:
+        if self.grouped:
+            model = self.sourceModel()
+            left_status = model.index(left.row(), STATUS).data(SORT_ROLE)
+            right_status = model.index(right.row(), STATUS).data(SORT_ROLE)
+            if left_status != right_status:
+                # Groups keep their order whichever way a column is sorted
+                if self.sortOrder() == Qt.SortOrder.DescendingOrder:
+                    return left_status > right_status
+                return left_status < right_status
+
+        left_value = left.data(SORT_ROLE)
+        right_value = right.data(SORT_ROLE)
+        # Accounts without a limit sort after those with one
+        if left_value is None or right_value is None:
+            return left_value is not None and right_value is None
+        return left_value < right_value
+
 
 class BalanceSheet(QWidget):
     def __init__(self) -> None:
@@ -30,15 +229,39 @@ class BalanceSheet(QWidget):
         )
         self.lay.addWidget(header)
 
-        self.account_list = QVBoxLayout()
-        self.populate()
-        self.lay.addLayout(self.account_list)
+        controls = QHBoxLayout()
+        self.filter = QLineEdit()
+        self.filter.setPlaceholderText("Filter accounts...")
+        controls.addWidget(self.filter)
+        self.group_by_status = QCheckBox("Group by status")
+        controls.addWidget(self.group_by_status)
+        self.lay.addLayout(controls)
 
-        self.lay.addItem(
-            QSpacerItem(
-                0, 0, QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Expanding
-            )
+        self.model = AccountTableModel()
+        self.proxy = AccountProxyModel(self.model)
+        self.filter.textChanged.connect(self.proxy.setFilterFixedString)
+        self.group_by_status.toggled.connect(self.proxy.set_grouped)
+
+        self.view = QTableView()
+        self.view.setModel(self.proxy)
+        self.view.setSortingEnabled(True)
+        self.view.sortByColumn(NAME, Qt.SortOrder.AscendingOrder)
+        self.view.setSelectionBehavior(
+            QAbstractItemView.SelectionBehavior.SelectRows
+        )
+        self.view.setEditTriggers(
+            QAbstractItemView.EditTrigger.NoEditTriggers
         )
+        self.view.verticalHeader().hide()
+        self.view.horizontalHeader().setSectionResizeMode(
+            NAME, QHeaderView.ResizeMode.Stretch
+        )
+        self.view.doubleClicked.connect(
+            lambda index: self.edit_account(self.account_at(index))
+        )
+        self.view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.show_context_menu)
+        self.lay.addWidget(self.view)
 
         new_account_button = QPushButton("+")
         new_account_button.setSizePolicy(
@@ -49,82 +272,35 @@ class BalanceSheet(QWidget):
         new_account_button.clicked.connect(self.create_new)
         self.lay.addWidget(new_account_button)
 
-        db.subscribe_accounts_changes(self.refresh)
-
-    def populate(self) -> None:
-        for account_id in sorted(db.ACCOUNTS.keys()):
-            account = db.ACCOUNTS[account_id]
-            element = AccountElement(account)
-            self.account_list.addLayout(element)
-
     def create_new(self) -> None:
         form = AccountEditor(Account(-1, "", "", 0, 0))
         form.exec()
 
-    def refresh(self) -> None:
-        for _ in range(self.account_list.count()):
-            self.account_list.takeAt(0).layout().deleteLater()
+    def account_at(self, index: QModelIndex) -> Account:
+        return self.model.account(self.proxy.mapToSource(index))
 
-        self.populate()
-
-
-class AccountElement(QHBoxLayout):
-    def __init__(self, account: Account) -> None:
-        super().__init__()
-
-        self.account = account
-        self.account_name = QPushButton(account.name)
-        self.spacer = QSpacerItem(
-            0, 0, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum
-        )
-        self.account_balance = QLabel(
-            f"$ {account.balance//100}.{account.balance%100}"
-        )
-
-        self.addWidget(self.account_name)
-        self.addSpacerItem(self.spacer)
-        self.addWidget(self.account_balance)
-
-        self.account_name.clicked.connect(self.launch_editor)
-
-        self.name_listener = account.subscribe_name_changes(
-            lambda _, n: self.account_name.setText(n)
-        )
-        self.balance_listener = account.subscribe_balance_changes(
-            lambda _, n: self.account_balance.setText(f"$ {n//100}.{n%100}")
-        )
-
-        self.account_name.setContextMenuPolicy(
-            Qt.ContextMenuPolicy.CustomContextMenu
-        )
-        self.account_name.customContextMenuRequested.connect(
-            self.show_context_menu
-        )
-
-    def deleteLater(self) -> None:
-        self.account_name.deleteLater()
-        self.account_balance.deleteLater()
-        self.account.unsubscribe_name_changes(self.name_listener)
-        self.account.unsubscribe_balance_changes(self.balance_listener)
-        return super().deleteLater()
-
-    def launch_editor(self) -> None:
-        form = AccountEditor(self.account)
+    def edit_account(self, account: Account) -> None:
+        form = AccountEditor(account)
         form.exec()
 
     def show_context_menu(self, position) -> None:
-        context_menu = QMenu(self.account_name)
+        index = self.view.indexAt(position)
+        if not index.isValid():
+            return
+        account = self.account_at(index)
+
+        context_menu = QMenu(self.view)
 
-        edit_event = QAction("Edit Account", self.account_name)
-        edit_event.triggered.connect(self.launch_editor)
-        context_menu.addAction(edit_event)
+        edit_account = QAction("Edit Account", self.view)
+        edit_account.triggered.connect(lambda: self.edit_account(account))
+        context_menu.addAction(edit_account)
 
-        delete_event = QAction("Delete Account", self.account_name)
-        delete_event.triggered.connect(self.delete_account)
-        context_menu.addAction(delete_event)
+        delete_account = QAction("Delete Account", self.view)
+        delete_account.triggered.connect(lambda: self.delete_account(account))
+        context_menu.addAction(delete_account)
 
-        context_menu.exec(self.account_name.mapToGlobal(position))
+        context_menu.exec(self.view.viewport().mapToGlobal(position))
 
-    def delete_account(self) -> None:
-        db.delete_accounts(self.account)
-        db.commit_changes()
+    def delete_account(self, account: Account) -> None:
+        db.untrack_accounts(account)
+        writes.submit(db.erase_accounts, account)
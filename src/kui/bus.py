@@ -0,0 +1,15 @@
+from PySide6.QtCore import QObject, QTimer
+
+from changes import BUS, Subscription
+
+
+# Coalesces changes published within one event loop tick into one delivery
+def install() -> None:
+    BUS.install_scheduler(lambda flush: QTimer.singleShot(0, flush))
+
+
+# Cancels the subscription when owner is destroyed, for callbacks that
+# capture a widget rather than being one of its methods
+def bind(owner: QObject, subscription: Subscription) -> Subscription:
+    owner.destroyed.connect(lambda *_: subscription.cancel())
+    return subscription
@@ -1,9 +1,10 @@
 from datetime import date as Date
 from datetime import timedelta
 
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QAction
+from PySide6.QtCore import QPoint, QRect, QSize, Qt, Signal
+from PySide6.QtGui import QAction, QColor, QPainter, QPen
 from PySide6.QtWidgets import (
+    QButtonGroup,
     QFrame,
     QHBoxLayout,
     QLabel,
@@ -11,13 +12,20 @@ from PySide6.QtWidgets import (
     QPushButton,
     QScrollArea,
     QSizePolicy,
+    QStackedWidget,
     QVBoxLayout,
     QWidget,
 )
 
 import db
-from db import Event
-from kui.event_editor import EventEditor
+from changes import Change
+from db import Event, EventRow
+from kui.dates import date_to_serial, serial_to_week, week_start
+from kui.event_editor import EventEditor, submit_event_write
+from kui.loader import WindowLoader, deletion_settled, hide_deleted
+from kui.navigation import DateScrollBar, NavigationBar
+from kui.prefetch import PrefetchScheduler
+from kui.zoom import MONTH, YEAR, ZoomView
 
 CURRENT_YEAR, CURRENT_WEEK, _ = Date.today().isocalendar()
 FIRST_DAY_OF_CURRENT_WEEK = Date.fromisocalendar(
@@ -25,176 +33,402 @@ FIRST_DAY_OF_CURRENT_WEEK = Date.fromisocalendar(
 ) - timedelta(days=1)  # -1 days to make it sunday
 
 UNIT_WEEK = timedelta(weeks=1)
-UNIX_EPOCH = Date(1970, 1, 1)
 
+WEEK = "week"
 
-def date_to_serial(date: Date) -> int:
-    return (date - UNIX_EPOCH).days
 
+# Number of Week widgets kept alive, enough for the viewport plus the
+# largest prefetch margin. Further weeks reuse these widgets.
+POOL_WEEKS = 48
 
-def serial_to_date(serial: int) -> Date:
-    return UNIX_EPOCH + timedelta(days=serial)
+LOADED_DAYS: dict[int, "Day | PaintedDay"] = dict()
 
 
-LOADED_DAYS: dict[int, "Day"] = dict()
-
-
-def get_loaded_events(date: Date) -> list[Event]:
-    serial = date_to_serial(date)
-    low = 0
-    high = len(db.LOADED_EVENTS) - 1
-    mid = 0
-    while low <= high:
-        mid = low + (high - low) // 2
-        if db.LOADED_EVENTS[mid].date == serial:
-            break
-        elif db.LOADED_EVENTS[mid].date > serial:
-            high = mid - 1
-        else:
-            low = mid + 1
-
-    while mid - 1 >= 0 and db.LOADED_EVENTS[mid - 1].date == serial:
-        mid -= 1
-
-    events: list[Event] = list()
-    while mid < len(db.LOADED_EVENTS) and db.LOADED_EVENTS[mid].date == serial:
-        events.append(db.LOADED_EVENTS[mid])
-        mid += 1
-
-    return events
+def get_loaded_events(date: Date) -> list[EventRow]:
+    return db.LOADED_EVENTS.on(date_to_serial(date))
 
 
 def insert_new_event(event: Event) -> None:
-    low = 0
-    high = len(db.LOADED_EVENTS) - 1
-    mid = 0
-    while low <= high:
-        mid = low + (high - low) // 2
-        if db.LOADED_EVENTS[mid].date == event.date:
-            while (
-                mid < len(db.LOADED_EVENTS)
-                and db.LOADED_EVENTS[mid].date == event.date
-            ):
-                mid += 1
-            low = mid
-        elif db.LOADED_EVENTS[mid].date > event.date:
-            high = mid - 1
-        else:
-            low = mid + 1
+    db.LOADED_EVENTS.add(EventRow.of(event))
 
-    db.LOADED_EVENTS.insert(low, event)
-    refresh_day(event.date)
 
-
-def refresh_day(date: int) -> None:
-    day = LOADED_DAYS.get(date)
+def refresh_day(change: Change) -> None:
+    day = LOADED_DAYS.get(change.key)
     if day is not None:
-        day.clear_elements()
-        day.load_elements()
+        day.sync_elements()
+
+
+# Days follow the loaded events through change notifications
+db.LOADED_EVENTS.subscribe_changes(refresh_day)
 
 
 class Day(QPushButton):
     def __init__(self, date: Date) -> None:
         super().__init__()
 
-        LOADED_DAYS[date_to_serial(date)] = self
-
-        self.date = date
-        color = "blue" if date == Date.today() else "black"
-        self.setStyleSheet(f"border-radius : 0; border : 2px solid {color}")
         self.setMinimumSize(100, 100)
         self.setSizePolicy(
             QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         )
-        self.date_label = QLabel(
-            f"{self.date.year}/{self.date.month}/{self.date.day}"
-        )
+        self.date_label = QLabel()
         self.events_layout = QVBoxLayout(self)
         self.events_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
         self.events_layout.addWidget(self.date_label)
         self.clicked.connect(self.create_new_event)
-        self.load_elements()
+        # Elements keyed by the event they show, in layout order
+        self.elements: dict[EventRow, EventCalendarElement] = dict()
+        self.date = date
+        self.bind(date)
 
-    def load_elements(self):
-        for event in get_loaded_events(self.date):
-            element = EventCalendarElement(event)
-            self.events_layout.addWidget(element)
+    # Points this (possibly recycled) Day at a new date
+    def bind(self, date: Date) -> None:
+        old_serial = date_to_serial(self.date)
+        if LOADED_DAYS.get(old_serial) is self:
+            LOADED_DAYS.pop(old_serial)
+        LOADED_DAYS[date_to_serial(date)] = self
 
-    def clear_elements(self):
-        for i in reversed(range(1, self.events_layout.count())):
-            item = self.events_layout.itemAt(i)
-            widget = item.widget()
-            if widget is not None:
-                widget.deleteLater()
+        self.date = date
+        color = "blue" if date == Date.today() else "black"
+        self.setStyleSheet(f"border-radius : 0; border : 2px solid {color}")
+        self.date_label.setText(
+            f"{self.date.year}/{self.date.month}/{self.date.day}"
+        )
+        self.sync_elements()
+
+    # Applies the minimal changes that make the elements match the loaded
+    # events: removals, insertions, moves and relabels
+    def sync_elements(self) -> None:
+        events = get_loaded_events(self.date)
+        wanted = set(events)
+
+        for event in list(self.elements.keys()):
+            if event not in wanted:
+                element = self.elements.pop(event)
+                self.events_layout.removeWidget(element)
+                element.deleteLater()
+
+        # Position 0 holds the date label
+        for position, event in enumerate(events, start=1):
+            element = self.elements.get(event)
+            if element is None:
+                element = EventCalendarElement(event)
+                self.elements[event] = element
+                self.events_layout.insertWidget(position, element)
+                continue
+
+            element.relabel()
+            if self.events_layout.indexOf(element) != position:
+                self.events_layout.removeWidget(element)
+                self.events_layout.insertWidget(position, element)
 
     def create_new_event(self):
-        form = EventEditor(
-            Event(-1, date_to_serial(self.date), -1, "", "", dict(), list())
-        )
-        form.exec()
+        create_event_on(self.date)
+
+
+def launch_event_editor(event: Event) -> None:
+    form = EventEditor(event)
+    form.exec()
+
+
+def open_loaded_event(row: EventRow) -> None:
+    launch_event_editor(db.hydrate_event(row))
+
+
+def create_event_on(date: Date) -> None:
+    launch_event_editor(
+        Event(-1, date_to_serial(date), -1, "", "", dict(), list())
+    )
+
+
+def delete_loaded_event(row: EventRow) -> None:
+    # Balances and the calendar update now, the rows go on the writer.
+    # Fetches in flight until then must not load the event again.
+    event = db.hydrate_event(row)
+    db.unload_events(event)
+    hide_deleted(event)
+    submit_event_write(
+        event,
+        db.erase_events,
+        on_done=lambda _: deletion_settled(event),
+        on_failed=lambda _: deletion_settled(event),
+    )
+
+
+def show_event_context_menu(
+    widget: QWidget, event: EventRow, position
+) -> None:
+    context_menu = QMenu(widget)
+
+    edit_event = QAction("Edit Event", widget)
+    edit_event.triggered.connect(lambda: open_loaded_event(event))
+    context_menu.addAction(edit_event)
+
+    delete_event = QAction("Delete Event", widget)
+    delete_event.triggered.connect(lambda: delete_loaded_event(event))
+    context_menu.addAction(delete_event)
+
+    context_menu.exec(widget.mapToGlobal(position))
 
 
 class EventCalendarElement(QPushButton):
-    def __init__(self, target_event: Event) -> None:
+    def __init__(self, target_event: EventRow) -> None:
         super().__init__()
 
         self.target_event = target_event
 
-        self.setText(self.target_event.name)
+        self.relabel()
 
         self.clicked.connect(self.launch_editor)
         self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
 
+    def relabel(self) -> None:
+        if self.text() != self.target_event.name:
+            self.setText(self.target_event.name)
+
     def launch_editor(self):
-        form = EventEditor(self.target_event)
-        form.exec()
+        open_loaded_event(self.target_event)
 
     def delete_event(self):
-        db.delete_events(self.target_event)
-        db.LOADED_EVENTS.remove(self.target_event)
-        db.commit_changes()
-        refresh_day(self.target_event.date)
+        delete_loaded_event(self.target_event)
 
     def show_context_menu(self, position) -> None:
-        context_menu = QMenu(self)
+        show_event_context_menu(self, self.target_event, position)
+
+
+class Week(QWidget):
+    def __init__(
+        self, calendar: "InfiniteScrollArea", first_day_of_week: Date
+    ) -> None:
+        super().__init__()
+
+        self.calendar = calendar
+        self.first_day = first_day_of_week
+
+        # Weeks render as empty placeholders until their events arrive
+        self.loaded = False
+        self.request_id: int | None = None
+
+        layout = QHBoxLayout(self)
+        layout.setSpacing(0)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        self.days: list[Day] = list()
+        for i in range(7):
+            day_button = Day(first_day_of_week + timedelta(days=i))
+            self.days.append(day_button)
+            layout.addWidget(day_button)
+
+    def bind(self, first_day_of_week: Date) -> None:
+        self.first_day = first_day_of_week
+        self.loaded = False
+        for i, day_button in enumerate(self.days):
+            day_button.bind(first_day_of_week + timedelta(days=i))
+
+    def serial_range(self) -> tuple[int, int]:
+        first = date_to_serial(self.first_day)
+        return first, first + 7
+
+
+class PaintedDay:
+    def __init__(self, week: "PaintedWeek", date: Date) -> None:
+        self.week = week
+        self.date = date
+        self.bind(date)
 
-        edit_event = QAction("Edit Event", self)
-        edit_event.triggered.connect(self.launch_editor)
-        context_menu.addAction(edit_event)
+    def bind(self, date: Date) -> None:
+        old_serial = date_to_serial(self.date)
+        if LOADED_DAYS.get(old_serial) is self:
+            LOADED_DAYS.pop(old_serial)
+        LOADED_DAYS[date_to_serial(date)] = self
+        self.date = date
 
-        delete_event = QAction("Delete Event", self)
-        delete_event.triggered.connect(self.delete_event)
-        context_menu.addAction(delete_event)
+    def sync_elements(self) -> None:
+        self.week.update()
+
+    def create_new_event(self):
+        create_event_on(self.date)
 
-        context_menu.exec(self.mapToGlobal(position))
 
+# Draws a whole week in one widget instead of a QPushButton per day and per
+# event. Days with more events than fit collapse the rest into "+N more".
+class PaintedWeek(QWidget):
+    DAY_HEIGHT = 100
+    HEADER_HEIGHT = 20
+    ROW_HEIGHT = 18
 
-class Week(QHBoxLayout):
     def __init__(
         self, calendar: "InfiniteScrollArea", first_day_of_week: Date
     ) -> None:
         super().__init__()
 
         self.calendar = calendar
+        self.first_day = first_day_of_week
 
-        self.setSpacing(0)
-        self.setContentsMargins(0, 0, 0, 0)
-        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        # Weeks render as empty placeholders until their events arrive
+        self.loaded = False
+        self.request_id: int | None = None
 
-        for i in range(7):
-            day = first_day_of_week + timedelta(days=i)
-            day_button = Day(day)
-            self.addWidget(day_button)
+        self.setFixedHeight(self.DAY_HEIGHT)
+        self.setMinimumWidth(700)
+        self.setSizePolicy(
+            QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        )
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+
+        self.days: list[PaintedDay] = [
+            PaintedDay(self, first_day_of_week + timedelta(days=i))
+            for i in range(7)
+        ]
+
+    # Without a layout the default hint is invalid, and extend_upwards
+    # shifts the view by the hinted height of each recycled week
+    def sizeHint(self) -> QSize:
+        return QSize(700, self.DAY_HEIGHT)
+
+    def bind(self, first_day_of_week: Date) -> None:
+        self.first_day = first_day_of_week
+        self.loaded = False
+        for i, day in enumerate(self.days):
+            day.bind(first_day_of_week + timedelta(days=i))
+        self.update()
+
+    def serial_range(self) -> tuple[int, int]:
+        first = date_to_serial(self.first_day)
+        return first, first + 7
+
+    def day_rect(self, i: int) -> QRect:
+        left = self.width() * i // 7
+        right = self.width() * (i + 1) // 7
+        return QRect(left, 0, right - left, self.height())
+
+    # The events drawn for a day and how many are hidden behind "+N more"
+    def visible_events(self, day: PaintedDay) -> tuple[list[EventRow], int]:
+        events = get_loaded_events(day.date)
+        rows = (self.DAY_HEIGHT - self.HEADER_HEIGHT) // self.ROW_HEIGHT
+        if len(events) <= rows:
+            return events, 0
+        return events[: rows - 1], len(events) - rows + 1
+
+    def row_rect(self, day_rect: QRect, row: int) -> QRect:
+        return QRect(
+            day_rect.left() + 4,
+            self.HEADER_HEIGHT + row * self.ROW_HEIGHT,
+            day_rect.width() - 8,
+            self.ROW_HEIGHT - 2,
+        )
+
+    # Returns the day under pos, the event under it if any and whether it
+    # is the "+N more" row
+    def hit(self, pos: QPoint) -> tuple[PaintedDay, EventRow | None, bool]:
+        i = min(6, max(0, pos.x() * 7 // max(1, self.width())))
+        day = self.days[i]
+        row = (pos.y() - self.HEADER_HEIGHT) // self.ROW_HEIGHT
+        if pos.y() < self.HEADER_HEIGHT:
+            return day, None, False
+
+        events, hidden = self.visible_events(day)
+        if row < len(events):
+            return day, events[row], False
+        return day, None, hidden > 0 and row == len(events)
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        metrics = painter.fontMetrics()
+        today = Date.today()
+        for i, day in enumerate(self.days):
+            rect = self.day_rect(i)
+            color = "blue" if day.date == today else "black"
+            painter.setPen(QPen(QColor(color), 2))
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            painter.drawRect(rect.adjusted(1, 1, -1, -1))
+
+            painter.setPen(QColor("black"))
+            painter.drawText(
+                rect.adjusted(4, 2, -4, 0),
+                Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                f"{day.date.year}/{day.date.month}/{day.date.day}",
+            )
+
+            events, hidden = self.visible_events(day)
+            for row, loaded_event in enumerate(events):
+                row_rect = self.row_rect(rect, row)
+                painter.fillRect(row_rect, QColor("#e0e0e0"))
+                painter.drawText(
+                    row_rect.adjusted(3, 0, -3, 0),
+                    Qt.AlignmentFlag.AlignVCenter,
+                    metrics.elidedText(
+                        loaded_event.name,
+                        Qt.TextElideMode.ElideRight,
+                        row_rect.width() - 6,
+                    ),
+                )
+            if hidden > 0:
+                painter.drawText(
+                    self.row_rect(rect, len(events)).adjusted(3, 0, -3, 0),
+                    Qt.AlignmentFlag.AlignVCenter,
+                    f"+{hidden} more",
+                )
+
+    def mouseReleaseEvent(self, event) -> None:
+        if event.button() != Qt.MouseButton.LeftButton:
+            return super().mouseReleaseEvent(event)
+
+        day, target_event, is_overflow = self.hit(event.position().toPoint())
+        if is_overflow:
+            self.show_overflow(day, event.position().toPoint())
+        elif target_event is not None:
+            open_loaded_event(target_event)
+        else:
+            day.create_new_event()
+
+    def show_overflow(self, day: PaintedDay, position: QPoint) -> None:
+        menu = QMenu(self)
+        for loaded_event in get_loaded_events(day.date):
+            action = QAction(loaded_event.name, menu)
+            action.triggered.connect(
+                lambda _=False, e=loaded_event: open_loaded_event(e)
+            )
+            menu.addAction(action)
+        menu.exec(self.mapToGlobal(position))
+
+    def show_context_menu(self, position: QPoint) -> None:
+        _, target_event, _ = self.hit(position)
+        if target_event is not None:
+            show_event_context_menu(self, target_event, position)
+
+
+CalendarWeek = Week | PaintedWeek
 
 
 class Calendar(QWidget):
-    def __init__(self) -> None:
+    def __init__(self, painted: bool = False) -> None:
         super().__init__()
 
         layout = QVBoxLayout()
         self.setLayout(layout)
 
+        zoom_buttons = QHBoxLayout()
+        zoom_buttons.addStretch()
+        self.zoom_group = QButtonGroup(self)
+        for level in (WEEK, MONTH, YEAR):
+            button = QPushButton(level.capitalize())
+            button.setCheckable(True)
+            button.setChecked(level == WEEK)
+            button.clicked.connect(lambda _, l=level: self.set_zoom(l))
+            self.zoom_group.addButton(button)
+            zoom_buttons.addWidget(button)
+        layout.addLayout(zoom_buttons)
+
+        self.pages = QStackedWidget()
+        layout.addWidget(self.pages)
+
+        week_page = QWidget()
+        week_layout = QVBoxLayout(week_page)
+        week_layout.setContentsMargins(0, 0, 0, 0)
+
         header = QHBoxLayout()
         for s in ("SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"):
             label = QLabel(s)
@@ -206,19 +440,61 @@ class Calendar(QWidget):
             # label.setFixedWidth(80)
             label.setAlignment(Qt.AlignmentFlag.AlignCenter)
             header.addWidget(label)
-        layout.addLayout(header)
 
-        layout.addWidget(InfiniteScrollArea())
+        self.scroll_area = InfiniteScrollArea(painted)
+        scroll_layout = QHBoxLayout()
+        scroll_layout.setSpacing(0)
+        scroll_layout.addWidget(self.scroll_area)
+        self.date_bar = DateScrollBar(self.scroll_area)
+        scroll_layout.addWidget(self.date_bar)
+        week_layout.addWidget(NavigationBar(self.scroll_area))
+        week_layout.addLayout(header)
+        week_layout.addLayout(scroll_layout)
+        self.pages.addWidget(week_page)
+
+        # Month and year views render from day aggregates only
+        self.zoom_view = ZoomView()
+        self.zoom_view.date_selected.connect(self.drill_down)
+        self.pages.addWidget(self.zoom_view)
 
         # self.setSizePolicy(
         #     QSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Expanding)
         # )
 
+    # Fills the week view once the database is open
+    def start(self) -> None:
+        self.scroll_area.populate()
+        self.date_bar.fit_range(serial_to_week(date_to_serial(Date.today())))
+
+    def set_zoom(self, level: str) -> None:
+        for button in self.zoom_group.buttons():
+            button.setChecked(button.text().lower() == level)
+
+        if level == WEEK:
+            self.pages.setCurrentIndex(0)
+            return
+
+        if self.pages.currentIndex() == 0:
+            anchor = self.scroll_area.first_visible_day()
+        else:
+            anchor = self.zoom_view.anchor
+        self.zoom_view.set_level(level, anchor)
+        self.pages.setCurrentIndex(1)
+
+    def drill_down(self, date: Date) -> None:
+        self.set_zoom(WEEK)
+        self.scroll_area.jump_to(date)
+
 
 class InfiniteScrollArea(QScrollArea):
-    def __init__(self) -> None:
+    # Emitted after the window was rebound around a new date
+    jumped = Signal(object)
+
+    def __init__(self, painted: bool = False) -> None:
         super().__init__()
 
+        self.week_type = PaintedWeek if painted else Week
+
         self.setWidgetResizable(True)
 
         area_widget = QFrame(self)
@@ -234,66 +510,245 @@ class InfiniteScrollArea(QScrollArea):
         self.min = FIRST_DAY_OF_CURRENT_WEEK
         self.max = self.min
 
-        self.expanding = False
-
-        # Check scrollbar position on a timer
-        # self.timer = QTimer(self)
-        # self.timer.timeout.connect(self.scrolled)
-        # self.timer.start(50)
+        self.pool_weeks = POOL_WEEKS
+        self.weeks: list[CalendarWeek] = list()
+        self.requested_weeks: dict[int, list[CalendarWeek]] = dict()
+        self.loader = WindowLoader()
+        self.loader.loaded.connect(self.merge_events)
 
-        # Check scrollbar position when it changes
-        self.verticalScrollBar().valueChanged.connect(self.scrolled)
+        # Extend and load ahead of the viewport based on scroll velocity
+        self.prefetch = PrefetchScheduler(self)
+        self.verticalScrollBar().valueChanged.connect(
+            self.prefetch.value_changed
+        )
 
         # Correct scrollbar position after upward extension
-        # self.slider_max = self.verticalScrollBar().maximum()
-        # self.verticalScrollBar().rangeChanged.connect(self.correct_slider)
+        self.slider_max = self.verticalScrollBar().maximum()
+        self.pending_upward_shift = False
+        self.verticalScrollBar().rangeChanged.connect(self.correct_slider)
 
         # Do not show a scrollbar
         self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
 
-        # Add initial content
+        self.show()
+
+    # Builds the initial window around the current week. Left out of the
+    # constructor so the window can be shown before the database is open.
+    def populate(self) -> None:
         self.extend_downwards(10)
         self.extend_upwards(5)
-        # self.thread().msleep(100)
-        self.show()
-        self.verticalScrollBar().setValue(400)
+        self.pending_upward_shift = False
 
-    def scrolled(self):
-        if self.expanding:
-            return
-        self.expanding = True
-        value = self.verticalScrollBar().value()
-        if value == self.verticalScrollBar().maximum():
-            self.extend_downwards(5)
-            # self.thread().sleep(50)
-        elif value == self.verticalScrollBar().minimum():
-            self.extend_upwards(5)
-            # self.thread().msleep(20)
-            self.verticalScrollBar().setValue(500)
-        self.expanding = False
+    # Rebinds the whole pool around date and loads it from scratch
+    def jump_to(self, date: Date) -> None:
+        self.loader.cancel_all()
+        self.requested_weeks.clear()
+        db.LOADED_EVENTS.clear()
+
+        # Keep a couple of weeks above the target so it is not at the edge
+        self.min = week_start(date) - 2 * UNIT_WEEK
+        self.max = self.min
+        for week in self.weeks:
+            week.request_id = None
+            week.bind(self.max)
+            self.max += UNIT_WEEK
 
+        self.pending_upward_shift = False
+        self.prefetch.samples.clear()
+        self.verticalScrollBar().setValue(2 * self.week_height())
+        self.prefetch.update()
+        self.jumped.emit(date)
+
+    def first_visible_day(self) -> Date:
+        visible = self.visible_week_range()
+        if visible is None:
+            return Date.today()
+        return self.weeks[visible[0]].first_day
+
+    def is_serial_visible(self, serial: int) -> bool:
+        visible = self.visible_week_range()
+        if visible is None:
+            return False
+        first = self.weeks[visible[0]].serial_range()[0]
+        last = self.weeks[visible[1]].serial_range()[1]
+        return first <= serial < last
+
+    def visible_week_range(self) -> tuple[int, int] | None:
+        top = self.verticalScrollBar().value()
+        bottom = top + self.viewport().height()
+        first: int | None = None
+        last: int | None = None
+        for i, week in enumerate(self.weeks):
+            geometry = week.geometry()
+            if geometry.height() == 0:
+                return None
+            if geometry.bottom() >= top and geometry.top() <= bottom:
+                if first is None:
+                    first = i
+                last = i
+            elif first is not None:
+                break
+        if first is None or last is None:
+            return None
+        return first, last
+
+    def week_height(self) -> int:
+        if len(self.weeks) > 0:
+            height = self.weeks[len(self.weeks) // 2].geometry().height()
+            if height > 0:
+                return height
+        return 100
+
+    # Adds n weeks below, recycling weeks from the top once the pool is full
     def extend_downwards(self, n):
-        after = date_to_serial(self.max) - 1
-        before = after + 1 + (7 * n)
-        new_events = db.fetch_events().after(after).before(before).exec()
-        db.LOADED_EVENTS.extend(new_events)
+        new_weeks: list[CalendarWeek] = list()
+        removed_height = 0
         for _ in range(n):
-            self.area_layout.addLayout(Week(self, self.max))
+            if len(self.weeks) < self.pool_weeks:
+                week = self.week_type(self, self.max)
+            else:
+                week = self.weeks.pop(0)
+                removed_height += week.height()
+                self.area_layout.removeWidget(week)
+                self.release_week(week)
+                week.bind(self.max)
+                self.min += UNIT_WEEK
+            self.area_layout.addWidget(week)
+            self.weeks.append(week)
+            new_weeks.append(week)
             self.max += UNIT_WEEK
 
+        if removed_height > 0:
+            self.shift_view(-removed_height)
+            self.evict_events()
+        self.request_weeks(new_weeks)
+
+    # Adds n weeks above, recycling weeks from the bottom once the pool is
+    # full
     def extend_upwards(self, n):
-        before = date_to_serial(self.min)
-        after = before - 1 - (7 * n)
-        new_events = db.fetch_events().before(before).after(after).exec()
-        new_events.extend(db.LOADED_EVENTS)
-        db.LOADED_EVENTS = new_events
+        new_weeks: list[CalendarWeek] = list()
+        added_height = 0
         for _ in range(n):
             self.min -= UNIT_WEEK
-            self.area_layout.insertLayout(0, Week(self, self.min))
+            if len(self.weeks) < self.pool_weeks:
+                week = self.week_type(self, self.min)
+                self.pending_upward_shift = True
+            else:
+                week = self.weeks.pop()
+                self.area_layout.removeWidget(week)
+                self.release_week(week)
+                week.bind(self.min)
+                added_height += week.sizeHint().height()
+                self.max -= UNIT_WEEK
+            self.area_layout.insertWidget(0, week)
+            self.weeks.insert(0, week)
+            new_weeks.insert(0, week)
+
+        if added_height > 0:
+            self.shift_view(added_height)
+            self.evict_events()
+        self.request_weeks(new_weeks)
+
+    def shift_view(self, delta: int) -> None:
+        self.prefetch.shift(delta)
+        self.verticalScrollBar().setValue(
+            self.verticalScrollBar().value() + delta
+        )
+
+    # Detaches a week that is about to be rebound from its pending fetch
+    def release_week(self, week: CalendarWeek) -> None:
+        if week.request_id is None:
+            return
+        weeks = self.requested_weeks.get(week.request_id, list())
+        if week in weeks:
+            weeks.remove(week)
+        if len(weeks) == 0:
+            self.loader.cancel(week.request_id)
+            self.requested_weeks.pop(week.request_id, None)
+        week.request_id = None
+
+    # Drops loaded events that are no longer covered by any week
+    def evict_events(self) -> None:
+        db.LOADED_EVENTS.evict_before(date_to_serial(self.min))
+        db.LOADED_EVENTS.evict_from(date_to_serial(self.max))
+
+    # Fetches a contiguous run of weeks off the GUI thread
+    def request_weeks(self, weeks: list[CalendarWeek]) -> None:
+        if len(weeks) == 0:
+            return
+        after = weeks[0].serial_range()[0] - 1
+        before = weeks[-1].serial_range()[1]
+        request_id = self.loader.request(after, before)
+        self.requested_weeks[request_id] = weeks
+        for week in weeks:
+            week.request_id = request_id
+
+    # Cancels fetches for weeks outside the prefetch band around the
+    # viewport and requests any unloaded weeks inside it
+    def load_near_viewport(self, above: int, below: int) -> None:
+        top = self.verticalScrollBar().value()
+        band_top = top - above
+        band_bottom = top + self.viewport().height() + below
+
+        wanted: set[int] = set()
+        runs: list[list[CalendarWeek]] = [list()]
+        for week in self.weeks:
+            geometry = week.geometry()
+            # Weeks that have not been laid out yet count as near
+            is_near = geometry.height() == 0 or (
+                geometry.bottom() >= band_top and geometry.top() <= band_bottom
+            )
+
+            if is_near and week.request_id is not None:
+                wanted.add(week.request_id)
+
+            if is_near and not week.loaded and week.request_id is None:
+                runs[-1].append(week)
+            elif len(runs[-1]) > 0:
+                runs.append(list())
+
+        for request_id in list(self.requested_weeks.keys()):
+            if request_id not in wanted:
+                self.loader.cancel(request_id)
+                for week in self.requested_weeks.pop(request_id):
+                    week.request_id = None
+
+        for run in runs:
+            self.request_weeks(run)
+
+    def merge_events(
+        self,
+        request_id: int,
+        after: int,
+        before: int,
+        events: list[EventRow],
+    ) -> None:
+        # Weeks may have been recycled while the fetch was in flight
+        after = max(after, date_to_serial(self.min) - 1)
+        before = min(before, date_to_serial(self.max))
+        weeks = self.requested_weeks.pop(request_id, list())
+        if after + 1 >= before:
+            return
+
+        # Events inserted while the fetch was in flight are not duplicated
+        db.LOADED_EVENTS.add_range(
+            e for e in events if after < e.date < before
+        )
+
+        for week in weeks:
+            week.loaded = True
+            week.request_id = None
 
     def correct_slider(self, min, max):
-        # self.thread().msleep(50)
-        if self.verticalScrollBar().value() == min:
-            self.verticalScrollBar().setValue(1000)
-            print(min, max, "Correcting", max - self.slider_max)
+        # First layout: start with the current week at the top
+        if self.slider_max == 0 and max > 0:
+            self.verticalScrollBar().setValue(5 * self.week_height())
+        # Keep the same weeks in view when weeks were added above them
+        elif self.pending_upward_shift and max > self.slider_max:
+            self.pending_upward_shift = False
+            delta = max - self.slider_max
+            self.prefetch.shift(delta)
+            self.verticalScrollBar().setValue(
+                self.verticalScrollBar().value() + delta
+            )
         self.slider_max = max
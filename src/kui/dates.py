@@ -0,0 +1,26 @@
+from datetime import date as Date
+from datetime import timedelta
+
+UNIX_EPOCH = Date(1970, 1, 1)
+
+
+def date_to_serial(date: Date) -> int:
+    return (date - UNIX_EPOCH).days
+
+
+def serial_to_date(serial: int) -> Date:
+    return UNIX_EPOCH + timedelta(days=serial)
+
+
+# Weeks start on Sunday
+def week_start(date: Date) -> Date:
+    return date - timedelta(days=date.isoweekday() % 7)
+
+
+# Sunday-started weeks numbered from the week containing the epoch
+def serial_to_week(serial: int) -> int:
+    return (serial + 4) // 7
+
+
+def week_to_date(week: int) -> Date:
+    return serial_to_date(week * 7 - 4)
@@ -0,0 +1,224 @@
+import json
+
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QCheckBox,
+    QFileDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QTabWidget,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+import instrument
+from kui.monitor import ResponsivenessMonitor
+
+OPERATION_HEADERS = (
+    "Operation",
+    "Calls",
+    "Rows",
+    "Mean ms",
+    "p95 ms",
+    "Max ms",
+)
+
+
+# Sorts by value rather than by its text
+class NumberItem(QTableWidgetItem):
+    def __init__(self, value: float, decimals: int = 0) -> None:
+        super().__init__(f"{value:.{decimals}f}")
+        self.value = value
+        self.setTextAlignment(
+            Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        )
+
+    def __lt__(self, other: QTableWidgetItem) -> bool:
+        if isinstance(other, NumberItem):
+            return self.value < other.value
+        return super().__lt__(other)
+
+
+def read_only_table(headers: tuple[str, ...], stretch: int) -> QTableWidget:
+    table = QTableWidget(0, len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+    table.verticalHeader().hide()
+    table.horizontalHeader().setSectionResizeMode(
+        stretch, QHeaderView.ResizeMode.Stretch
+    )
+    return table
+
+
+# Live view of the db instrumentation: per-operation latencies, statement
+# counts and the slow-call log with query plans, plus the event loop stalls
+# seen by monitor. Polls while visible.
+class DebugPanel(QWidget):
+    def __init__(self, monitor: ResponsivenessMonitor) -> None:
+        super().__init__()
+
+        self.monitor = monitor
+
+        self.setWindowTitle("Database instrumentation")
+        self.resize(900, 600)
+
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.enabled = QCheckBox("Instrument db")
+        self.enabled.setChecked(instrument.enabled)
+        self.enabled.toggled.connect(self.set_enabled)
+        controls.addWidget(self.enabled)
+
+        controls.addWidget(QLabel("Slow after"))
+        self.slow_ms = QSpinBox()
+        self.slow_ms.setRange(1, 10000)
+        self.slow_ms.setSuffix(" ms")
+        self.slow_ms.setValue(int(instrument.slow_ms))
+        self.slow_ms.valueChanged.connect(self.set_slow_ms)
+        controls.addWidget(self.slow_ms)
+
+        self.monitoring = QCheckBox("Monitor event loop")
+        self.monitoring.setChecked(monitor.running)
+        self.monitoring.toggled.connect(monitor.set_running)
+        controls.addWidget(self.monitoring)
+        controls.addStretch()
+
+        reset = QPushButton("Reset")
+        reset.clicked.connect(self.reset)
+        controls.addWidget(reset)
+        export = QPushButton("Export JSON...")
+        export.clicked.connect(self.export)
+        controls.addWidget(export)
+        layout.addLayout(controls)
+
+        tabs = QTabWidget()
+        self.operations = read_only_table(OPERATION_HEADERS, 0)
+        self.operations.setSortingEnabled(True)
+        tabs.addTab(self.operations, "Operations")
+        self.statements = read_only_table(("Count", "Statement"), 1)
+        tabs.addTab(self.statements, "Statements")
+        self.slow = QTreeWidget()
+        self.slow.setHeaderLabels(("Call", "ms"))
+        self.slow.header().setSectionResizeMode(
+            0, QHeaderView.ResizeMode.Stretch
+        )
+        tabs.addTab(self.slow, "Slow calls")
+        self.stalls = QTreeWidget()
+        self.stalls.setHeaderLabels(("Stall", "ms"))
+        self.stalls.header().setSectionResizeMode(
+            0, QHeaderView.ResizeMode.Stretch
+        )
+        tabs.addTab(self.stalls, "Event loop stalls")
+        layout.addWidget(tabs)
+
+        self.subqueries = QLabel()
+        layout.addWidget(self.subqueries)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event) -> None:
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event) -> None:
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def set_enabled(self, enabled: bool) -> None:
+        if enabled:
+            instrument.enable(self.slow_ms.value())
+        else:
+            instrument.disable()
+
+    def set_slow_ms(self, value: int) -> None:
+        instrument.slow_ms = value
+
+    def reset(self) -> None:
+        instrument.reset()
+        self.refresh()
+
+    def export(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export instrumentation", "kfp-trace.json", "JSON (*.json)"
+        )
+        if path:
+            with open(path, "w") as f:
+                json.dump(
+                    {
+                        **instrument.snapshot(),
+                        "event_loop": self.monitor.snapshot(),
+                    },
+                    f,
+                    indent=2,
+                )
+
+    def refresh(self) -> None:
+        # Either may have been toggled from elsewhere
+        for checkbox, checked in (
+            (self.enabled, instrument.enabled),
+            (self.monitoring, self.monitor.running),
+        ):
+            checkbox.blockSignals(True)
+            checkbox.setChecked(checked)
+            checkbox.blockSignals(False)
+
+        snapshot = instrument.snapshot()
+
+        operations = snapshot["operations"]
+        self.operations.setSortingEnabled(False)
+        self.operations.setRowCount(len(operations))
+        for row, (name, timing) in enumerate(operations.items()):
+            self.operations.setItem(row, 0, QTableWidgetItem(name))
+            self.operations.setItem(row, 1, NumberItem(timing["count"]))
+            self.operations.setItem(row, 2, NumberItem(timing["rows"]))
+            self.operations.setItem(row, 3, NumberItem(timing["mean_ms"], 3))
+            self.operations.setItem(row, 4, NumberItem(timing["p95_ms"], 3))
+            self.operations.setItem(row, 5, NumberItem(timing["max_ms"], 3))
+        self.operations.setSortingEnabled(True)
+
+        statements = snapshot["statements"]
+        self.statements.setRowCount(len(statements))
+        for row, (sql, count) in enumerate(statements.items()):
+            self.statements.setItem(row, 0, NumberItem(count))
+            self.statements.setItem(row, 1, QTableWidgetItem(sql))
+
+        self.slow.clear()
+        for call in reversed(snapshot["slow"]):
+            item = QTreeWidgetItem((call["operation"], f"{call['ms']:.1f}"))
+            for statement in call["statements"]:
+                child = QTreeWidgetItem((statement["sql"], ""))
+                for detail in statement["plan"]:
+                    child.addChild(QTreeWidgetItem((detail, "")))
+                item.addChild(child)
+            self.slow.addTopLevelItem(item)
+
+        self.subqueries.setText(
+            "Relation loads: "
+            + ", ".join(
+                f"{name} {count}"
+                for name, count in snapshot["subqueries"].items()
+            )
+        )
+
+        self.stalls.clear()
+        for stall in reversed(self.monitor.stalls):
+            # The innermost frame is the most telling
+            where = ""
+            if len(stall.stack) > 0:
+                where = stall.stack[-1].strip().splitlines()[0]
+            item = QTreeWidgetItem((where, f"{stall.duration_ms:.0f}"))
+            for frame in reversed(stall.stack):
+                item.addChild(QTreeWidgetItem((frame.rstrip(), "")))
+            self.stalls.addTopLevelItem(item)
@@ -1,10 +1,17 @@
+import heapq
+from collections.abc import Callable
+from concurrent.futures import Future
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex
 from PySide6.QtGui import QAction, QDoubleValidator, Qt
 from PySide6.QtWidgets import (
     QDialog,
-    QGridLayout,
     QHBoxLayout,
     QLabel,
     QLineEdit,
+    QListView,
+    QListWidget,
+    QListWidgetItem,
     QMenu,
     QPushButton,
     QSizePolicy,
@@ -14,7 +21,17 @@ from PySide6.QtWidgets import (
 
 import db
 import kui.calendar as calendar
+import kui.writes as writes
+from changes import (
+    ACCOUNT_NAME,
+    ACCOUNT_REGISTRY,
+    BUS,
+    TAG_NAME,
+    TAG_REGISTRY,
+    Change,
+)
 from db import Account, Event, Tag
+from kui.search_index import NameIndex, fuzzy_span
 from kui.tag_editor import TagEditor
 
 
@@ -28,7 +45,6 @@ class EventEditor(QDialog):
         self.removed_tags: list[int] = list()
         self.tag_editor_form = TagSelector(self)
 
-        self.account_selector = AccountSelector(self)
         self.account_changes: dict[int, int] = dict()
         # None - no change
         # 0 - flip cr/dr
@@ -94,7 +110,9 @@ class EventEditor(QDialog):
                 AccountEventItem(self, account, is_credit)
             )
         add_account_button = QPushButton("+")
-        add_account_button.clicked.connect(self.account_selector.exec)
+        add_account_button.clicked.connect(
+            lambda: account_selector().choose(self)
+        )
         self.box.addWidget(add_account_button)
 
         # add account (button)
@@ -126,30 +144,14 @@ class EventEditor(QDialog):
         self.target_event.update_memo(memo)
         self.target_event.update_amount(serialized_amount)
 
-        for tag_id in self.removed_tags:
-            self.target_event.tag_ids.remove(tag_id)
-        for tag_id in self.added_tags:
-            self.target_event.tag_ids.append(tag_id)
+        self.target_event.update_tags(self.removed_tags, self.added_tags)
 
         self.target_event.update_accounts(self.account_changes)
 
         if self.target_event.id < 0:
-            new_event = db.insert_event(
-                self.target_event.date,
-                self.target_event.amount,
-                self.target_event.name,
-                self.target_event.memo,
-                self.target_event.accounts,
-                self.target_event.tag_ids,
-            )
-            calendar.insert_new_event(new_event)
+            store_new_event(self.target_event)
 
         else:
-            db.alter_events(self.target_event)
-
-            db.remove_tags_from_event(self.target_event.id, self.removed_tags)
-            db.add_tags_to_event(self.target_event.id, self.added_tags)
-
             altered_accounts: list[int] = list()
             removed_accounts: list[int] = list()
             added_accounts: list[tuple[int, bool]] = list()
@@ -163,16 +165,16 @@ class EventEditor(QDialog):
                     case -1 | -2:
                         removed_accounts.append(account_id)
 
-            db.toggle_account_type_for_event(
-                self.target_event.id, altered_accounts
-            )
-            db.remove_accounts_from_event(
-                self.target_event.id, removed_accounts
+            submit_event_write(
+                self.target_event,
+                write_event_changes,
+                list(self.removed_tags),
+                list(self.added_tags),
+                altered_accounts,
+                removed_accounts,
+                added_accounts,
             )
-            db.add_accounts_to_event(self.target_event.id, added_accounts)
-            calendar.refresh_day(self.target_event.date)
 
-        db.commit_changes()
         self.close()
 
     def add_account(self, account: Account) -> None:
@@ -220,7 +222,125 @@ class EventEditor(QDialog):
         return super().close()
 
 
+# Latest queued write of each event whose insert has not committed yet.
+# Later writes of the event chain on it, so they run in order once the id
+# is known.
+_pending_writes: dict[Event, Future] = dict()
+
+
+def settle_pending(event: Event) -> None:
+    latest = _pending_writes.get(event)
+    if latest is not None and latest.done():
+        _pending_writes.pop(event)
+
+
+# Shows the event right away and queues its insert. Balances and tag usage
+# already include the event, so a failed insert unloads it again.
+def store_new_event(event: Event) -> None:
+    event.id = db.PENDING_ID
+    calendar.insert_new_event(event)
+
+    def stored(id: int) -> None:
+        event.id = id
+        if event.row is not None:
+            event.row.id = id
+        settle_pending(event)
+
+    def failed(_) -> None:
+        db.unload_events(event)
+        settle_pending(event)
+
+    _pending_writes[event] = writes.submit(
+        db.store_event, event.snapshot(), on_done=stored, on_failed=failed
+    )
+
+
+# Queues fn(snapshot, *args) with a snapshot of the event taken now. While
+# the event's insert is pending, the snapshot gets its id on the writer.
+def submit_event_write(
+    event: Event,
+    fn: Callable,
+    *args,
+    on_done: Callable | None = None,
+    on_failed: Callable | None = None,
+) -> None:
+    latest = _pending_writes.get(event)
+    if latest is None:
+        writes.submit(
+            fn,
+            event.snapshot(),
+            *args,
+            on_done=on_done,
+            on_failed=on_failed,
+        )
+        return
+
+    def settled(callback: Callable | None) -> Callable:
+        def report(result) -> None:
+            settle_pending(event)
+            if callback is not None:
+                callback(result)
+
+        return report
+
+    _pending_writes[event] = writes.submit(
+        write_with_id,
+        fn,
+        event.snapshot(),
+        *args,
+        after=latest,
+        on_done=settled(on_done),
+        on_failed=settled(on_failed),
+    )
+
+
+# Runs on the writer thread. The snapshot belongs to this job alone. Returns
+# the id for the next chained write.
+def write_with_id(id: int, fn: Callable, event: Event, *args) -> int:
+    event.id = id
+    fn(event, *args)
+    return id
+
+
+# Runs on the writer thread with a snapshot of the edited event
+def write_event_changes(
+    event: Event,
+    removed_tags: list[int],
+    added_tags: list[int],
+    altered_accounts: list[int],
+    removed_accounts: list[int],
+    added_accounts: list[tuple[int, bool]],
+) -> None:
+    db.alter_events(event)
+
+    db.remove_tags_from_event(event.id, removed_tags)
+    db.add_tags_to_event(event.id, added_tags)
+
+    db.toggle_account_type_for_event(event.id, altered_accounts)
+    db.remove_accounts_from_event(event.id, removed_accounts)
+    db.add_accounts_to_event(event.id, added_accounts)
+
+
+# Tags used this session come first, most recent first, then the most used
+def tag_rank(tag: Tag) -> tuple:
+    return (-tag.last_used, -tag.usage, tag.name.lower())
+
+
+_tag_index: NameIndex | None = None
+
+
+def tag_index() -> NameIndex:
+    global _tag_index
+    if _tag_index is None:
+        _tag_index = NameIndex()
+        _tag_index.follow(db.TAGS, TAG_REGISTRY, TAG_NAME)
+    return _tag_index
+
+
 class TagSelector(QDialog):
+    # Rows shown at once, the search narrows down the rest
+    MAX_ROWS = 50
+
     def __init__(self, event_editor: EventEditor) -> None:
         super().__init__()
 
@@ -229,160 +349,285 @@ class TagSelector(QDialog):
         self.lay = QVBoxLayout()
         self.setLayout(self.lay)
 
-        self.tags_matrix = QVBoxLayout()
-        self.lay.addLayout(self.tags_matrix)
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Search tags...")
+        self.search.textChanged.connect(self.populate)
+        self.lay.addWidget(self.search)
 
-        # clicking tag from list adds it to that specific event
-        for tag in db.fetch_all_registered_tags():
-            tag_button = TagSelectorButton(
-                self, tag, tag.id in self.event_editor.target_event.tag_ids
-            )
-            self.tags_matrix.addWidget(tag_button)
+        # checking a tag in the list adds it to that specific event
+        self.tag_list = QListWidget()
+        self.tag_list.itemChanged.connect(self.toggle_tag)
+        self.tag_list.setContextMenuPolicy(
+            Qt.ContextMenuPolicy.CustomContextMenu
+        )
+        self.tag_list.customContextMenuRequested.connect(
+            self.show_context_menu
+        )
+        self.lay.addWidget(self.tag_list)
 
         create_tag_button = QPushButton("+")
         create_tag_button.clicked.connect(self.create_tag)
         self.lay.addWidget(create_tag_button)
 
-    def create_tag(self) -> None:
-        form = TagEditor(Tag(-1, "", ""))
-        form.exec()
-
-
-class TagSelectorButton(QPushButton):
-    def __init__(
-        self, tag_editor: TagSelector, tag: Tag, is_event_member: bool
-    ):
-        super().__init__()
-
-        self.tag_editor = tag_editor
-        self.tag = tag
-        self.is_event_member = is_event_member
-        self.is_activated = is_event_member
-
-        self.update_text()
-
-        self.clicked.connect(self.toggle_tag)
+    def exec(self) -> int:
+        self.populate()
+        return super().exec()
 
-        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.customContextMenuRequested.connect(self.show_context_menu)
+    def is_selected(self, tag_id: int) -> bool:
+        editor = self.event_editor
+        if tag_id in editor.target_event.tag_ids:
+            return tag_id not in editor.removed_tags
+        return tag_id in editor.added_tags
+
+    def populate(self) -> None:
+        ids = tag_index().search(self.search.text())
+        tags = heapq.nsmallest(
+            self.MAX_ROWS,
+            (db.TAGS[id] for id in ids if id in db.TAGS),
+            key=tag_rank,
+        )
 
-    def update_text(self):
-        if self.is_activated:
-            self.setText(f"Remove {self.tag.name}")
-        else:
-            self.setText(f"Add {self.tag.name}")
+        self.tag_list.blockSignals(True)
+        self.tag_list.clear()
+        for tag in tags:
+            item = QListWidgetItem(tag.name)
+            item.setData(Qt.ItemDataRole.UserRole, tag.id)
+            item.setToolTip(tag.description)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(
+                Qt.CheckState.Checked
+                if self.is_selected(tag.id)
+                else Qt.CheckState.Unchecked
+            )
+            self.tag_list.addItem(item)
+        self.tag_list.blockSignals(False)
 
-    def toggle_tag(self):
-        self.is_activated = not self.is_activated
-        self.update_text()
+    def toggle_tag(self, item: QListWidgetItem) -> None:
+        tag_id = item.data(Qt.ItemDataRole.UserRole)
+        selected = item.checkState() == Qt.CheckState.Checked
+        if selected == self.is_selected(tag_id):
+            return
 
-        match (self.is_event_member, self.is_activated):
+        editor = self.event_editor
+        match (tag_id in editor.target_event.tag_ids, selected):
             case (True, True):
-                self.tag_editor.event_editor.removed_tags.remove(self.tag.id)
+                editor.removed_tags.remove(tag_id)
             case (True, False):
-                self.tag_editor.event_editor.removed_tags.append(self.tag.id)
+                editor.removed_tags.append(tag_id)
             case (False, True):
-                self.tag_editor.event_editor.added_tags.append(self.tag.id)
+                editor.added_tags.append(tag_id)
             case (False, False):
-                self.tag_editor.event_editor.added_tags.remove(self.tag.id)
+                editor.added_tags.remove(tag_id)
 
     def show_context_menu(self, position) -> None:
+        item = self.tag_list.itemAt(position)
+        if item is None:
+            return
+        tag = db.TAGS.get(item.data(Qt.ItemDataRole.UserRole))
+        if tag is None:
+            return
+
         context_menu = QMenu(self)
 
         edit_event = QAction("Edit Tag", self)
-        edit_event.triggered.connect(self.launch_editor)
+        edit_event.triggered.connect(lambda: self.launch_editor(tag))
         context_menu.addAction(edit_event)
 
         delete_event = QAction("Delete Tag", self)
-        delete_event.triggered.connect(self.delete_tag)
+        delete_event.triggered.connect(lambda: self.delete_tag(tag))
         context_menu.addAction(delete_event)
 
-        context_menu.exec(self.mapToGlobal(position))
+        context_menu.exec(self.tag_list.mapToGlobal(position))
 
-    def launch_editor(self) -> None:
-        form = TagEditor(self.tag)
+    def launch_editor(self, tag: Tag) -> None:
+        form = TagEditor(tag)
         form.exec()
+        self.populate()
 
-    def delete_tag(self) -> None:
-        db.delete_tags(self.tag)
-        db.commit_changes()
+    def delete_tag(self, tag: Tag) -> None:
+        editor = self.event_editor
+        if tag.id in editor.added_tags:
+            editor.added_tags.remove(tag.id)
+        db.untrack_tags(tag)
+        writes.submit(db.erase_tags, tag)
+        self.populate()
 
+    def create_tag(self) -> None:
+        form = TagEditor(Tag(-1, self.search.text(), ""))
+        form.exec()
 
-class AccountSelector(QDialog):
-    def __init__(self, event_editor: EventEditor) -> None:
-        super().__init__()
-
-        self.event_editor = event_editor
 
-        layout = QVBoxLayout(self)
-        self.grid = QGridLayout()
-        layout.addLayout(self.grid)
-
-        self.account_buttons: list[AccountSelectorButton] = list()
-        for account_id in sorted(db.ACCOUNTS.keys()):
-            account = db.ACCOUNTS[account_id]
-            button = AccountSelectorButton(
-                self, account, account.id in event_editor.target_event.accounts
-            )
-            self.account_buttons.append(button)
+# Every tracked account in most recently used order, kept in step with the
+# registry so that listing them never rebuilds anything
+class AccountListModel(QAbstractListModel):
+    def __init__(self) -> None:
+        super().__init__()
 
-    def add_account(self, account: Account):
-        self.close()
-        self.event_editor.add_account(account)
+        self.index_by_name = NameIndex()
+        self.index_by_name.follow(db.ACCOUNTS, ACCOUNT_REGISTRY, ACCOUNT_NAME)
 
-    def exec(self) -> int:
-        self.rebuild()
-        return super().exec()
+        self.last_used: dict[int, int] = dict()
+        self.uses = 0
+        self.order: list[int] = sorted(
+            db.ACCOUNTS.keys(), key=lambda id: db.ACCOUNTS[id].name.lower()
+        )
+        # Rows currently listed, self.order while there is no filter
+        self.ids = self.order
+        self.event_editor: "EventEditor | None" = None
+
+        self.subscriptions = [
+            db.subscribe_accounts_changes(self.registry_changed),
+            BUS.subscribe(ACCOUNT_NAME, self.name_changed),
+        ]
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.ids)
+
+    def account(self, row: int) -> Account | None:
+        if 0 <= row < len(self.ids):
+            return db.ACCOUNTS.get(self.ids[row])
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        account = self.account(index.row())
+        if account is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return account.name
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return account.description or None
+        return None
+
+    # Accounts already on the event are listed but cannot be picked
+    def flags(self, index):
+        account = self.account(index.row())
+        if account is None or not self.is_active(account):
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def is_active(self, account: Account) -> bool:
+        if self.event_editor is None:
+            return True
+        changes = self.event_editor.account_changes.get(account.id)
+        is_member = account.id in self.event_editor.target_event.accounts
+        return (changes is not None and changes < 0) or (
+            changes is None and not is_member
+        )
 
-    def rebuild(self):
-        for button in self.account_buttons:
-            self.grid.removeWidget(button)
+    def rank(self, id: int) -> tuple:
+        return (-self.last_used.get(id, 0), db.ACCOUNTS[id].name.lower())
 
-        num_columns = max(1, (len(self.account_buttons) + 7) // 8)
-        num_rows = (len(self.account_buttons) // num_columns) + (
-            1 if len(self.account_buttons) % num_columns else 0
-        )
+    # Word-prefix matches first, then accounts containing the typed letters
+    # in order, the tighter the better
+    def set_filter(self, text: str) -> None:
+        self.beginResetModel()
+        if len(text.strip()) == 0:
+            self.ids = self.order
+        else:
+            matches = [
+                id
+                for id in self.index_by_name.search(text)
+                if id in db.ACCOUNTS
+            ]
+            matches.sort(key=self.rank)
+            found = set(matches)
+
+            fuzzy: list[tuple[int, tuple, int]] = list()
+            for id, account in db.ACCOUNTS.items():
+                if id in found:
+                    continue
+                span = fuzzy_span(text, account.name)
+                if span is not None:
+                    fuzzy.append((span, self.rank(id), id))
+            fuzzy.sort()
+
+            self.ids = matches + [id for _, _, id in fuzzy]
+        self.endResetModel()
+
+    def record_use(self, account: Account) -> None:
+        self.beginResetModel()
+        self.uses += 1
+        self.last_used[account.id] = self.uses
+        if account.id in self.order:
+            self.order.remove(account.id)
+        self.order.insert(0, account.id)
+        self.endResetModel()
+
+    def registry_changed(self, change: Change) -> None:
+        self.beginResetModel()
+        if change.key in self.order:
+            self.order.remove(change.key)
+        self.last_used.pop(change.key, None)
+        if change.key in db.ACCOUNTS:
+            self.order.append(change.key)
+        if self.ids is not self.order and change.key not in db.ACCOUNTS:
+            self.ids = [id for id in self.ids if id != change.key]
+        self.endResetModel()
+
+    def name_changed(self, change: Change) -> None:
+        if change.key in self.ids:
+            row = self.ids.index(change.key)
+            self.dataChanged.emit(self.index(row), self.index(row))
+
+
+# One dialog per process, opened for whichever editor needs an account. The
+# list view only creates what is on screen, so opening it costs the same
+# for any number of accounts.
+class AccountSelector(QDialog):
+    def __init__(self) -> None:
+        super().__init__()
 
-        next_button = iter(self.account_buttons)
-        for col in range(num_columns):
-            for row in range(num_rows):
-                button = next(next_button)
+        self.model = AccountListModel()
 
-                if button is None:
-                    break
+        layout = QVBoxLayout(self)
 
-                if button.is_active():
-                    self.grid.addWidget(button, row, col)
-                    button.setVisible(True)
-                else:
-                    button.hide()
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Search accounts...")
+        self.search.textChanged.connect(self.model.set_filter)
+        self.search.returnPressed.connect(self.pick_first)
+        layout.addWidget(self.search)
+
+        self.view = QListView()
+        self.view.setUniformItemSizes(True)
+        self.view.setModel(self.model)
+        self.view.activated.connect(self.pick)
+        self.view.clicked.connect(self.pick)
+        layout.addWidget(self.view)
+
+    def choose(self, event_editor: "EventEditor") -> None:
+        self.model.event_editor = event_editor
+        self.search.clear()
+        self.model.set_filter("")
+        self.search.setFocus()
+        self.exec()
+        self.model.event_editor = None
+
+    def pick(self, index: QModelIndex) -> None:
+        account = self.model.account(index.row())
+        if account is None or not self.model.is_active(account):
+            return
+        event_editor = self.model.event_editor
+        self.model.record_use(account)
+        self.close()
+        if event_editor is not None:
+            event_editor.add_account(account)
 
+    def pick_first(self) -> None:
+        for row in range(self.model.rowCount()):
+            index = self.model.index(row)
+            if self.model.flags(index) & Qt.ItemFlag.ItemIsEnabled:
+                self.pick(index)
+                return
 
-class AccountSelectorButton(QPushButton):
-    def __init__(
-        self,
-        account_selector: AccountSelector,
-        account: Account,
-        is_member: bool,
-    ) -> None:
-        super().__init__()
 
-        self.account_selector = account_selector
-        self.is_member = is_member
-        self.account = account
-        self.setText(account.name)
-        self.clicked.connect(self.add_account)
+_account_selector: AccountSelector | None = None
 
-    def add_account(self):
-        self.account_selector.add_account(self.account)
 
-    def is_active(self) -> bool:
-        changes = self.account_selector.event_editor.account_changes.get(
-            self.account.id
-        )
-        return (changes is not None and changes < 0) or (
-            changes is None and not self.is_member
-        )
+def account_selector() -> AccountSelector:
+    global _account_selector
+    if _account_selector is None:
+        _account_selector = AccountSelector()
+    return _account_selector
 
 
 class AccountEventItem(QWidget):
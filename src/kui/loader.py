@@ -0,0 +1,125 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+import db
+from db import Event, EventRow
+
+# Request ids are shared by every loader, so that a deletion can be ordered
+# against all the fetches in flight
+_last_request_id = 0
+_in_flight: set[int] = set()
+
+# Events deleted from the calendar, mapped to the last request issued
+# before their deletion committed, or None while it is still queued. A
+# fetch issued up to then may have read the event and must not bring it
+# back. Keyed by event, since a pending insert only gets its id later.
+_deleted: dict[Event, int | None] = dict()
+
+
+def hide_deleted(event: Event) -> None:
+    _deleted[event] = None
+
+
+def deletion_settled(event: Event) -> None:
+    if event in _deleted:
+        _deleted[event] = _last_request_id
+        _forget_deleted()
+
+
+# Forgets deletions that every fetch still in flight was issued after
+def _forget_deleted() -> None:
+    oldest = min(_in_flight, default=_last_request_id + 1)
+    for event, request_id in list(_deleted.items()):
+        if request_id is not None and request_id < oldest:
+            _deleted.pop(event)
+
+
+def _without_deleted(
+    request_id: int, events: list[EventRow]
+) -> list[EventRow]:
+    if len(_deleted) == 0:
+        return events
+    hidden = {
+        event.id
+        for event, last_request_id in _deleted.items()
+        if last_request_id is None or request_id <= last_request_id
+    }
+    return [e for e in events if e.id not in hidden]
+
+
+class FetchTask(QRunnable):
+    def __init__(
+        self, loader: "WindowLoader", request_id: int, after: int, before: int
+    ) -> None:
+        super().__init__()
+        self.setAutoDelete(False)
+
+        self.loader = loader
+        self.request_id = request_id
+        self.after = after
+        self.before = before
+        self.cancelled = False
+
+    def run(self) -> None:
+        if self.cancelled:
+            return
+        # Runs on a pool thread, db gives it its own reader connection
+        # Only what the calendar draws, full events are hydrated on open
+        events = (
+            db.fetch_events(EventRow.COLUMNS)
+            .after(self.after)
+            .before(self.before)
+            .exec_rows(EventRow)
+        )
+        self.loader.fetched.emit(self.request_id, events)
+
+
+class WindowLoader(QObject):
+    # Emitted from pool threads, delivered on the GUI thread
+    fetched = Signal(int, object)
+
+    # (request id, after, before, events) for requests still wanted
+    loaded = Signal(int, int, int, object)
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+
+        self.pending: dict[int, FetchTask] = dict()
+
+        self.fetched.connect(self.deliver)
+
+    # Fetches events with after < date < before, like EventFetcher
+    def request(self, after: int, before: int) -> int:
+        global _last_request_id
+        _last_request_id += 1
+        task = FetchTask(self, _last_request_id, after, before)
+        self.pending[task.request_id] = task
+        _in_flight.add(task.request_id)
+        self.pool.start(task)
+        return task.request_id
+
+    def cancel(self, request_id: int) -> None:
+        task = self.pending.pop(request_id, None)
+        if task is None:
+            return
+        _in_flight.discard(request_id)
+        _forget_deleted()
+        task.cancelled = True
+        # Drop it from the queue if it has not started, a running fetch
+        # finishes but its result is discarded in deliver
+        self.pool.tryTake(task)
+
+    def cancel_all(self) -> None:
+        for request_id in list(self.pending.keys()):
+            self.cancel(request_id)
+
+    def deliver(self, request_id: int, events: list[EventRow]) -> None:
+        task = self.pending.pop(request_id, None)
+        if task is None:
+            return
+        _in_flight.discard(request_id)
+        events = _without_deleted(request_id, events)
+        _forget_deleted()
+        self.loaded.emit(request_id, task.after, task.before, events)
@@ -0,0 +1,225 @@
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from PySide6.QtCore import QObject, QRect, Qt, QTimer
+from PySide6.QtGui import QColor, QPainter
+from PySide6.QtWidgets import QApplication, QWidget
+
+from instrument import Histogram
+
+# Widgets counted by the overlay, by class name. Accounts are rows of the
+# balance sheet's model rather than widgets, the editor's account items are
+# counted instead.
+COUNTED_WIDGETS = (
+    "Week",
+    "Day",
+    "PaintedWeek",
+    "EventCalendarElement",
+    "AccountEventItem",
+)
+
+
+class Stall:
+    __slots__ = ("started_at", "duration_ms", "stack")
+
+    def __init__(self, started_at: float, stack: list[str]) -> None:
+        self.started_at = started_at
+        self.duration_ms = 0.0
+        self.stack = stack
+
+    def to_json(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "stack": self.stack,
+        }
+
+
+# Measures how late the event loop runs a timer that should fire every
+# interval_ms. A watchdog thread notices when the loop is blocked for more
+# than budget_ms and captures the main thread's Python stack while it still
+# is, so the stall is logged with the handler that caused it. Costs a timer
+# tick per interval and a watchdog wake-up per budget.
+class ResponsivenessMonitor(QObject):
+    def __init__(
+        self,
+        budget_ms: float = 16.0,
+        interval_ms: int = 100,
+        report: bool = False,
+    ) -> None:
+        super().__init__()
+
+        self.budget = budget_ms / 1000
+        self.report = report
+
+        self.latency = Histogram()
+        self.recent: deque[float] = deque(maxlen=64)
+        self.stalls: deque[Stall] = deque(maxlen=100)
+        self.stall_count = 0
+
+        self.main_thread = threading.main_thread().ident
+        self.next_due = 0.0
+        # Written by the watchdog, taken by the next tick
+        self.pending: Stall | None = None
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.set_interval(interval_ms)
+
+        self.running = False
+        self.stopped = threading.Event()
+
+    def set_interval(self, interval_ms: int) -> None:
+        self.interval = interval_ms / 1000
+        self.timer.setInterval(interval_ms)
+        self.next_due = time.perf_counter() + self.interval
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.running = True
+        self.next_due = time.perf_counter() + self.interval
+        self.timer.start()
+        # Each watchdog has its own flag, so a restart never runs two
+        self.stopped = threading.Event()
+        threading.Thread(
+            target=self.watch, args=(self.stopped,), daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        self.running = False
+        self.timer.stop()
+        self.stopped.set()
+        self.pending = None
+
+    def set_running(self, running: bool) -> None:
+        if running:
+            self.start()
+        else:
+            self.stop()
+
+    def tick(self) -> None:
+        now = time.perf_counter()
+        late = max(0.0, now - self.next_due)
+        self.next_due = now + self.interval
+        self.latency.add(late, 0)
+        self.recent.append(late)
+
+        stall = self.pending
+        if stall is not None:
+            self.pending = None
+            stall.duration_ms = (now - stall.started_at) * 1000
+            self.stalls.append(stall)
+            self.stall_count += 1
+            if self.report:
+                print(
+                    f"Event loop blocked for {stall.duration_ms:.0f} ms in:\n"
+                    + "".join(stall.stack),
+                    file=sys.stderr,
+                )
+
+    def watch(self, stopped: threading.Event) -> None:
+        while not stopped.wait(self.budget):
+            due = self.next_due
+            if (
+                self.pending is None
+                and time.perf_counter() - due > self.budget
+            ):
+                frame = sys._current_frames().get(self.main_thread)
+                stack = traceback.format_stack(frame) if frame else []
+                # The loop has been blocked since the tick was due
+                self.pending = Stall(due, stack)
+
+    def recent_ms(self) -> tuple[float, float]:
+        if len(self.recent) == 0:
+            return 0.0, 0.0
+        ordered = sorted(self.recent)
+        return ordered[len(ordered) // 2] * 1000, ordered[-1] * 1000
+
+    def snapshot(self) -> dict:
+        return {
+            "budget_ms": self.budget * 1000,
+            "interval_ms": self.interval * 1000,
+            "latency": self.latency.to_json(),
+            "stall_count": self.stall_count,
+            "stalls": [stall.to_json() for stall in self.stalls],
+        }
+
+
+def count_widgets() -> dict[str, int]:
+    counts = {name: 0 for name in COUNTED_WIDGETS}
+    for widget in QApplication.allWidgets():
+        name = type(widget).__name__
+        if name in counts:
+            counts[name] += 1
+    return counts
+
+
+# Frame times, stalls and live widget counts drawn over the top right of
+# parent. Shown, the monitor samples every frame instead of every interval.
+class MonitorOverlay(QWidget):
+    def __init__(
+        self, parent: QWidget, monitor: ResponsivenessMonitor
+    ) -> None:
+        super().__init__(parent)
+
+        self.monitor = monitor
+        self.idle_interval_ms = int(monitor.interval * 1000)
+        self.lines: list[str] = list()
+
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.hide()
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(250)
+        self.timer.timeout.connect(self.refresh)
+
+    def toggle(self) -> None:
+        if self.isVisible():
+            self.timer.stop()
+            self.monitor.set_interval(self.idle_interval_ms)
+            self.hide()
+        else:
+            self.monitor.set_interval(int(self.monitor.budget * 1000))
+            self.monitor.start()
+            self.refresh()
+            self.timer.start()
+            self.show()
+            self.raise_()
+
+    def refresh(self) -> None:
+        median, worst = self.monitor.recent_ms()
+        frame = self.monitor.interval * 1000
+        self.lines = [
+            f"frame {frame + median:5.1f} ms  worst {frame + worst:6.1f} ms",
+            f"stalls {self.monitor.stall_count}"
+            f"  (> {self.monitor.budget * 1000:.0f} ms)",
+        ]
+        self.lines += [
+            f"{name} {count}" for name, count in count_widgets().items()
+        ]
+
+        metrics = self.fontMetrics()
+        width = max(metrics.horizontalAdvance(line) for line in self.lines)
+        height = metrics.height() * len(self.lines)
+        parent = self.parentWidget()
+        self.setGeometry(
+            QRect(parent.width() - width - 24, 8, width + 16, height + 8)
+        )
+        self.update()
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 160))
+        painter.setPen(QColor("white"))
+        line_height = self.fontMetrics().height()
+        for i, line in enumerate(self.lines):
+            painter.drawText(
+                QRect(8, 4 + i * line_height, self.width() - 8, line_height),
+                Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                line,
+            )
@@ -0,0 +1,154 @@
+from datetime import date as Date
+from typing import TYPE_CHECKING
+
+from PySide6.QtCore import QDate, Qt, QTimer
+from PySide6.QtWidgets import (
+    QDateEdit,
+    QHBoxLayout,
+    QLineEdit,
+    QPushButton,
+    QScrollBar,
+    QWidget,
+)
+
+import db
+from kui.dates import (
+    date_to_serial,
+    serial_to_date,
+    serial_to_week,
+    week_to_date,
+)
+
+if TYPE_CHECKING:
+    from kui.calendar import InfiniteScrollArea
+
+# Weeks of headroom the date scrollbar keeps beyond the ledger's events
+MARGIN_WEEKS = 52
+
+
+# A scrollbar whose position is a week number, so any date is one drag away
+# and jumping costs the same however far the target is. The calendar's own
+# scrollbar only moves within the loaded window.
+class DateScrollBar(QScrollBar):
+    def __init__(
+        self, area: "InfiniteScrollArea", coalesce_ms: int = 50
+    ) -> None:
+        super().__init__(Qt.Orientation.Vertical)
+
+        self.area = area
+        self.setPageStep(4)
+        # Widened to the ledger's dates by fit_range once it is open
+        week = serial_to_week(date_to_serial(Date.today()))
+        self.setRange(week - MARGIN_WEEKS, week + MARGIN_WEEKS)
+
+        # Drags land on the date under the slider once movement settles
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(coalesce_ms)
+        self.timer.timeout.connect(self.jump)
+
+        self.valueChanged.connect(lambda _: self.timer.start())
+        self.area.verticalScrollBar().valueChanged.connect(
+            lambda _: self.follow()
+        )
+        self.area.jumped.connect(lambda _: self.follow())
+
+    # Spans every event plus a margin and always includes week
+    def fit_range(self, week: int) -> None:
+        first = last = week
+        dates = db.event_date_range()
+        if dates is not None:
+            first = min(first, serial_to_week(dates[0]))
+            last = max(last, serial_to_week(dates[1]))
+        self.blockSignals(True)
+        self.setRange(first - MARGIN_WEEKS, last + MARGIN_WEEKS)
+        self.blockSignals(False)
+
+    def jump(self) -> None:
+        self.area.jump_to(week_to_date(self.value()))
+
+    # Tracks the first visible week without triggering a jump
+    def follow(self) -> None:
+        if self.isSliderDown() or self.timer.isActive():
+            return
+        week = serial_to_week(date_to_serial(self.area.first_visible_day()))
+        if not self.minimum() <= week <= self.maximum():
+            self.fit_range(week)
+        self.blockSignals(True)
+        self.setValue(week)
+        self.blockSignals(False)
+
+
+# Random access controls for the week view: a date picker, "today", and the
+# previous / next event whose words start with the filter text
+class NavigationBar(QWidget):
+    def __init__(self, area: "InfiniteScrollArea") -> None:
+        super().__init__()
+
+        self.area = area
+        # Date of the last match jumped to, searched from while in view
+        self.match: int | None = None
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        today_button = QPushButton("Today")
+        today_button.clicked.connect(self.go_to_today)
+        layout.addWidget(today_button)
+
+        self.date_picker = QDateEdit(QDate.currentDate())
+        self.date_picker.setCalendarPopup(True)
+        self.date_picker.setDisplayFormat("yyyy/M/d")
+        layout.addWidget(self.date_picker)
+
+        go_button = QPushButton("Go")
+        go_button.clicked.connect(self.go_to_picked_date)
+        layout.addWidget(go_button)
+
+        self.filter = QLineEdit()
+        self.filter.setPlaceholderText("Find event...")
+        self.filter.returnPressed.connect(lambda: self.find_match(True))
+        self.filter.textChanged.connect(self.reset_match)
+        layout.addWidget(self.filter)
+
+        previous_button = QPushButton("<")
+        previous_button.clicked.connect(lambda: self.find_match(False))
+        layout.addWidget(previous_button)
+
+        next_button = QPushButton(">")
+        next_button.clicked.connect(lambda: self.find_match(True))
+        layout.addWidget(next_button)
+
+    def go_to_today(self) -> None:
+        self.area.jump_to(Date.today())
+
+    def go_to_picked_date(self) -> None:
+        self.area.jump_to(self.date_picker.date().toPython())
+
+    def reset_match(self) -> None:
+        self.match = None
+
+    # Searches from the last match while it is still on screen, otherwise
+    # from the top of the view
+    def find_match(self, forward: bool) -> None:
+        text = self.filter.text().strip()
+        if len(text) == 0:
+            return
+
+        first = date_to_serial(self.area.first_visible_day())
+        origin = first - 1 if forward else first
+        if self.match is not None and self.area.is_serial_visible(self.match):
+            origin = self.match
+
+        fetcher = db.fetch_events().has_prefix(text)
+        if forward:
+            fetcher.after(origin)
+        else:
+            fetcher.before(origin)
+        date = fetcher.first_date(last=not forward)
+        if date is None:
+            return
+
+        self.match = date
+        if not self.area.is_serial_visible(date):
+            self.area.jump_to(serial_to_date(date))
@@ -0,0 +1,125 @@
+import math
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+
+from PySide6.QtCore import QObject, QTimer
+
+if TYPE_CHECKING:
+    from kui.calendar import InfiniteScrollArea
+
+
+class PrefetchScheduler(QObject):
+    def __init__(
+        self,
+        area: "InfiniteScrollArea",
+        base_weeks: int = 3,
+        max_weeks: int = 26,
+        horizon: float = 0.75,
+        coalesce_ms: int = 16,
+    ) -> None:
+        super().__init__(area)
+
+        self.area = area
+
+        # Weeks kept ready behind and ahead of the viewport while idle
+        self.base_weeks = base_weeks
+        # Upper bound on the look-ahead, however fast the user scrolls
+        self.max_weeks = max_weeks
+        # Seconds of scrolling at the current velocity to prepare for
+        self.horizon = horizon
+
+        self.samples: deque[tuple[float, int]] = deque(maxlen=8)
+
+        # Bursts of valueChanged are handled once per timer tick
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(coalesce_ms)
+        self.timer.timeout.connect(self.update)
+
+        self.signals = 0
+        self.updates = 0
+        self.hits = 0
+        self.misses = 0
+        self.edge_stalls = 0
+        self.extended_weeks = 0
+
+    def value_changed(self, value: int) -> None:
+        self.signals += 1
+        self.samples.append((time.monotonic(), value))
+        if not self.timer.isActive():
+            self.timer.start()
+
+    # Keeps the velocity estimate continuous when the scroll position is
+    # moved to compensate for content added above the viewport
+    def shift(self, delta: int) -> None:
+        self.samples = deque(
+            ((t, v + delta) for t, v in self.samples), self.samples.maxlen
+        )
+
+    # Pixels per second, positive when scrolling down
+    def velocity(self) -> float:
+        now = time.monotonic()
+        while len(self.samples) > 1 and now - self.samples[0][0] > 0.25:
+            self.samples.popleft()
+        if len(self.samples) < 2:
+            return 0.0
+        (t0, v0), (t1, v1) = self.samples[0], self.samples[-1]
+        if t1 <= t0:
+            return 0.0
+        return (v1 - v0) / (t1 - t0)
+
+    def lookahead_weeks(self, velocity: float) -> int:
+        travel = abs(velocity) * self.horizon / self.area.week_height()
+        return min(self.max_weeks, self.base_weeks + math.ceil(travel))
+
+    def update(self) -> None:
+        area = self.area
+        visible = area.visible_week_range()
+        if visible is None:
+            return
+        first, last = visible
+        self.updates += 1
+
+        if all(week.loaded for week in area.weeks[first : last + 1]):
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        scrollbar = area.verticalScrollBar()
+        if scrollbar.value() in (scrollbar.minimum(), scrollbar.maximum()):
+            self.edge_stalls += 1
+
+        velocity = self.velocity()
+        # Never look so far ahead that visible weeks would be recycled
+        capacity = area.pool_weeks - (last - first + 1) - self.base_weeks
+        ahead = max(0, min(self.lookahead_weeks(velocity), capacity))
+        if velocity >= 0:
+            weeks_above, weeks_below = self.base_weeks, ahead
+        else:
+            weeks_above, weeks_below = ahead, self.base_weeks
+
+        below = len(area.weeks) - 1 - last
+        if below < weeks_below:
+            area.extend_downwards(weeks_below - below)
+            self.extended_weeks += weeks_below - below
+        if first < weeks_above:
+            area.extend_upwards(weeks_above - first)
+            self.extended_weeks += weeks_above - first
+
+        week_height = area.week_height()
+        area.load_near_viewport(
+            weeks_above * week_height, weeks_below * week_height
+        )
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "value_changed_signals": self.signals,
+            "updates": self.updates,
+            "prefetch_hit_rate": (
+                self.hits / self.updates if self.updates > 0 else 1.0
+            ),
+            "visible_misses": self.misses,
+            "edge_stalls": self.edge_stalls,
+            "extended_weeks": self.extended_weeks,
+        }
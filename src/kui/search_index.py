@@ -0,0 +1,99 @@
+from bisect import bisect_left, insort
+from collections.abc import Iterable
+
+from changes import BUS, Change
+
+
+def words(text: str) -> list[str]:
+    return text.lower().split()
+
+
+# Length of the shortest stretch of name containing the letters of query in
+# order, or None if it does not contain them: "chk" fits "Checking" in 5
+def fuzzy_span(query: str, name: str) -> int | None:
+    query = query.replace(" ", "").lower()
+    name = name.lower()
+    if len(query) == 0:
+        return 0
+
+    best: int | None = None
+    start = name.find(query[0])
+    while start >= 0:
+        end = start
+        for letter in query[1:]:
+            end = name.find(letter, end + 1)
+            if end < 0:
+                return best
+        if best is None or end - start + 1 < best:
+            best = end - start + 1
+        start = name.find(query[0], start + 1)
+    return best
+
+
+# Word-prefix index over names: "gro" finds "Weekly Groceries". Entries are
+# (word, id) pairs kept sorted, so a prefix is found by bisection and costs
+# O(log n) plus the number of matches, whatever the size of the registry.
+class NameIndex:
+    def __init__(self) -> None:
+        self.entries: list[tuple[str, int]] = list()
+        self.names: dict[int, str] = dict()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, id: int, name: str) -> None:
+        if id in self.names:
+            self.remove(id)
+        self.names[id] = name
+        for word in set(words(name)):
+            insort(self.entries, (word, id))
+
+    def remove(self, id: int) -> None:
+        name = self.names.pop(id, None)
+        if name is None:
+            return
+        for word in set(words(name)):
+            i = bisect_left(self.entries, (word, id))
+            del self.entries[i]
+
+    def prefix(self, prefix: str) -> set[int]:
+        ids: set[int] = set()
+        i = bisect_left(self.entries, (prefix,))
+        while i < len(self.entries) and self.entries[i][0].startswith(prefix):
+            ids.add(self.entries[i][1])
+            i += 1
+        return ids
+
+    # Ids whose names have a word starting with each word of text
+    def search(self, text: str) -> Iterable[int]:
+        query = words(text)
+        if len(query) == 0:
+            return self.names.keys()
+        ids = self.prefix(query[0])
+        for word in query[1:]:
+            ids &= self.prefix(word)
+        return ids
+
+    # Keeps the index in step with a db registry (db.ACCOUNTS, db.TAGS) and
+    # the topics its entries are published under
+    def follow(
+        self, registry: dict, registry_topic: str, name_topic: str
+    ) -> None:
+        for item in registry.values():
+            self.add(item.id, item.name)
+
+        def registry_changed(change: Change) -> None:
+            item = registry.get(change.key)
+            if item is None:
+                self.remove(change.key)
+            else:
+                self.add(item.id, item.name)
+
+        def name_changed(change: Change) -> None:
+            if change.key in self.names:
+                self.add(change.key, change.new)
+
+        self.subscriptions = [
+            BUS.subscribe(registry_topic, registry_changed),
+            BUS.subscribe(name_topic, name_changed),
+        ]
@@ -0,0 +1,115 @@
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from PySide6.QtCore import QEvent, QObject, QTimer, Signal
+from PySide6.QtWidgets import QWidget
+
+if TYPE_CHECKING:
+    from kui.calendar import InfiniteScrollArea
+
+
+# Timeline of application startup. Phases are marked as they finish,
+# relative to started_at (taken before the heavy imports). The window is
+# painted once its first Paint event is seen and interactive once every
+# week in the calendar's viewport has its events.
+class StartupProfile(QObject):
+    first_painted = Signal()
+    interactive = Signal()
+
+    def __init__(self, started_at: float, report: bool = False) -> None:
+        super().__init__()
+
+        self.started_at = started_at
+        self.report_when_interactive = report
+        self.phases: list[tuple[str, float]] = list()
+        self.painted = False
+        self.is_interactive = False
+        self.area: "InfiniteScrollArea | None" = None
+        self.pending: list[tuple[str, Callable[[], None]]] | None = None
+
+    def mark(self, phase: str) -> None:
+        self.phases.append((phase, time.perf_counter() - self.started_at))
+
+    def watch_first_paint(self, widget: QWidget) -> None:
+        widget.installEventFilter(self)
+
+    def eventFilter(self, watched, event) -> bool:
+        if event.type() == QEvent.Type.Paint and not self.painted:
+            self.painted = True
+            watched.removeEventFilter(self)
+            self.mark("first paint")
+            self.first_painted.emit()
+        return False
+
+    # Runs each (name, phase) on its own event loop tick once the window
+    # has been painted, or after fallback_ms if it never is (e.g. started
+    # minimized), so the window repaints between phases
+    def run_after_first_paint(
+        self, phases: list[tuple[str, Callable[[], None]]], fallback_ms=250
+    ) -> None:
+        self.first_painted.connect(lambda: self.run(phases))
+        QTimer.singleShot(fallback_ms, lambda: self.run(phases))
+
+    def run(self, phases: list[tuple[str, Callable[[], None]]]) -> None:
+        if self.pending is not None:
+            return
+        self.pending = list(phases)
+        QTimer.singleShot(0, self.run_next)
+
+    def run_next(self) -> None:
+        if self.pending is None or len(self.pending) == 0:
+            return
+        name, phase = self.pending.pop(0)
+        phase()
+        self.mark(name)
+        QTimer.singleShot(0, self.run_next)
+
+    def watch_interactive(self, area: "InfiniteScrollArea") -> None:
+        self.area = area
+        area.loader.loaded.connect(self.check_interactive)
+        # Events may arrive before the weeks are laid out
+        area.verticalScrollBar().rangeChanged.connect(self.check_interactive)
+
+    def check_interactive(self, *_) -> None:
+        if self.is_interactive or self.area is None:
+            return
+        visible = self.area.visible_week_range()
+        if visible is None:
+            return
+        first, last = visible
+        if not all(week.loaded for week in self.area.weeks[first : last + 1]):
+            return
+
+        self.is_interactive = True
+        self.area.loader.loaded.disconnect(self.check_interactive)
+        self.area.verticalScrollBar().rangeChanged.disconnect(
+            self.check_interactive
+        )
+        self.mark("interactive")
+        self.interactive.emit()
+        if self.report_when_interactive:
+            print(self.report())
+
+    def elapsed(self, phase: str) -> float | None:
+        for name, at in self.phases:
+            if name == phase:
+                return at
+        return None
+
+    def report(self) -> str:
+        lines = [f"{'phase':<24}{'at ms':>10}{'took ms':>10}"]
+        previous = 0.0
+        for phase, at in sorted(self.phases, key=lambda p: p[1]):
+            lines.append(
+                f"{phase:<24}{at * 1000:>10.1f}{(at - previous) * 1000:>10.1f}"
+            )
+            previous = at
+        for label, phase in (
+            ("time to first paint", "first paint"),
+            ("time to interactive", "interactive"),
+        ):
+            at = self.elapsed(phase)
+            if at is not None:
+                lines.append(f"{label:<24}{at * 1000:>10.1f}")
+        return "\n".join(lines)
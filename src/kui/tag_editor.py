@@ -1,5 +1,6 @@
 from PySide6.QtWidgets import (QPushButton, QVBoxLayout, QLineEdit, QDialog)
 import db
+import kui.writes as writes
 from db import Tag
 
 class TagEditor(QDialog):
@@ -32,17 +33,19 @@ class TagEditor(QDialog):
         name = self.tag_name_text_box.text()
         description = self.tag_description_text_box.text()
 
-        self.target_tag.name = name
+        self.target_tag.update_name(name)
         self.target_tag.description = description
 
         if self.target_tag.id < 0:
-            new_tag = db.register_tag(
+            # The tag is registered once the writer has given it an id
+            writes.submit(
+                db.insert_tag,
                 self.target_tag.name,
                 self.target_tag.description,
+                on_done=db.track_tag,
             )
 
         else:
-            db.alter_tags(self.target_tag)
+            writes.submit(db.alter_tags, self.target_tag)
 
-        db.commit_changes()
         self.close()
@@ -0,0 +1,67 @@
+from collections.abc import Callable
+from concurrent.futures import Future
+
+from PySide6.QtCore import QObject, Signal
+
+import db
+
+
+class WriteReporter(QObject):
+    # Emitted from the writer thread, delivered on the GUI thread
+    finished = Signal(object, object, object)
+
+    completed = Signal(object)
+    failed = Signal(object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.finished.connect(self.report)
+
+    def report(
+        self,
+        future: Future,
+        on_done: Callable | None,
+        on_failed: Callable | None,
+    ) -> None:
+        error = future.exception()
+        if error is not None:
+            if on_failed is not None:
+                on_failed(error)
+            self.failed.emit(error)
+            return
+
+        result = future.result()
+        if on_done is not None:
+            on_done(result)
+        self.completed.emit(result)
+
+
+_reporter: WriteReporter | None = None
+
+
+def reporter() -> WriteReporter:
+    global _reporter
+    if _reporter is None:
+        _reporter = WriteReporter()
+    return _reporter
+
+
+# Queues fn on the database writer thread. on_done / on_failed run on the
+# GUI thread once the group commit containing the write has finished. With
+# after, fn waits for that write to succeed and receives its result first.
+def submit(
+    fn: Callable,
+    *args,
+    on_done: Callable | None = None,
+    on_failed: Callable | None = None,
+    after: Future | None = None,
+) -> Future:
+    report = reporter()
+    if after is None:
+        future = db.submit_write(fn, *args)
+    else:
+        future = db.submit_write_after(after, fn, *args)
+    future.add_done_callback(
+        lambda f: report.finished.emit(f, on_done, on_failed)
+    )
+    return future
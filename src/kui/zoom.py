@@ -0,0 +1,452 @@
+from datetime import date as Date
+from datetime import timedelta
+
+from PySide6.QtCore import (
+    QObject,
+    QPoint,
+    QRect,
+    QRunnable,
+    Qt,
+    QThreadPool,
+    QTimer,
+    Signal,
+)
+from PySide6.QtGui import QColor, QPainter
+from PySide6.QtWidgets import (
+    QComboBox,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QSizePolicy,
+    QToolTip,
+    QVBoxLayout,
+    QWidget,
+)
+
+import db
+import kui.bus as bus
+from db import DayTotal
+from kui.dates import date_to_serial, week_start
+
+MONTH = "month"
+YEAR = "year"
+
+METRIC_COUNT = "Events"
+METRIC_NET = "Net flow"
+
+MONTH_NAMES = (
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+)
+
+
+def add_months(date: Date, months: int) -> Date:
+    index = date.year * 12 + date.month - 1 + months
+    return Date(index // 12, index % 12 + 1, 1)
+
+
+# The dates covered by a month grid: six Sunday-started weeks around it
+def month_grid_start(first_of_month: Date) -> Date:
+    return week_start(first_of_month)
+
+
+class TotalsTask(QRunnable):
+    def __init__(
+        self,
+        loader: "TotalsLoader",
+        request_id: int,
+        after: int,
+        before: int,
+        account_ids: tuple[int, ...],
+        tag_ids: tuple[int, ...],
+    ) -> None:
+        super().__init__()
+
+        self.loader = loader
+        self.request_id = request_id
+        self.after = after
+        self.before = before
+        self.account_ids = account_ids
+        self.tag_ids = tag_ids
+
+    def run(self) -> None:
+        # One GROUP BY date query, individual events are never loaded
+        totals = (
+            db.fetch_events()
+            .after(self.after)
+            .before(self.before)
+            .any_tags(*self.tag_ids)
+            .any_accounts(*self.account_ids)
+            .exec_day_totals(*self.account_ids)
+        )
+        self.loader.fetched.emit(self.request_id, totals)
+
+
+class TotalsLoader(QObject):
+    # Emitted from a pool thread, delivered on the GUI thread
+    fetched = Signal(int, object)
+
+    # Day totals of the most recent request only
+    loaded = Signal(object)
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        self.request_id = 0
+        self.fetched.connect(self.deliver)
+
+    def request(
+        self,
+        after: int,
+        before: int,
+        account_ids: tuple[int, ...] = (),
+        tag_ids: tuple[int, ...] = (),
+    ) -> None:
+        self.request_id += 1
+        self.pool.start(
+            TotalsTask(
+                self, self.request_id, after, before, account_ids, tag_ids
+            )
+        )
+
+    def deliver(self, request_id: int, totals: list[DayTotal]) -> None:
+        if request_id == self.request_id:
+            self.loaded.emit(totals)
+
+
+# Paints a month as a 6x7 grid or a year as twelve mini months, each day
+# shaded by its aggregate. Clicking a day emits date_selected.
+class HeatmapCanvas(QWidget):
+    date_selected = Signal(object)
+
+    MONTH_HEADER_HEIGHT = 16
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.level = MONTH
+        self.anchor = Date.today().replace(day=1)
+        # Not "metric", which would shadow QPaintDevice.metric()
+        self.shown_metric = METRIC_COUNT
+        self.totals: dict[int, DayTotal] = dict()
+        self.scale = 1
+
+        self.setMouseTracking(True)
+        self.setMinimumSize(700, 420)
+        self.setSizePolicy(
+            QSizePolicy(
+                QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding
+            )
+        )
+
+    def show_period(self, level: str, anchor: Date) -> None:
+        self.level = level
+        self.anchor = anchor
+        self.totals = dict()
+        self.update()
+
+    def set_metric(self, metric: str) -> None:
+        self.shown_metric = metric
+        self.rescale()
+        self.update()
+
+    def set_totals(self, totals: list[DayTotal]) -> None:
+        self.totals = {total.date: total for total in totals}
+        self.rescale()
+        self.update()
+
+    def value(self, total: DayTotal) -> int:
+        if self.shown_metric == METRIC_NET:
+            return total.net
+        return total.count
+
+    def rescale(self) -> None:
+        self.scale = max(
+            (abs(self.value(t)) for t in self.totals.values()), default=1
+        )
+        self.scale = max(self.scale, 1)
+
+    def color(self, date: Date) -> QColor:
+        total = self.totals.get(date_to_serial(date))
+        if total is None or self.value(total) == 0:
+            return QColor(245, 245, 245)
+        value = self.value(total)
+        # Square root keeps a few busy days from washing out the rest
+        strength = (abs(value) / self.scale) ** 0.5
+        shade = int(235 - 200 * strength)
+        if self.shown_metric == METRIC_NET and value < 0:
+            return QColor(235, shade, shade)
+        if self.shown_metric == METRIC_NET:
+            return QColor(shade, 235, shade)
+        return QColor(shade, shade, 255)
+
+    # Rectangles of every cell in a month grid placed within bounds
+    def month_cells(
+        self, bounds: QRect, first_of_month: Date
+    ) -> list[tuple[Date, QRect]]:
+        start = month_grid_start(first_of_month)
+        cells: list[tuple[Date, QRect]] = list()
+        for i in range(42):
+            row, column = divmod(i, 7)
+            left = bounds.left() + bounds.width() * column // 7
+            right = bounds.left() + bounds.width() * (column + 1) // 7
+            top = bounds.top() + bounds.height() * row // 6
+            bottom = bounds.top() + bounds.height() * (row + 1) // 6
+            cells.append(
+                (
+                    start + timedelta(days=i),
+                    QRect(left, top, right - left, bottom - top),
+                )
+            )
+        return cells
+
+    # (first of month, grid bounds, header bounds) for each month shown
+    def month_blocks(self) -> list[tuple[Date, QRect, QRect]]:
+        if self.level == MONTH:
+            return [(self.anchor, self.rect(), QRect())]
+
+        blocks: list[tuple[Date, QRect, QRect]] = list()
+        for i in range(12):
+            row, column = divmod(i, 4)
+            left = self.width() * column // 4
+            right = self.width() * (column + 1) // 4
+            top = self.height() * row // 3
+            bottom = self.height() * (row + 1) // 3
+            header = QRect(left, top, right - left, self.MONTH_HEADER_HEIGHT)
+            grid = QRect(
+                left + 4,
+                top + self.MONTH_HEADER_HEIGHT,
+                right - left - 8,
+                bottom - top - self.MONTH_HEADER_HEIGHT - 4,
+            )
+            blocks.append((add_months(self.anchor, i), grid, header))
+        return blocks
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        today = Date.today()
+
+        for first_of_month, grid, header in self.month_blocks():
+            if not header.isNull():
+                painter.setPen(QColor("black"))
+                painter.drawText(
+                    header,
+                    Qt.AlignmentFlag.AlignCenter,
+                    MONTH_NAMES[first_of_month.month - 1],
+                )
+
+            for date, cell in self.month_cells(grid, first_of_month):
+                # Mini months leave the days of neighbouring months blank
+                if self.level == YEAR and date.month != first_of_month.month:
+                    continue
+
+                painter.fillRect(
+                    cell.adjusted(0, 0, -1, -1), self.color(date)
+                )
+                painter.setPen(
+                    QColor("blue") if date == today else QColor("lightgray")
+                )
+                painter.drawRect(cell.adjusted(0, 0, -1, -1))
+
+                if self.level == MONTH:
+                    painter.setPen(
+                        QColor("black")
+                        if date.month == first_of_month.month
+                        else QColor("gray")
+                    )
+                    painter.drawText(
+                        cell.adjusted(4, 2, -4, -2),
+                        Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                        str(date.day),
+                    )
+
+        painter.end()
+
+    def date_at(self, position: QPoint) -> Date | None:
+        for first_of_month, grid, _ in self.month_blocks():
+            if not grid.contains(position):
+                continue
+            for date, cell in self.month_cells(grid, first_of_month):
+                if cell.contains(position):
+                    if (
+                        self.level == YEAR
+                        and date.month != first_of_month.month
+                    ):
+                        return None
+                    return date
+        return None
+
+    def mouseReleaseEvent(self, event) -> None:
+        if event.button() != Qt.MouseButton.LeftButton:
+            return
+        date = self.date_at(event.position().toPoint())
+        if date is not None:
+            self.date_selected.emit(date)
+
+    def mouseMoveEvent(self, event) -> None:
+        position = event.position().toPoint()
+        date = self.date_at(position)
+        if date is None:
+            QToolTip.hideText()
+            return
+        total = self.totals.get(date_to_serial(date))
+        count = 0 if total is None else total.count
+        net = 0 if total is None else total.net
+        sign = "-" if net < 0 else ""
+        QToolTip.showText(
+            self.mapToGlobal(position),
+            f"{date.year}/{date.month}/{date.day}\n"
+            f"{count} events\n"
+            f"net $ {sign}{abs(net)//100}.{abs(net)%100:02}",
+            self,
+        )
+
+
+class ZoomView(QWidget):
+    # Emitted with the day clicked, to drill down into the week view
+    date_selected = Signal(object)
+
+    def __init__(self, level: str = MONTH) -> None:
+        super().__init__()
+
+        self.level = level
+        self.anchor = Date.today().replace(day=1)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        controls = QHBoxLayout()
+        previous_button = QPushButton("<")
+        previous_button.clicked.connect(lambda: self.step(-1))
+        controls.addWidget(previous_button)
+
+        self.title = QLabel()
+        self.title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.title.setSizePolicy(
+            QSizePolicy(
+                QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum
+            )
+        )
+        controls.addWidget(self.title)
+
+        next_button = QPushButton(">")
+        next_button.clicked.connect(lambda: self.step(1))
+        controls.addWidget(next_button)
+
+        self.metric_selector = QComboBox()
+        self.metric_selector.addItems((METRIC_COUNT, METRIC_NET))
+        self.metric_selector.currentTextChanged.connect(self.change_metric)
+        controls.addWidget(self.metric_selector)
+
+        self.account_selector = QComboBox()
+        self.account_selector.activated.connect(lambda _: self.refresh())
+        controls.addWidget(self.account_selector)
+
+        self.tag_selector = QComboBox()
+        self.tag_selector.activated.connect(lambda _: self.refresh())
+        controls.addWidget(self.tag_selector)
+
+        layout.addLayout(controls)
+
+        self.canvas = HeatmapCanvas()
+        self.canvas.date_selected.connect(self.date_selected.emit)
+        layout.addWidget(self.canvas)
+
+        self.loader = TotalsLoader()
+        self.loader.loaded.connect(self.canvas.set_totals)
+
+        # Registries load one item per change, rebuild once per burst
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(0)
+        self.filter_timer.timeout.connect(self.populate_filters)
+
+        self.populate_filters()
+        bus.bind(
+            self,
+            db.subscribe_accounts_changes(lambda _: self.filter_timer.start()),
+        )
+        bus.bind(
+            self,
+            db.subscribe_tags_changes(lambda _: self.filter_timer.start()),
+        )
+
+    def populate_filters(self) -> None:
+        account_id = self.account_selector.currentData()
+        self.account_selector.clear()
+        self.account_selector.addItem("All accounts", None)
+        for account in sorted(db.ACCOUNTS.values(), key=lambda a: a.name):
+            self.account_selector.addItem(account.name, account.id)
+        self.account_selector.setCurrentIndex(
+            max(0, self.account_selector.findData(account_id))
+        )
+
+        tag_id = self.tag_selector.currentData()
+        self.tag_selector.clear()
+        self.tag_selector.addItem("All tags", None)
+        tags = sorted(db.TAGS.values(), key=lambda t: t.name)
+        for tag in tags:
+            self.tag_selector.addItem(tag.name, tag.id)
+        self.tag_selector.setCurrentIndex(
+            max(0, self.tag_selector.findData(tag_id))
+        )
+
+    def set_level(self, level: str, date: Date | None = None) -> None:
+        self.level = level
+        if date is not None:
+            self.anchor = date.replace(day=1)
+        self.refresh()
+
+    def step(self, direction: int) -> None:
+        months = 12 if self.level == YEAR else 1
+        self.anchor = add_months(self.anchor, direction * months)
+        self.refresh()
+
+    def change_metric(self, metric: str) -> None:
+        self.canvas.set_metric(metric)
+
+    # The serial range after < date < before shown by the current period
+    def period(self) -> tuple[int, int]:
+        if self.level == YEAR:
+            first = self.anchor.replace(month=1)
+            return (
+                date_to_serial(first) - 1,
+                date_to_serial(add_months(first, 12)),
+            )
+        first = date_to_serial(month_grid_start(self.anchor))
+        return first - 1, first + 42
+
+    def refresh(self) -> None:
+        if self.level == YEAR:
+            anchor = self.anchor.replace(month=1)
+            self.title.setText(str(anchor.year))
+        else:
+            anchor = self.anchor
+            self.title.setText(
+                f"{MONTH_NAMES[anchor.month - 1]} {anchor.year}"
+            )
+        self.canvas.show_period(self.level, anchor)
+
+        account_id = self.account_selector.currentData()
+        tag_id = self.tag_selector.currentData()
+        after, before = self.period()
+        self.loader.request(
+            after,
+            before,
+            () if account_id is None else (account_id,),
+            () if tag_id is None else (tag_id,),
+        )
+
@@ -1,25 +1,79 @@
+import time
+
+# Taken before the Qt and db imports so the profile includes them
+STARTED_AT = time.perf_counter()
+
 import sys
 
+from PySide6.QtGui import QKeySequence, QShortcut
 from PySide6.QtWidgets import QApplication, QHBoxLayout, QWidget
 
+import db
+import instrument
+import kui.bus as bus
 from kui.balance_sheet import BalanceSheet
 from kui.calendar import Calendar
+from kui.debug_panel import DebugPanel
+from kui.monitor import MonitorOverlay, ResponsivenessMonitor
+from kui.startup import StartupProfile
 
 if __name__ == "__main__":
+    profile = StartupProfile(
+        STARTED_AT, report="--profile-startup" in sys.argv
+    )
+    profile.mark("imports")
+
+    if "--instrument" in sys.argv:
+        instrument.enable()
+
     app = QApplication(sys.argv)
 
     app.setApplicationDisplayName("Kairos Financial Planner")
 
+    # Deliver change notifications once per event loop tick
+    bus.install()
+    profile.mark("application")
+
+    # The window shell is shown empty and filled in once it has painted
     main_widget = QWidget()
     layout = QHBoxLayout()
     main_widget.setLayout(layout)
 
-    calendar = Calendar()
+    calendar = Calendar(painted="--painted-calendar" in sys.argv)
     balance_sheet = BalanceSheet()
 
     layout.addWidget(balance_sheet, 2)
     layout.addWidget(calendar, 7)
 
+    # Cheap enough to run always, --report-stalls prints each stall's stack
+    monitor = ResponsivenessMonitor(report="--report-stalls" in sys.argv)
+    if "--no-monitor" not in sys.argv:
+        monitor.start()
+    overlay = MonitorOverlay(main_widget, monitor)
+    QShortcut(QKeySequence("Ctrl+Shift+M"), main_widget).activated.connect(
+        overlay.toggle
+    )
+
+    debug_panel = DebugPanel(monitor)
+    QShortcut(QKeySequence("Ctrl+Shift+D"), main_widget).activated.connect(
+        debug_panel.show
+    )
+
+    profile.watch_first_paint(main_widget)
+    profile.watch_interactive(calendar.scroll_area)
     main_widget.show()
+    profile.mark("window shown")
+
+    profile.run_after_first_paint(
+        [
+            ("database", lambda: db.open_database(load_registries=False)),
+            ("balances", db.load_account_registry),
+            ("tags", db.load_tag_registry),
+            ("calendar window", calendar.start),
+        ]
+    )
 
     app.exec()
+
+    # Wait for queued edits to be committed before exiting
+    db.stop_writer()
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The application imports its modules from src, as main.py does
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import db  # noqa: E402
+
+
+# A migrated, empty database in a scratch directory, closed afterwards
+@pytest.fixture
+def scratch_db(tmp_path):
+    db.open_database(str(tmp_path / "kfp.db"), load_registries=False)
+    yield db
+    db.close_database()
@@ -0,0 +1,118 @@
+import pytest
+
+import db
+
+
+@pytest.fixture
+def ledger(scratch_db):
+    accounts = [db.insert_account(name, "", None, None) for name in "ABC"]
+    ids = a, b, c = [account.id for account in accounts]
+    events = [
+        db.insert_event(1, 1000, "Rent", "", {a: False, b: True}, ()),
+        db.insert_event(2, 250, "Coffee", "", {a: False}, ()),
+        db.insert_event(3, 75, "Refund", "", {c: True}, ()),
+    ]
+    return ids, events
+
+
+# The maintained balances must equal a GROUP BY over the whole ledger
+def assert_balances_match():
+    recomputed = db._db().execute(db._BALANCES_QUERY).fetchall()
+    assert db.fetch_balances() == sorted(recomputed)
+    assert db.check_account_balances() == dict()
+
+
+def test_insert(ledger):
+    ids, _ = ledger
+    assert_balances_match()
+    assert dict(db.fetch_balances()) == {
+        ids[0]: -1250,
+        ids[1]: 1000,
+        ids[2]: 75,
+    }
+
+
+def test_update_amount(ledger):
+    _, events = ledger
+    events[0].amount = 1200
+    db.alter_events(events[0])
+    assert_balances_match()
+
+
+def test_toggle_credit(ledger):
+    ids, events = ledger
+    db.toggle_account_type_for_event(events[0].id, [ids[0], ids[1]])
+    assert_balances_match()
+
+
+def test_add_and_remove_account(ledger):
+    ids, events = ledger
+    db.add_accounts_to_event(events[1].id, [(ids[2], True)])
+    assert_balances_match()
+    db.remove_accounts_from_event(events[0].id, [ids[1]])
+    assert_balances_match()
+
+
+def test_erase_event(ledger):
+    ids, events = ledger
+    db.erase_events(events[0], events[2])
+    assert_balances_match()
+    assert dict(db.fetch_balances()) == {ids[0]: -250, ids[1]: 0, ids[2]: 0}
+
+
+def test_erase_account(ledger):
+    ids, _ = ledger
+    account = db.Account(ids[1], "B", "", None, None)
+    db.erase_accounts(account)
+    assert_balances_match()
+
+
+def test_rebuild_repairs_drift(ledger):
+    ids, _ = ledger
+    db._db().execute(
+        "UPDATE account_balance SET balance = 5 WHERE account_id = ?",
+        (ids[0],),
+    )
+    assert db.rebuild_account_balances() == {ids[0]: (5, -1250)}
+    assert_balances_match()
+
+
+# delete_events also settles the registry and the loaded calendar
+def test_delete_events_updates_memory(ledger):
+    ids, events = ledger
+    accounts = {id: db.Account(id, "", "", None, None) for id in ids}
+    for account_id, balance in db.fetch_balances():
+        accounts[account_id].balance = balance
+    db.ACCOUNTS.update(accounts)
+    row = db.EventRow.of(events[0])
+    db.LOADED_EVENTS.add(row)
+    try:
+        db.delete_events(events[0])
+        assert_balances_match()
+        assert {id: a.balance for id, a in accounts.items()} == dict(
+            db.fetch_balances()
+        )
+        assert row not in db.LOADED_EVENTS
+    finally:
+        for id in ids:
+            db.ACCOUNTS.pop(id, None)
+
+
+def test_insert_events_matches_insert_event(ledger):
+    ids, events = ledger
+    a, b, c = ids
+    new_ids = db.insert_events(
+        [
+            (4, 300, "Groceries", "", {a: False, c: True}, (1, 2)),
+            (5, 40, "Snack", "weekly", dict(), ()),
+        ]
+    )
+    assert list(new_ids) == [events[-1].id + 1, events[-1].id + 2]
+    assert_balances_match()
+    assert dict(db.fetch_balances())[c] == 375
+
+    inserted = db.fetch_events().id_is(new_ids[0]).exec()[0]
+    assert inserted.name == "Groceries"
+    assert inserted.accounts == {a: False, c: True}
+    assert sorted(inserted.tag_ids) == [1, 2]
+    assert db.search_events("snack")[0].event_id == new_ids[1]
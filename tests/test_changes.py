@@ -0,0 +1,148 @@
+import gc
+
+import pytest
+
+from changes import Change, ChangeBus
+
+
+# A bus whose flushes run when the test calls them
+@pytest.fixture
+def bus():
+    bus = ChangeBus()
+    scheduled: list = list()
+    bus.install_scheduler(scheduled.append)
+    return bus
+
+
+class Receiver:
+    def __init__(self) -> None:
+        self.changes: list[Change] = list()
+
+    def receive(self, change: Change) -> None:
+        self.changes.append(change)
+
+
+def test_unscheduled_changes_are_delivered_at_once():
+    bus = ChangeBus()
+    receiver = Receiver()
+    bus.subscribe("topic", receiver.receive)
+    bus.publish("topic", 1, "a", "b")
+    assert [(c.key, c.old, c.new) for c in receiver.changes] == [(1, "a", "b")]
+
+
+def test_coalesces_first_old_and_latest_new(bus):
+    receiver = Receiver()
+    bus.subscribe("balance", receiver.receive)
+    bus.publish("balance", 1, 100, 150)
+    bus.publish("balance", 1, 150, 175)
+    bus.publish("balance", 2, 0, 5)
+    bus.publish("balance", 1, 175, 200)
+    assert receiver.changes == []
+
+    bus.flush()
+    assert [(c.key, c.old, c.new) for c in receiver.changes] == [
+        (1, 100, 200),
+        (2, 0, 5),
+    ]
+    assert bus.coalesced == 2
+
+
+def test_flush_is_scheduled_once_per_batch():
+    bus = ChangeBus()
+    scheduled: list = list()
+    bus.install_scheduler(scheduled.append)
+    bus.publish("topic", 1, 0, 1)
+    bus.publish("topic", 2, 0, 1)
+    assert len(scheduled) == 1
+    scheduled.pop()()
+    bus.publish("topic", 1, 1, 2)
+    assert len(scheduled) == 1
+
+
+def test_keyed_and_topic_wide_subscriptions(bus):
+    one, every = Receiver(), Receiver()
+    bus.subscribe("name", one.receive, 1)
+    bus.subscribe("name", every.receive)
+    bus.publish("name", 1, "a", "b")
+    bus.publish("name", 2, "c", "d")
+    bus.flush()
+    assert [c.key for c in one.changes] == [1]
+    assert [c.key for c in every.changes] == [1, 2]
+
+
+# A track and an untrack in the same tick cancel out
+def test_reverted_change_is_dropped(bus):
+    receiver = Receiver()
+    bus.subscribe("registry", receiver.receive)
+    tag = object()
+    bus.publish("registry", 1, None, tag)
+    bus.publish("registry", 1, tag, None)
+    bus.publish("balance", 1, 100, 150)
+    bus.publish("balance", 1, 150, 100)
+    bus.flush()
+    assert receiver.changes == []
+    assert bus.dropped == 2
+
+
+def test_signals_without_values_are_delivered(bus):
+    receiver = Receiver()
+    bus.subscribe("day", receiver.receive)
+    bus.publish("day", 5)
+    bus.publish("day", 5)
+    bus.flush()
+    assert [c.key for c in receiver.changes] == [5]
+
+
+def test_bound_methods_are_held_weakly():
+    bus = ChangeBus()
+    receiver = Receiver()
+    subscription = bus.subscribe("topic", receiver.receive)
+    del receiver
+    gc.collect()
+
+    bus.publish("topic", 1, "a", "b")
+    assert not subscription.active
+    assert bus.subscriptions == dict()
+
+
+def test_other_callables_are_held_until_cancelled():
+    bus = ChangeBus()
+    received: list[Change] = list()
+    subscription = bus.subscribe("topic", lambda c: received.append(c))
+    gc.collect()
+
+    bus.publish("topic", 1, "a", "b")
+    assert len(received) == 1
+
+    subscription.cancel()
+    subscription.cancel()
+    bus.publish("topic", 1, "b", "c")
+    assert len(received) == 1
+    assert bus.subscriptions == dict()
+
+
+def test_cancel_during_delivery(bus):
+    received: list[str] = list()
+    subscriptions = list()
+
+    def first(change: Change) -> None:
+        received.append("first")
+        subscriptions[1].cancel()
+
+    subscriptions.append(bus.subscribe("topic", first))
+    subscriptions.append(
+        bus.subscribe("topic", lambda c: received.append("second"))
+    )
+    bus.publish("topic", 1, 0, 1)
+    bus.flush()
+    assert received == ["first"]
+
+
+def test_removing_the_scheduler_flushes(bus):
+    receiver = Receiver()
+    bus.subscribe("topic", receiver.receive)
+    bus.publish("topic", 1, 0, 1)
+    bus.install_scheduler(None)
+    assert len(receiver.changes) == 1
+    bus.publish("topic", 1, 1, 2)
+    assert len(receiver.changes) == 2
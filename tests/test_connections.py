@@ -0,0 +1,47 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import db
+
+
+def on_thread(fn, pool: ThreadPoolExecutor | None = None):
+    if pool is not None:
+        return pool.submit(fn).result()
+    with ThreadPoolExecutor(1) as pool:
+        return pool.submit(fn).result()
+
+
+def test_other_threads_do_not_open_the_database():
+    assert db._conn is None
+    with pytest.raises(RuntimeError):
+        on_thread(db._db)
+    with pytest.raises(RuntimeError):
+        on_thread(lambda: db.open_database(":memory:"))
+    assert db._conn is None
+
+
+def test_close_closes_every_thread_connection(scratch_db):
+    conn = on_thread(db._db)
+    assert conn is not db._db()
+    db.close_database()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+
+def tag_names() -> list[str]:
+    return [name for name, in db._db().execute("SELECT name FROM tag")]
+
+
+# The same pool thread queries both databases in turn
+def test_threads_reconnect_after_reopening(tmp_path):
+    with ThreadPoolExecutor(1) as pool:
+        for name in ("first.db", "second.db"):
+            db.open_database(str(tmp_path / name), load_registries=False)
+            try:
+                db.insert_tag(name, "")
+                db.commit_changes()
+                assert on_thread(tag_names, pool) == [name]
+            finally:
+                db.close_database()
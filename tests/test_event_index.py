@@ -0,0 +1,160 @@
+import pytest
+
+from changes import BUS
+from db import EventIndex, EventRow
+
+
+def row(id: int, date: int) -> EventRow:
+    return EventRow(id, date, 100, f"Event {id}")
+
+
+def ids(events) -> list[int]:
+    return [event.id for event in events]
+
+
+def test_days_keep_insertion_order():
+    index = EventIndex()
+    for event in (row(1, 5), row(2, 3), row(3, 5), row(4, 9)):
+        index.add(event)
+    assert len(index) == 4
+    assert index.dates == [3, 5, 9]
+    assert ids(index.on(5)) == [1, 3]
+    assert ids(index) == [2, 1, 3, 4]
+    assert ids(index.range(3, 9)) == [1, 3]
+
+
+def test_add_range_skips_loaded_ids():
+    index = EventIndex()
+    loaded = row(1, 5)
+    index.add(loaded)
+    index.add_range([row(1, 5), row(2, 5), row(3, 7), row(3, 7)])
+    assert ids(index) == [1, 2, 3]
+    assert index.on(5)[0] is loaded
+    assert len(index) == 3
+
+
+def test_remove_only_that_row():
+    index = EventIndex()
+    first, second = row(1, 5), row(2, 5)
+    index.add_range([first, second])
+    index.remove(first)
+    assert ids(index.on(5)) == [2]
+    assert first not in index
+    assert second in index
+
+    index.remove(second)
+    assert index.dates == []
+    assert len(index) == 0
+
+
+def test_contains_is_by_identity():
+    index = EventIndex()
+    index.add(row(1, 5))
+    assert row(1, 5) not in index
+    assert "not a row" not in index
+
+
+def test_move_keeps_dates_sorted():
+    index = EventIndex()
+    moved = row(1, 5)
+    index.add_range([moved, row(2, 8)])
+    index.move(moved, 10)
+    assert moved.date == 10
+    assert index.dates == [8, 10]
+    assert ids(index.on(10)) == [1]
+    assert index.on(5) == []
+
+    index.move(moved, 1)
+    assert index.dates == [1, 8]
+    assert len(index) == 2
+
+
+def test_evict_before_and_from():
+    index = EventIndex()
+    index.add_range(row(date, date) for date in range(1, 11))
+
+    index.evict_before(3)
+    assert index.dates[0] == 3
+    assert len(index) == 8
+
+    index.evict_from(8)
+    assert index.dates == [3, 4, 5, 6, 7]
+    assert len(index) == 5
+
+    # Bounds between loaded dates and past either end
+    index.evict_before(0)
+    index.evict_from(100)
+    assert len(index) == 5
+    index.evict_from(0)
+    assert index.dates == []
+    assert len(index) == 0
+
+
+def test_clear():
+    index = EventIndex()
+    index.add_range([row(1, 5), row(2, 6)])
+    index.clear()
+    assert len(index) == 0
+    assert index.on(5) == []
+
+
+# Dates reported to LOADED_DAY subscribers, delivered as published
+@pytest.fixture
+def changed_days():
+    assert BUS.scheduler is None
+    days: list[int] = list()
+    subscription = EventIndex().subscribe_changes(
+        lambda change: days.append(change.key)
+    )
+    yield days
+    subscription.cancel()
+
+
+def test_add_and_remove_signal_their_day(changed_days):
+    index = EventIndex()
+    event = row(1, 5)
+    index.add(event)
+    index.remove(event)
+    assert changed_days == [5, 5]
+
+
+def test_add_range_signals_each_changed_day_once(changed_days):
+    index = EventIndex()
+    index.add(row(1, 5))
+    changed_days.clear()
+    index.add_range([row(3, 9), row(1, 5), row(2, 7), row(4, 9)])
+    assert changed_days == [7, 9]
+
+    changed_days.clear()
+    index.add_range([row(1, 5)])
+    assert changed_days == []
+
+
+def test_move_signals_both_days(changed_days):
+    index = EventIndex()
+    event = row(1, 5)
+    index.add(event)
+    changed_days.clear()
+    index.move(event, 8)
+    assert changed_days == [5, 8]
+
+
+def test_touch_signals_loaded_rows_only(changed_days):
+    index = EventIndex()
+    event = row(1, 5)
+    index.touch(event)
+    assert changed_days == []
+    index.add(event)
+    changed_days.clear()
+    index.touch(event)
+    assert changed_days == [5]
+
+
+def test_eviction_is_silent(changed_days):
+    index = EventIndex()
+    index.add_range([row(1, 5), row(2, 9)])
+    changed_days.clear()
+    index.evict_before(6)
+    index.evict_from(6)
+    index.clear()
+    assert changed_days == []
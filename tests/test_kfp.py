@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+import db
+import kfp
+
+
+def run_kfp(monkeypatch, *argv: str) -> int:
+    monkeypatch.setattr("sys.argv", ["kfp.py", *argv])
+    return kfp.main()
+
+
+# A database with the accounts and tags of every ledger below, and
+# optionally some events using them
+def make_ledger(path: str, with_events: bool) -> None:
+    db.open_database(path, load_registries=False)
+    try:
+        cash, savings = (
+            db.insert_account(name, "", None, None).id
+            for name in ("Checking", "Savings")
+        )
+        food, rent = (db.insert_tag(name, "").id for name in ("Food", "Rent"))
+        events = [
+            (19000, 1250, "Coffee Shop", "with Sam", {cash: False}, [food]),
+            (19001, 9000, "Rent", "June; paid", {savings: True}, [rent, food]),
+            (19005, 75, "Refund", "", dict(), []),
+        ]
+        if with_events:
+            db.insert_events(events)
+        db.commit_changes()
+    finally:
+        db.close_database()
+
+
+# Every event without its id, and the balances
+def ledger_contents(path: str) -> tuple[list[tuple], list[tuple[int, int]]]:
+    db.open_database(path, load_registries=False)
+    try:
+        return [
+            (
+                event.date,
+                event.amount,
+                event.name,
+                event.memo,
+                dict(event.accounts),
+                sorted(event.tag_ids),
+            )
+            for event in db.fetch_events().exec()
+        ], db.fetch_balances()
+    finally:
+        db.close_database()
+
+
+@pytest.mark.parametrize("format", ["csv", "json"])
+def test_export_then_import_round_trips(tmp_path, monkeypatch, format):
+    source, target = str(tmp_path / "source.db"), str(tmp_path / "target.db")
+    exported = str(tmp_path / f"ledger.{format}")
+    make_ledger(source, with_events=True)
+    make_ledger(target, with_events=False)
+
+    assert run_kfp(monkeypatch, "--db", source, "export", exported) == 0
+    assert run_kfp(monkeypatch, "--db", target, "import", exported) == 0
+
+    events, balances = ledger_contents(target)
+    assert len(events) == 3
+    assert (events, balances) == ledger_contents(source)
+
+
+@pytest.mark.parametrize(
+    "bad_record",
+    [
+        # An account the target does not have
+        {"date": "2022-01-03", "amount": 5, "accounts": {"9": "credit"}},
+        {"date": "not a date", "amount": 5},
+        {"date": "2022-01-03"},
+        # Repeating a tag breaks a UNIQUE constraint in SQLite
+        {"date": "2022-01-03", "amount": 5, "tags": [1, 1]},
+    ],
+)
+def test_failed_import_commits_nothing(
+    tmp_path, monkeypatch, capsys, bad_record
+):
+    target = str(tmp_path / "target.db")
+    make_ledger(target, with_events=False)
+    records = tmp_path / "ledger.json"
+    good = {"date": "2022-01-02", "amount": 100, "name": "Coffee"}
+    records.write_text(
+        "\n".join(json.dumps(r) for r in (good, good, bad_record)) + "\n"
+    )
+
+    assert run_kfp(monkeypatch, "--db", target, "import", str(records)) == 1
+    assert "ledger.json:3:" in capsys.readouterr().err
+
+    events, balances = ledger_contents(target)
+    assert events == []
+    assert balances == [(1, 0), (2, 0)]
@@ -0,0 +1,61 @@
+import sqlite3
+
+import db
+
+
+# A kfp.db as the app wrote it before migrations: the base tables with
+# data, no balances or search index, user_version 0
+def write_baseline(path: str) -> None:
+    conn = sqlite3.connect(path)
+    conn.executescript(db.MIGRATIONS[0])
+    conn.executemany(
+        "INSERT INTO account VALUES (?,?,?,?,?)",
+        [(1, "Checking", "", None, None), (2, "Savings", "", None, None)],
+    )
+    conn.executemany(
+        "INSERT INTO event VALUES (?,?,?,?,?)",
+        [
+            (1, 100, 5000, "Paycheck", "June"),
+            (2, 101, 1250, "Coffee Shop", "with Sam"),
+            (3, 102, 2000, "Transfer", ""),
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO event_accounts VALUES (?,?,?)",
+        [(1, 1, True), (2, 1, False), (3, 1, False), (3, 2, True)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_database_is_upgraded(tmp_path):
+    path = str(tmp_path / "kfp.db")
+    write_baseline(path)
+
+    db.open_database(path, load_registries=False)
+    try:
+        assert db.schema_version() == len(db.MIGRATIONS) == 4
+        assert db.fetch_balances() == [(1, 1750), (2, 2000)]
+        assert db.check_account_balances() == dict()
+
+        found = db._db().execute(
+            "SELECT rowid FROM event_search WHERE event_search MATCH ?",
+            ("coffee OR june",),
+        )
+        assert sorted(id for id, in found) == [1, 2]
+    finally:
+        db.close_database()
+
+
+def test_upgrade_is_not_repeated(tmp_path):
+    path = str(tmp_path / "kfp.db")
+    write_baseline(path)
+    db.open_database(path, load_registries=False)
+    db.close_database()
+
+    db.open_database(path, load_registries=False)
+    try:
+        assert db.schema_version() == len(db.MIGRATIONS)
+        assert db.fetch_balances() == [(1, 1750), (2, 2000)]
+    finally:
+        db.close_database()
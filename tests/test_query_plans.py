@@ -0,0 +1,73 @@
+import pytest
+
+import db
+
+# (fetcher filter, index its plan must search) for every EventFetcher
+# predicate that an index can serve
+INDEXED = [
+    (lambda f: f.id_is(1), "INTEGER PRIMARY KEY"),
+    (lambda f: f.before(100), "INDEX event_date"),
+    (lambda f: f.after(100), "INDEX event_date"),
+    (lambda f: f.on(100), "INDEX event_date"),
+    (lambda f: f.after(100).before(200), "INDEX event_date"),
+    (lambda f: f.amount_less(1000), "INDEX event_amount"),
+    (lambda f: f.amount_greater(99000), "INDEX event_amount"),
+    (lambda f: f.amount_greater(1000).amount_less(2000), "INDEX event_amount"),
+    (lambda f: f.name_is("Coffee"), "INDEX event_name"),
+    (lambda f: f.matches("coffee"), "event_search VIRTUAL TABLE"),
+    (lambda f: f.has_words("coffee lunch"), "event_search VIRTUAL TABLE"),
+    (lambda f: f.has_prefix("groc"), "event_search VIRTUAL TABLE"),
+    (lambda f: f.has_phrase("coffee shop"), "event_search VIRTUAL TABLE"),
+    (lambda f: f.any_tags(1, 2), "COVERING INDEX event_tags_tag"),
+    (lambda f: f.all_tags(1, 2), "COVERING INDEX event_tags_tag"),
+    (lambda f: f.any_accounts(1), "COVERING INDEX event_accounts_account"),
+    (lambda f: f.all_accounts(1, 2), "COVERING INDEX event_accounts_account"),
+    # A date window is narrower than an amount bound
+    (lambda f: f.after(100).before(200).amount_greater(5), "event_date"),
+]
+
+# Filters that must look at every event: a LIKE with a leading wildcard
+# cannot use a b-tree, and exclusions keep whatever the subquery misses.
+# They walk event_date so that at least the ORDER BY needs no sort.
+SCANNED = [
+    lambda f: f.name_contains("Coffee"),
+    lambda f: f.no_tags(1),
+    lambda f: f.no_accounts(1),
+]
+
+
+def table_scans(plan: list[str]) -> list[str]:
+    # FTS5 reports its own index lookups as a virtual table SCAN
+    return [
+        detail
+        for detail in plan
+        if detail.startswith("SCAN") and "VIRTUAL TABLE" not in detail
+    ]
+
+
+@pytest.mark.parametrize("apply, index", INDEXED)
+def test_filter_searches_index(scratch_db, apply, index):
+    plan = apply(db.fetch_events()).explain()
+    assert table_scans(plan) == []
+    assert any(index in detail for detail in plan), plan
+
+
+@pytest.mark.parametrize("apply", SCANNED)
+def test_unindexable_filter_scans_in_date_order(scratch_db, apply):
+    plan = apply(db.fetch_events()).explain()
+    assert table_scans(plan) == ["SCAN event USING INDEX event_date"]
+    assert not any("TEMP B-TREE FOR ORDER BY" in d for d in plan), plan
+
+
+def test_balances_use_covering_index(scratch_db):
+    plan = [
+        detail
+        for _, _, _, detail in db._db().execute(
+            "EXPLAIN QUERY PLAN " + db._BALANCES_QUERY
+        )
+    ]
+    assert any("COVERING INDEX event_accounts_account" in d for d in plan)
+
+
+def test_migrations_recorded(scratch_db):
+    assert db.schema_version() == len(db.MIGRATIONS)
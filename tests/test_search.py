@@ -0,0 +1,81 @@
+import pytest
+
+import db
+
+
+def found(text: str) -> list[int]:
+    events = db.fetch_events().has_words(text).exec()
+    return sorted(event.id for event in events)
+
+
+def test_insert_is_indexed(scratch_db):
+    event = db.insert_event(1, 100, "Coffee Shop", "with Sam", dict(), ())
+    assert found("coffee") == [event.id]
+    assert found("sam") == [event.id]
+
+
+def test_update_resyncs_index(scratch_db):
+    event = db.insert_event(1, 100, "Coffee Shop", "with Sam", dict(), ())
+    event.name = "Tea House"
+    event.memo = "alone"
+    db.alter_events(event)
+    assert found("coffee") == []
+    assert found("sam") == []
+    assert found("tea") == [event.id]
+    assert found("alone") == [event.id]
+
+
+def test_erase_removes_from_index(scratch_db):
+    kept = db.insert_event(1, 100, "Coffee beans", "", dict(), ())
+    erased = db.insert_event(2, 100, "Coffee Shop", "", dict(), ())
+    db.erase_events(erased)
+    assert found("coffee") == [kept.id]
+    assert [r.event_id for r in db.search_as_you_type("cof")] == [kept.id]
+
+
+# FTS5 operators, column filters and stray quotes are searched for as words
+@pytest.mark.parametrize(
+    "text",
+    [
+        'coffee"',
+        '"',
+        "OR",
+        "coffee AND",
+        "NOT tea",
+        "NEAR(coffee tea)",
+        "name:coffee",
+        "-coffee",
+        "^coffee",
+        "coffee*",
+        "(coffee",
+        "+",
+    ],
+)
+def test_operators_are_quoted(scratch_db, text):
+    db.insert_event(1, 100, "Coffee OR tea", "", dict(), ())
+    db.fetch_events().has_words(text).exec()
+    db.fetch_events().has_prefix(text).exec()
+    db.fetch_events().has_phrase(text).exec()
+    db.search_as_you_type(text)
+
+
+def test_operator_words_match_literally(scratch_db):
+    event = db.insert_event(1, 100, "Coffee OR tea", "", dict(), ())
+    db.insert_event(2, 100, "Coffee", "", dict(), ())
+    assert found("OR") == [event.id]
+    assert found("coffee OR tea") == [event.id]
+
+
+# Only the most recently inserted matches are ranked, but never fewer
+# than the number of results asked for
+def test_as_you_type_candidate_window(scratch_db):
+    ids = [
+        db.insert_event(day, 100, f"Coffee {day}", "", dict(), ()).id
+        for day in range(10)
+    ]
+    window = db.search_as_you_type("cof", limit=20, candidates=3)
+    assert sorted(r.event_id for r in window) == ids
+
+    window = db.search_as_you_type("cof", limit=2, candidates=3)
+    assert len(window) == 2
+    assert {r.event_id for r in window} <= set(ids[-3:])
@@ -0,0 +1,133 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db
+
+
+# The writer thread's connection, failing the given statements once each
+class FlakyConnection:
+    def __init__(self, conn: sqlite3.Connection, failures: list[str]):
+        self.__dict__["conn"] = conn
+        self.__dict__["failures"] = failures
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.conn, name, value)
+
+    def execute(self, sql, *args):
+        if sql in self.failures:
+            self.failures.remove(sql)
+            raise sqlite3.OperationalError(f"{sql} failed")
+        return self.conn.execute(sql, *args)
+
+
+@pytest.fixture
+def flaky_writer(scratch_db, monkeypatch):
+    failures: list[str] = list()
+    thread_db = db._db
+
+    def writer_db():
+        conn = thread_db()
+        if threading.current_thread().name == "kfp-writer":
+            return FlakyConnection(conn, failures)
+        return conn
+
+    monkeypatch.setattr(db, "_db", writer_db)
+    writer = db.Writer(max_latency=1.0)
+    # db.submit_write queues on this writer, which each test starts
+    monkeypatch.setattr(db, "_writer", writer)
+    yield writer, failures
+    if writer.is_alive():
+        writer.stop()
+
+
+def insert_tag(name: str) -> int:
+    return db.insert_tag(name, "").id
+
+
+def tag_names() -> list[str]:
+    return [name for name, in db._db().execute("SELECT name FROM tag")]
+
+
+def test_failed_commit_fails_the_whole_group(flaky_writer):
+    writer, failures = flaky_writer
+    failures.append("COMMIT")
+    # Queued before the thread starts, so both land in one group
+    first = writer.submit(insert_tag, "first")
+    second = writer.submit(insert_tag, "second")
+    writer.start()
+
+    for future in (first, second):
+        with pytest.raises(sqlite3.OperationalError, match="COMMIT"):
+            future.result(timeout=5)
+    assert tag_names() == []
+
+    # The thread is still serving jobs on a usable connection
+    assert writer.submit(insert_tag, "third").result(timeout=5) > 0
+    assert tag_names() == ["third"]
+    assert writer.is_alive()
+
+
+# The group ends with the job that was taken, later jobs start a new one
+@pytest.mark.parametrize("statement", ["BEGIN", "SAVEPOINT job"])
+def test_failed_begin_fails_the_taken_job(flaky_writer, statement):
+    writer, failures = flaky_writer
+    failures.append(statement)
+    first = writer.submit(insert_tag, "first")
+    second = writer.submit(insert_tag, "second")
+    writer.start()
+
+    with pytest.raises(sqlite3.OperationalError, match=statement):
+        first.result(timeout=5)
+    assert second.result(timeout=5) > 0
+    assert tag_names() == ["second"]
+    assert writer.is_alive()
+
+
+def test_failed_job_only_rolls_back_itself(flaky_writer):
+    writer, _ = flaky_writer
+
+    def fail():
+        db.insert_tag("dropped", "")
+        raise ValueError("rejected")
+
+    kept = writer.submit(insert_tag, "kept")
+    failed = writer.submit(fail)
+    writer.start()
+
+    assert kept.result(timeout=5) > 0
+    with pytest.raises(ValueError):
+        failed.result(timeout=5)
+    assert tag_names() == ["kept"]
+
+
+def test_chained_write_receives_result(flaky_writer):
+    writer, _ = flaky_writer
+    writer.start()
+
+    inserted = db.submit_write(insert_tag, "first")
+    renamed = db.submit_write_after(
+        inserted,
+        lambda id, name: db._db().execute(
+            "UPDATE tag SET name = ? WHERE id = ?", (name, id)
+        ),
+        "renamed",
+    )
+    renamed.result(timeout=5)
+    assert tag_names() == ["renamed"]
+
+
+def test_chained_write_fails_with_its_predecessor(flaky_writer):
+    writer, failures = flaky_writer
+    failures.append("BEGIN")
+    writer.start()
+
+    inserted = db.submit_write(insert_tag, "first")
+    renamed = db.submit_write_after(inserted, insert_tag)
+    with pytest.raises(sqlite3.OperationalError):
+        renamed.result(timeout=5)
+    assert tag_names() == []